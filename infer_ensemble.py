@@ -0,0 +1,34 @@
+"""Code for inference on the contents of a directory with an ensemble of model checkpoints."""
+
+import datetime
+from pathlib import Path
+
+from ramjet.data_interface.metadatabase import metadatabase
+from ramjet.models.hades import Hades
+from ramjet.photometric_database.derived.tess_two_minute_cadence_transit_databases import \
+    TessTwoMinuteCadenceStandardAndInjectedTransitDatabase
+from ramjet.analysis.model_loader import get_latest_log_directory
+from ramjet.trial import infer_ensemble
+
+log_name = get_latest_log_directory(logs_directory='logs')  # Uses the latest model in the log directory.
+# log_name = 'logs/baseline YYYY-MM-DD-hh-mm-ss'  # Specify the path to the model to use.
+saved_log_directory = Path(f'{log_name}')
+checkpoint_paths = [saved_log_directory.joinpath('latest_model.ckpt'),
+                    saved_log_directory.joinpath('best_validation_model.ckpt')]  # Add checkpoints of other seeds here.
+datetime_string = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+
+print('Setting up dataset...', flush=True)
+metadatabase.use_read_only_connections()  # Inference only queries the metadatabase.
+database = TessTwoMinuteCadenceStandardAndInjectedTransitDatabase()
+inference_dataset = database.generate_inference_dataset()
+
+print('Loading models...', flush=True)
+models = {}
+for checkpoint_path in checkpoint_paths:
+    model = Hades(database.number_of_label_values)
+    model.load_weights(str(checkpoint_path)).expect_partial()
+    models[f'{checkpoint_path.parent.name} {checkpoint_path.stem}'] = model
+
+print('Inferring...', flush=True)
+infer_results_path = saved_log_directory.joinpath(f'infer ensemble results {datetime_string}.csv')
+infer_ensemble(models, inference_dataset, infer_results_path)
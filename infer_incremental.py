@@ -0,0 +1,31 @@
+"""Code for inference on only the target sectors which have not yet been inferred on by the model checkpoint."""
+
+import datetime
+from pathlib import Path
+
+from ramjet.data_interface.metadatabase import metadatabase
+from ramjet.models.hades import Hades
+from ramjet.photometric_database.derived.tess_ffi_transit_databases import \
+    TessFfiStandardTransitAntiEclipsingBinaryDatabase
+from ramjet.analysis.model_loader import get_latest_log_directory
+from ramjet.incremental_inference import IncrementalTargetInferenceRunner
+
+log_name = get_latest_log_directory(logs_directory='logs')  # Uses the latest model in the log directory.
+# log_name = 'logs/baseline YYYY-MM-DD-hh-mm-ss'  # Specify the path to the model to use.
+saved_log_directory = Path(f'{log_name}')
+model_checkpoint_path = saved_log_directory.joinpath('latest_model.ckpt')
+datetime_string = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+
+print('Setting up dataset...', flush=True)
+metadatabase.use_read_only_connections()  # Results are written to the separate target inference results database.
+database = TessFfiStandardTransitAntiEclipsingBinaryDatabase()
+
+print('Loading model...', flush=True)
+model = Hades(database.number_of_label_values)
+model.load_weights(str(model_checkpoint_path)).expect_partial()
+
+print('Inferring...', flush=True)
+runner = IncrementalTargetInferenceRunner(model, database, model_checkpoint=str(model_checkpoint_path))
+runner.run()
+ranked_targets_path = saved_log_directory.joinpath(f'infer ranked targets {datetime_string}.csv')
+runner.results_manager.load_ranked_targets(str(model_checkpoint_path)).to_csv(ranked_targets_path, index=False)
@@ -0,0 +1,39 @@
+"""Code for resumable inference on the contents of a directory, sharded across processes."""
+
+import datetime
+from pathlib import Path
+
+from ramjet.data_interface.metadatabase import metadatabase
+from ramjet.models.hades import Hades
+from ramjet.photometric_database.derived.tess_two_minute_cadence_transit_databases import \
+    TessTwoMinuteCadenceStandardAndInjectedTransitDatabase
+from ramjet.analysis.model_loader import get_latest_log_directory
+from ramjet.sharded_inference import ShardedInferenceRunner
+
+log_name = get_latest_log_directory(logs_directory='logs')  # Uses the latest model in the log directory.
+# log_name = 'logs/baseline YYYY-MM-DD-hh-mm-ss'  # Specify the path to the model to use.
+saved_log_directory = Path(f'{log_name}')
+shards_directory = saved_log_directory.joinpath('infer shards')  # Rerunning with the same directory resumes.
+
+
+def create_database() -> TessTwoMinuteCadenceStandardAndInjectedTransitDatabase:
+    metadatabase.use_read_only_connections()  # Inference only queries the metadatabase.
+    database = TessTwoMinuteCadenceStandardAndInjectedTransitDatabase()
+    database.number_of_parallel_processes_per_map = 1  # Parallelism comes from the shard processes.
+    return database
+
+
+def create_model() -> Hades:
+    model = Hades(create_database().number_of_label_values)
+    model.load_weights(str(saved_log_directory.joinpath('latest_model.ckpt'))).expect_partial()
+    return model
+
+
+if __name__ == '__main__':
+    runner = ShardedInferenceRunner(database_factory=create_database, model_factory=create_model,
+                                    results_directory=shards_directory, number_of_shards=100)
+    print('Inferring...', flush=True)
+    runner.run()
+    print('Merging shards...', flush=True)
+    datetime_string = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    runner.merge(saved_log_directory.joinpath(f'infer results {datetime_string}.csv'))
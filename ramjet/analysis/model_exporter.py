@@ -0,0 +1,290 @@
+"""
+Code for exporting trained models to compiled inference graphs, and loading the exported graphs for inference.
+"""
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from ramjet.photometric_database.standard_and_injected_light_curve_database import \
+    StandardAndInjectedLightCurveDatabase
+
+
+class QuantizationMode(Enum):
+    """
+    An enum of the post-training quantization modes of TFLite exports.
+    """
+    DYNAMIC_RANGE = 'dynamic_range'
+    FULL_INTEGER = 'full_integer'
+    FLOAT16 = 'float16'
+
+
+def get_inference_input_signature(database: StandardAndInjectedLightCurveDatabase) -> List:
+    """
+    Gets the fixed input signature of the inference examples of a database. Only the batch dimension is left unknown.
+
+    :param database: The database the model infers on.
+    :return: The input signature.
+    """
+    light_curve_spec = tf.TensorSpec(shape=(None, database.time_steps_per_example, database.number_of_input_channels),
+                                     dtype=tf.float32, name='light_curve')
+    if database.number_of_auxiliary_values == 0:
+        return [light_curve_spec]
+    auxiliary_information_spec = tf.TensorSpec(shape=(None, database.number_of_auxiliary_values), dtype=tf.float32,
+                                               name='auxiliary_information')
+    return [(light_curve_spec, auxiliary_information_spec)]
+
+
+def export_saved_model(model: tf.keras.Model, database: StandardAndInjectedLightCurveDatabase,
+                       export_directory: Path, jit_compile: bool = False) -> Path:
+    """
+    Exports a model's inference pass as a `tf.function` with a fixed input signature in the SavedModel format.
+
+    :param model: The model to export, with its weights loaded.
+    :param database: The database the model infers on, which determines the input signature.
+    :param export_directory: The directory to save the SavedModel to.
+    :param jit_compile: Whether to compile the inference function with XLA.
+    :return: The export directory.
+    """
+    inference_module = tf.Module()
+    inference_module.model = model
+    inference_module.infer = tf.function(lambda examples: model(examples, training=False),
+                                         input_signature=get_inference_input_signature(database),
+                                         jit_compile=jit_compile)
+    tf.saved_model.save(inference_module, str(export_directory),
+                        signatures=inference_module.infer.get_concrete_function())
+    return export_directory
+
+
+def export_tflite_model(saved_model_directory: Path, tflite_path: Path,
+                        quantization_mode: Optional[QuantizationMode] = None,
+                        representative_dataset: Optional[Callable[[], Iterator[List[np.ndarray]]]] = None) -> Path:
+    """
+    Converts an exported SavedModel to a TFLite model, optionally with post-training quantization. The TFLite
+    interpreter runs models on CPU with the XNNPACK delegate by default.
+
+    :param saved_model_directory: The directory of the SavedModel.
+    :param tflite_path: The path to save the TFLite model to.
+    :param quantization_mode: The post-training quantization to apply. None keeps the float model.
+    :param representative_dataset: The function producing batches of representative inputs, each a list with one
+                                   array per model input, used to calibrate the activation ranges. Required for full
+                                   integer quantization.
+    :return: The TFLite model path.
+    """
+    converter = tf.lite.TFLiteConverter.from_saved_model(str(saved_model_directory))
+    if quantization_mode is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization_mode == QuantizationMode.FLOAT16:
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization_mode == QuantizationMode.FULL_INTEGER:
+        if representative_dataset is None:
+            raise ValueError('Full integer quantization requires a representative dataset.')
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    tflite_path.write_bytes(converter.convert())
+    return tflite_path
+
+
+def create_representative_dataset(database: StandardAndInjectedLightCurveDatabase, number_of_batches: int = 100
+                                  ) -> Callable[[], Iterator[List[np.ndarray]]]:
+    """
+    Creates a representative dataset for quantization calibration from the database's validation examples.
+
+    :param database: The database to draw the examples from.
+    :param number_of_batches: The number of batches of examples to draw.
+    :return: The function producing the batches of representative inputs, each a list with one array per model input.
+    """
+    _, validation_dataset = database.generate_datasets()
+    example_batches = [tf.nest.map_structure(lambda tensor: tensor.numpy(), examples)
+                       for examples, _ in validation_dataset.take(number_of_batches)]
+
+    def representative_dataset() -> Iterator[List[np.ndarray]]:
+        """Produces the batches of representative inputs."""
+        for example_batch in example_batches:
+            yield tf.nest.flatten(example_batch)
+    return representative_dataset
+
+
+class SavedModelInferrer:
+    """
+    A class for inferring with an exported SavedModel, callable in place of the Keras model.
+
+    :ivar saved_model: The loaded SavedModel.
+    """
+    def __init__(self, saved_model_directory: Path):
+        self.saved_model = tf.saved_model.load(str(saved_model_directory))
+
+    def __call__(self, examples, training: bool = False) -> tf.Tensor:
+        """
+        Infers on a batch of examples.
+
+        :param examples: The batch of examples.
+        :param training: Unused. Exported models are always in inference mode.
+        :return: The confidences of the batch.
+        """
+        return self.saved_model.infer(examples)
+
+
+class TfLiteInferrer:
+    """
+    A class for inferring with an exported TFLite model, callable in place of the Keras model. The interpreter's inputs
+    are resized whenever the batch size changes.
+
+    :ivar interpreter: The TFLite interpreter.
+    :ivar input_details: The details of the interpreter's inputs, in the flattened order of the model inputs.
+    """
+    def __init__(self, tflite_path: Path, number_of_threads: Optional[int] = None):
+        self.interpreter = tf.lite.Interpreter(model_path=str(tflite_path), num_threads=number_of_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details: List[Dict] = self.interpreter.get_input_details()
+        self.output_details: Dict = self.interpreter.get_output_details()[0]
+        self.batch_size: Optional[int] = None
+
+    def __call__(self, examples, training: bool = False) -> np.ndarray:
+        """
+        Infers on a batch of examples. The inputs and outputs of integer quantized models are quantized and dequantized
+        using the model's quantization parameters.
+
+        :param examples: The batch of examples. A tuple of arrays for models with auxiliary inputs.
+        :param training: Unused. Exported models are always in inference mode.
+        :return: The confidences of the batch.
+        """
+        input_arrays = [np.asarray(input_array, dtype=np.float32) for input_array in tf.nest.flatten(examples)]
+        if input_arrays[0].shape[0] != self.batch_size:
+            for input_details, input_array in zip(self.input_details, input_arrays):
+                self.interpreter.resize_tensor_input(input_details['index'], input_array.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = input_arrays[0].shape[0]
+        for input_details, input_array in zip(self.input_details, input_arrays):
+            input_dtype = input_details['dtype']
+            if np.issubdtype(input_dtype, np.integer):
+                input_scale, input_zero_point = input_details['quantization']
+                type_information = np.iinfo(input_dtype)
+                input_array = np.clip(np.round(input_array / input_scale + input_zero_point), type_information.min,
+                                      type_information.max).astype(input_dtype)
+            self.interpreter.set_tensor(input_details['index'], input_array)
+        self.interpreter.invoke()
+        confidences = self.interpreter.get_tensor(self.output_details['index'])
+        if np.issubdtype(self.output_details['dtype'], np.integer):
+            output_scale, output_zero_point = self.output_details['quantization']
+            return (confidences.astype(np.float32) - output_zero_point) * output_scale
+        return confidences.copy()
+
+
+def load_exported_model(export_path: Path) -> Union[SavedModelInferrer, TfLiteInferrer]:
+    """
+    Loads an exported model for inference, based on the export path.
+
+    :param export_path: The path of a `.tflite` file or a SavedModel directory.
+    :return: The inferrer, callable in place of the Keras model.
+    """
+    if export_path.suffix == '.tflite':
+        return TfLiteInferrer(export_path)
+    return SavedModelInferrer(export_path)
+
+
+def benchmark_inference(inference_function: Callable, example_batches: List, number_of_warm_up_batches: int = 2
+                        ) -> Dict[str, float]:
+    """
+    Measures the latency and throughput of an inference function.
+
+    :param inference_function: The function taking a batch of examples and returning its confidences.
+    :param example_batches: The batches of examples to infer on.
+    :param number_of_warm_up_batches: The number of batches inferred on before timing, to exclude tracing and
+                                      allocation from the measurements.
+    :return: The median batch latency in seconds and the throughput in examples per second.
+    """
+    for example_batch in example_batches[:number_of_warm_up_batches]:
+        np.asarray(inference_function(example_batch))
+    batch_latencies = []
+    examples_count = 0
+    for example_batch in example_batches:
+        start_time = time.perf_counter()
+        np.asarray(inference_function(example_batch))
+        batch_latencies.append(time.perf_counter() - start_time)
+        examples_count += tf.nest.flatten(example_batch)[0].shape[0]
+    return {'median_batch_latency': float(np.median(batch_latencies)),
+            'throughput': examples_count / sum(batch_latencies)}
+
+
+def compare_inference_paths(model: tf.keras.Model, database: StandardAndInjectedLightCurveDatabase,
+                            export_directory: Path, number_of_batches: int = 20, include_xla: bool = False
+                            ) -> pd.DataFrame:
+    """
+    Compares the latency and throughput of eager inference with the exported SavedModel and TFLite inference, on
+    batches of the database's inference dataset.
+
+    :param model: The model to compare, with its weights loaded.
+    :param database: The database to take the inference batches from.
+    :param export_directory: The directory to save the exported models to.
+    :param number_of_batches: The number of batches to time.
+    :param include_xla: Whether to also compare an XLA compiled SavedModel.
+    :return: The data frame of the median batch latency and throughput of each inference path.
+    """
+    example_batches = [examples for _, examples in database.generate_inference_dataset().take(number_of_batches)]
+    inference_functions = {'eager': lambda examples: model(examples, training=False)}
+    saved_model_directory = export_saved_model(model, database, export_directory.joinpath('saved_model'))
+    inference_functions['saved_model'] = SavedModelInferrer(saved_model_directory)
+    if include_xla:
+        xla_saved_model_directory = export_saved_model(model, database, export_directory.joinpath('saved_model_xla'),
+                                                       jit_compile=True)
+        inference_functions['saved_model_xla'] = SavedModelInferrer(xla_saved_model_directory)
+    tflite_path = export_tflite_model(saved_model_directory, export_directory.joinpath('model.tflite'))
+    inference_functions['tflite'] = TfLiteInferrer(tflite_path)
+    rows = []
+    for name, inference_function in inference_functions.items():
+        rows.append({'inference_path': name, **benchmark_inference(inference_function, example_batches)})
+    return pd.DataFrame(rows)
+
+
+def evaluate_quantization(model: tf.keras.Model, database: StandardAndInjectedLightCurveDatabase,
+                          export_directory: Path, number_of_validation_batches: int = 100,
+                          number_of_representative_batches: int = 100) -> pd.DataFrame:
+    """
+    Compares the quantized TFLite exports of a model against the float model on the database's validation examples,
+    reporting the drift in the area under the ROC curve next to the throughput gain.
+
+    :param model: The model to quantize, with its weights loaded.
+    :param database: The database whose validation collections are evaluated on.
+    :param export_directory: The directory to save the exported models to.
+    :param number_of_validation_batches: The number of validation batches to evaluate on.
+    :param number_of_representative_batches: The number of batches used to calibrate full integer quantization.
+    :return: The data frame of the area under the ROC curve, its drift from the float model, the throughput, and the
+             throughput gain over the float model, of the float model and each quantization mode.
+    """
+    _, validation_dataset = database.generate_datasets()
+    example_batches = []
+    label_batches = []
+    for examples, labels in validation_dataset.take(number_of_validation_batches):
+        example_batches.append(tf.nest.map_structure(lambda tensor: tensor.numpy(), examples))
+        label_batches.append(labels.numpy())
+    labels = np.concatenate(label_batches)
+    saved_model_directory = export_saved_model(model, database, export_directory.joinpath('saved_model'))
+    representative_dataset = create_representative_dataset(database, number_of_representative_batches)
+    inference_functions = {'float': lambda examples: model(examples, training=False)}
+    for quantization_mode in QuantizationMode:
+        tflite_path = export_tflite_model(saved_model_directory,
+                                          export_directory.joinpath(f'model_{quantization_mode.value}.tflite'),
+                                          quantization_mode=quantization_mode,
+                                          representative_dataset=representative_dataset)
+        inference_functions[quantization_mode.value] = TfLiteInferrer(tflite_path)
+    rows = []
+    for name, inference_function in inference_functions.items():
+        confidences = np.concatenate([np.asarray(inference_function(example_batch))
+                                      for example_batch in example_batches])
+        area_under_roc_curve_metric = tf.keras.metrics.AUC(num_thresholds=200, multi_label=True)
+        area_under_roc_curve_metric.update_state(labels, confidences)
+        rows.append({'model': name, 'area_under_roc_curve': float(area_under_roc_curve_metric.result()),
+                     'throughput': benchmark_inference(inference_function, example_batches)['throughput']})
+    evaluation_data_frame = pd.DataFrame(rows)
+    float_row = evaluation_data_frame.iloc[0]
+    evaluation_data_frame['area_under_roc_curve_drift'] = (evaluation_data_frame['area_under_roc_curve'] -
+                                                           float_row['area_under_roc_curve'])
+    evaluation_data_frame['throughput_gain'] = evaluation_data_frame['throughput'] / float_row['throughput']
+    return evaluation_data_frame
@@ -0,0 +1,83 @@
+"""
+Code for recording light curve files which failed integrity verification, so they can be skipped.
+"""
+import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Set, Union
+
+from peewee import CharField, DateTimeField, OperationalError, chunked
+
+from ramjet.data_interface.metadatabase import MetadatabaseModel, bulk_upsert
+
+
+class QuarantinedLightCurveError(Exception):
+    """An error raised when loading a light curve file which is known to be corrupt."""
+    pass
+
+
+class QuarantinedLightCurve(MetadatabaseModel):
+    """
+    A model for the table of light curve files which failed integrity verification.
+    """
+    path = CharField(unique=True)
+    error = CharField()
+    quarantine_time = DateTimeField(default=datetime.datetime.now)
+
+
+class LightCurveQuarantine:
+    """
+    A class for recording, releasing, and checking quarantined light curve files.
+    """
+    @staticmethod
+    def quarantine_paths(path_errors: Dict[Union[Path, str], str]):
+        """
+        Quarantines light curve files, replacing any existing record of the same files.
+
+        :param path_errors: The dictionary from light curve path to the error description of its failed verification.
+        """
+        QuarantinedLightCurve.create_table()
+        bulk_upsert(QuarantinedLightCurve, [{'path': str(path), 'error': error} for path, error in path_errors.items()])
+
+    @staticmethod
+    def release_paths(paths: Iterable[Union[Path, str]]):
+        """
+        Removes light curve files from the quarantine.
+
+        :param paths: The light curve paths to release.
+        """
+        if not QuarantinedLightCurve.table_exists():
+            return
+        path_strings = [str(path) for path in paths]
+        with QuarantinedLightCurve._meta.database.atomic():
+            for path_strings_chunk in chunked(path_strings, 500):
+                QuarantinedLightCurve.delete().where(QuarantinedLightCurve.path.in_(path_strings_chunk)).execute()
+
+    @staticmethod
+    def load_quarantined_paths() -> Set[str]:
+        """
+        Loads the paths of all quarantined light curve files. If the metadatabase cannot be opened (e.g., read-only
+        connections to a metadatabase which was never created), no paths are quarantined.
+
+        :return: The set of quarantined path strings.
+        """
+        try:
+            if not QuarantinedLightCurve.table_exists():
+                return set()
+            return {path for (path,) in QuarantinedLightCurve.select(QuarantinedLightCurve.path).tuples()}
+        except OperationalError:
+            return set()
+
+    @staticmethod
+    def is_quarantined(path: Union[Path, str]) -> bool:
+        """
+        Checks if a light curve file is quarantined.
+
+        :param path: The light curve path.
+        :return: Whether the file is quarantined.
+        """
+        try:
+            if not QuarantinedLightCurve.table_exists():
+                return False
+            return QuarantinedLightCurve.select().where(QuarantinedLightCurve.path == str(path)).exists()
+        except OperationalError:
+            return False
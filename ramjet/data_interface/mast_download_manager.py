@@ -0,0 +1,186 @@
+"""
+Code for downloading MAST data products in parallel, resumable from a manifest of completed downloads.
+"""
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Set, Tuple, List
+
+import pandas as pd
+import requests
+from retrying import retry
+
+
+class DownloadSizeMismatchError(Exception):
+    """An exception when a downloaded file does not have the size listed for its data product."""
+    pass
+
+
+class DownloadFailuresError(Exception):
+    """An exception when some data products of a batch could not be downloaded."""
+    pass
+
+
+def is_retryable_download_error(exception: Exception) -> bool:
+    """
+    Returns if the passed exception is a transient error when downloading a file. Made for deciding whether to retry a
+    download. HTTP errors are only transient for rate limiting (429) and server error (5xx) responses.
+
+    :param exception: The exception to check.
+    :return: A boolean stating if the exception is a transient download error.
+    """
+    if isinstance(exception, requests.exceptions.HTTPError):
+        status_code = exception.response.status_code if exception.response is not None else None
+        is_retryable = status_code is not None and (status_code == 429 or status_code >= 500)
+    else:
+        is_retryable = isinstance(exception, (requests.exceptions.ConnectionError,
+                                              requests.exceptions.Timeout,
+                                              requests.exceptions.ChunkedEncodingError,
+                                              ConnectionResetError,
+                                              DownloadSizeMismatchError))
+    if is_retryable:
+        print(f'Retrying download on {exception}...', flush=True)
+    return is_retryable
+
+
+class MastDownloadManager:
+    """
+    A class for downloading MAST data products to a directory. Completed downloads are recorded in a manifest file
+    in the directory, so an interrupted download can be resumed without downloading the completed products again.
+
+    :ivar download_url_template: The template of the URL to download a data product from, given its data URI.
+    :ivar download_worker_count: The maximum number of products downloaded at once.
+    :ivar manifest_file_name: The name of the manifest file within the save directory.
+    :ivar request_timeout: The timeout in seconds for the download requests.
+    :ivar download_chunk_size: The number of bytes read from a response at a time.
+    """
+    def __init__(self):
+        self.download_url_template = 'https://mast.stsci.edu/api/v0.1/Download/file?uri={data_uri}'
+        self.download_worker_count = 8
+        self.manifest_file_name = 'download_manifest.csv'
+        self.request_timeout = 600
+        self.download_chunk_size = 2 ** 20
+        self.thread_local = threading.local()
+
+    def get_session(self) -> requests.Session:
+        """
+        Gets the HTTP session of the current download thread, creating it if needed.
+
+        :return: The session.
+        """
+        if not hasattr(self.thread_local, 'session'):
+            self.thread_local.session = requests.Session()
+        return self.thread_local.session
+
+    def load_manifest(self, save_directory: Path) -> Set[str]:
+        """
+        Loads the file names of the completed downloads from the manifest.
+
+        :param save_directory: The directory the products are downloaded to.
+        :return: The set of completed file names.
+        """
+        manifest_path = save_directory.joinpath(self.manifest_file_name)
+        if not manifest_path.exists():
+            return set()
+        with manifest_path.open(newline='') as manifest_file:
+            return {row[0] for row in csv.reader(manifest_file) if len(row) == 2}
+
+    @staticmethod
+    def is_file_verified(file_path: Path, expected_size: int) -> bool:
+        """
+        Checks if a file exists with the size listed for its data product.
+
+        :param file_path: The path of the file.
+        :param expected_size: The listed size of the data product in bytes.
+        :return: Whether the file is verified.
+        """
+        try:
+            return file_path.stat().st_size == expected_size
+        except FileNotFoundError:
+            return False
+
+    @retry(retry_on_exception=is_retryable_download_error, stop_max_attempt_number=10)
+    def download_product(self, data_uri: str, file_path: Path, expected_size: int) -> int:
+        """
+        Downloads a single data product. The data is written to a temporary file, which is only renamed to the final
+        path once the download is complete and verified. Retries on transient errors.
+
+        :param data_uri: The MAST data URI of the product.
+        :param file_path: The path to save the product to.
+        :param expected_size: The listed size of the data product in bytes.
+        :return: The number of bytes downloaded.
+        """
+        temporary_file_path = file_path.with_name(f'{file_path.name}.part')
+        url = self.download_url_template.format(data_uri=data_uri)
+        with self.get_session().get(url, stream=True, timeout=self.request_timeout) as response:
+            response.raise_for_status()
+            with temporary_file_path.open('wb') as temporary_file:
+                for chunk in response.iter_content(chunk_size=self.download_chunk_size):
+                    temporary_file.write(chunk)
+        if not self.is_file_verified(temporary_file_path, expected_size):
+            temporary_file_path.unlink()
+            raise DownloadSizeMismatchError(f'{data_uri} did not match its listed size of {expected_size} bytes.')
+        os.replace(temporary_file_path, file_path)
+        return expected_size
+
+    def download_products(self, data_products: pd.DataFrame, save_directory: Path) -> Tuple[int, int]:
+        """
+        Downloads data products to a directory in parallel. Products recorded in the manifest, or already present with
+        their listed size, are skipped. Each completed download is appended to the manifest as soon as it finishes. A
+        product which fails to download does not stop the others, and the failures are reported once the batch is done.
+
+        :param data_products: The data products to download. Requires the `dataURI`, `productFilename`, and `size`
+                              columns of a MAST product list.
+        :param save_directory: The directory to save the products to.
+        :return: The number of products downloaded and the number of products skipped.
+        :raises DownloadFailuresError: If any of the products failed to download.
+        """
+        save_directory.mkdir(parents=True, exist_ok=True)
+        completed_file_names = self.load_manifest(save_directory)
+        products_to_download = []
+        newly_verified_file_names = []
+        for data_uri, file_name, size in data_products[['dataURI', 'productFilename', 'size']].itertuples(index=False):
+            file_path = save_directory.joinpath(file_name)
+            if file_name in completed_file_names and file_path.exists():
+                continue
+            if self.is_file_verified(file_path, int(size)):
+                newly_verified_file_names.append(file_name)
+                continue
+            products_to_download.append((data_uri, file_path, int(size)))
+        skipped_count = data_products.shape[0] - len(products_to_download)
+        print(f'{skipped_count} products already downloaded. Downloading {len(products_to_download)} products...',
+              flush=True)
+        downloaded_count = 0
+        downloaded_bytes = 0
+        failures: List[Tuple[str, Exception]] = []
+        start_time = time.perf_counter()
+        with save_directory.joinpath(self.manifest_file_name).open('a', newline='') as manifest_file:
+            manifest_writer = csv.writer(manifest_file)
+            for file_name in newly_verified_file_names:
+                manifest_writer.writerow([file_name, 'verified'])
+            with ThreadPoolExecutor(max_workers=self.download_worker_count) as executor:
+                future_to_file_path = {executor.submit(self.download_product, *product): product[1]
+                                       for product in products_to_download}
+                for future in as_completed(future_to_file_path):
+                    try:
+                        downloaded_bytes += future.result()
+                    except Exception as exception:
+                        failures.append((future_to_file_path[future].name, exception))
+                        continue
+                    downloaded_count += 1
+                    manifest_writer.writerow([future_to_file_path[future].name, 'downloaded'])
+                    manifest_file.flush()
+                    elapsed_time = time.perf_counter() - start_time
+                    print(f'{downloaded_count}/{len(products_to_download)} products downloaded '
+                          f'({downloaded_count / elapsed_time:.1f} products/s, '
+                          f'{downloaded_bytes / elapsed_time / 2 ** 20:.1f} MB/s)...', end='\r', flush=True)
+        print(f'{downloaded_count} products downloaded and {skipped_count} skipped.', flush=True)
+        if len(failures) > 0:
+            for file_name, exception in failures:
+                print(f'Failed to download {file_name}: {exception}', flush=True)
+            raise DownloadFailuresError(f'{len(failures)} of {len(products_to_download)} products failed to download. '
+                                        f'Rerun the download to retry them.')
+        return downloaded_count, skipped_count
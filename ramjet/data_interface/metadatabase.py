@@ -2,14 +2,100 @@
 Code for the the metadatabase.
 """
 import datetime
+import itertools
+import os
+import random
+import sqlite3
+import time
+from collections import deque
+from enum import Enum
+from pathlib import Path
 from uuid import UUID, uuid5
-from typing import Type
+from typing import Type, Callable, List, Dict, Any, Optional, Tuple, Iterable
 
-from peewee import Model, SqliteDatabase, DateTimeField
+import pathos.multiprocessing as multiprocessing
+from peewee import Model, SqliteDatabase, DateTimeField, CharField, IntegerField, FloatField, Field, fn, chunked
+from playhouse.migrate import SqliteMigrator, migrate
 
-metadatabase = SqliteDatabase('data/metadatabase.sqlite3',
-                              pragmas={'journal_mode': 'wal'},
-                              check_same_thread=False)
+
+class MetadatabaseSqliteDatabase(SqliteDatabase):
+    """
+    A SQLite database which lazily opens a separate connection in each process. A connection inherited through a fork
+    is never used (or closed) by the child, which opens its own connection on first use instead. The connections can
+    be opened in read-only mode for processes which only query the metadatabase.
+
+    :ivar read_only: Whether new connections are opened in read-only mode.
+    :ivar immutable: Whether read-only connections treat the database file as unchangeable, skipping all locking.
+                     Only appropriate when no process will write to the database while it is open.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_only: bool = False
+        self.immutable: bool = False
+        self.connections_inherited_from_parent_process: List[sqlite3.Connection] = []
+        os.register_at_fork(after_in_child=self.discard_connection_inherited_from_parent_process)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Opens a new connection to the database, using a read-only URI when in read-only mode.
+
+        :return: The connection.
+        """
+        if not self.read_only:
+            return super()._connect()
+        uri = f'{Path(self.database).absolute().as_uri()}?mode=ro'
+        if self.immutable:
+            uri += '&immutable=1'
+        connection = sqlite3.connect(uri, uri=True, timeout=self._timeout, isolation_level=None,
+                                     **self.connect_params)
+        try:
+            self._add_conn_hooks(connection)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def _set_pragmas(self, connection: sqlite3.Connection):
+        """
+        Sets the pragmas of a new connection. The journal mode can only be changed by a connection which can write, so
+        it is skipped for read-only connections.
+
+        :param connection: The connection.
+        """
+        cursor = connection.cursor()
+        for pragma, value in self._pragmas:
+            if self.read_only and pragma == 'journal_mode':
+                continue
+            cursor.execute(f'PRAGMA {pragma} = {value};')
+        cursor.close()
+
+    def use_read_only_connections(self, immutable: bool = False):
+        """
+        Switches the process to read-only connections. Any open connection is closed, so the next query opens a
+        read-only connection.
+
+        :param immutable: Whether to treat the database file as unchangeable, skipping all locking.
+        """
+        if not self.is_closed():
+            self.close()
+        self.read_only = True
+        self.immutable = immutable
+
+    def discard_connection_inherited_from_parent_process(self):
+        """
+        Drops the connection state inherited through a fork, so the child process lazily opens its own connection. The
+        inherited connection is kept referenced rather than closed, as closing it in the child can release the parent's
+        file locks.
+        """
+        if self._state.conn is not None:
+            self.connections_inherited_from_parent_process.append(self._state.conn)
+        self._state.reset()
+
+
+metadatabase = MetadatabaseSqliteDatabase('data/metadatabase.sqlite3',
+                                          pragmas={'journal_mode': 'wal',
+                                                   'mmap_size': 2 ** 30},  # Memory-mapped reads of up to 1GB.
+                                          check_same_thread=False)
 metadatabase_uuid_namespace = UUID('ed5c78c4-d8dd-4525-9633-97beac696cd1')
 
 
@@ -53,3 +139,332 @@ def dataset_split_from_uuid(uuid: UUID) -> int:
     :return: The dataset split.
     """
     return uuid.int % 10
+
+
+random_order_minimum_value = -2 ** 63
+random_order_maximum_value = 2 ** 63 - 1  # Matches the range of SQLite's `random()`.
+
+
+def create_random_order_value() -> int:
+    """
+    Creates a random value for a random order column. Used as the default of the random order fields, so the rows
+    inserted between re-randomizations still receive a random position.
+
+    :return: The random value.
+    """
+    return random.randint(random_order_minimum_value, random_order_maximum_value)
+
+
+def add_missing_random_order_field(model_class: Type[MetadatabaseModel], random_order_field: Field):
+    """
+    Adds the random order column and its index to a table created before the field existed. Must be run before any
+    rows are written through the model, as the model's inserts include the column.
+
+    :param model_class: The model of the table.
+    :param random_order_field: The random order field of the model.
+    """
+    table_name = model_class._meta.table_name
+    column_names = [column.name for column in metadatabase.get_columns(table_name)]
+    if random_order_field.column_name not in column_names:
+        migrator = SqliteMigrator(metadatabase)
+        migrate(migrator.add_column(table_name, random_order_field.column_name,
+                                    IntegerField(default=random_order_minimum_value)),
+                migrator.add_index(table_name, (random_order_field.column_name,), False))
+
+
+def rerandomize_random_order_field(model_class: Type[MetadatabaseModel], random_order_field: Field):
+    """
+    Assigns new random values to the random order field of every row in a table. If the table was created before the
+    field existed, the column and its index are added first.
+
+    :param model_class: The model of the table.
+    :param random_order_field: The random order field of the model.
+    """
+    add_missing_random_order_field(model_class, random_order_field)
+    model_class.update({random_order_field: fn.random()}).execute()
+
+
+class BulkUpsertConflictAction(Enum):
+    """
+    An enum of the actions taken when a bulk upserted row conflicts with an existing row.
+    """
+    REPLACE = 'replace'
+    IGNORE = 'ignore'
+    UPDATE = 'update'
+
+
+def bulk_upsert(model_class: Type[MetadatabaseModel], row_dictionaries: Iterable[Dict[str, Any]],
+                conflict_action: BulkUpsertConflictAction = BulkUpsertConflictAction.REPLACE,
+                conflict_target: Optional[List[Field]] = None, batch_size: int = 10000) -> int:
+    """
+    Inserts rows into a table within a single transaction. Peewee generates the insert statement (including its
+    conflict clause) once from the fields of the first row, and the statement is then executed for every row using
+    `executemany`. This avoids Peewee generating SQL for every row value, and each statement only uses one variable
+    per field, so the rows are never limited by SQLite's variable limit.
+
+    :param model_class: The model of the table.
+    :param row_dictionaries: The rows to insert. All rows should contain the same fields.
+    :param conflict_action: The action to take when a row conflicts with an existing row. `REPLACE` deletes the
+                            existing row, `IGNORE` skips the new row, and `UPDATE` updates the existing row's fields
+                            which are in the new row but not in the conflict target.
+    :param conflict_target: The unique fields a conflict is detected on. Required for the `UPDATE` action.
+    :param batch_size: The number of rows to convert and pass to `executemany` at a time.
+    :return: The number of rows written.
+    """
+    row_dictionary_iterator = iter(row_dictionaries)
+    first_row_dictionary = next(row_dictionary_iterator, None)
+    if first_row_dictionary is None:
+        return 0
+    fields = [field for field in model_class._meta.sorted_fields
+              if field.name in first_row_dictionary or field.default is not None]
+
+    def create_row_values(row_dictionary: Dict[str, Any]) -> Tuple:
+        """Converts a row dictionary to the database values of the statement's fields, filling in defaults."""
+        row_values = []
+        for field in fields:
+            if field.name in row_dictionary:
+                value = row_dictionary[field.name]
+            elif callable(field.default):
+                value = field.default()
+            else:
+                value = field.default
+            row_values.append(field.db_value(value))
+        return tuple(row_values)
+
+    query = model_class.insert_many([create_row_values(first_row_dictionary)], fields=fields)
+    if conflict_action == BulkUpsertConflictAction.REPLACE:
+        query = query.on_conflict_replace()
+    elif conflict_action == BulkUpsertConflictAction.IGNORE:
+        query = query.on_conflict_ignore()
+    else:
+        conflict_target_names = [field.name for field in conflict_target]
+        update_fields = [field for field in fields
+                         if field.name in first_row_dictionary and field.name not in conflict_target_names]
+        query = query.on_conflict(conflict_target=conflict_target, preserve=update_fields)
+    sql, _ = query.sql()
+    database = model_class._meta.database
+    row_count = 0
+    with database.atomic():
+        all_row_dictionaries = itertools.chain([first_row_dictionary], row_dictionary_iterator)
+        for batch_row_dictionaries in chunked(all_row_dictionaries, batch_size):
+            cursor = database.cursor()
+            cursor.executemany(sql, [create_row_values(row_dictionary) for row_dictionary in batch_row_dictionaries])
+            row_count += cursor.rowcount
+    return row_count
+
+
+class MetadatabaseTableGeneration(MetadatabaseModel):
+    """
+    A model for the generation counters of the metadatabase tables. A table's generation is incremented each time
+    the table is built or refreshed, so results computed from the table can be invalidated.
+    """
+    table_name = CharField(unique=True)
+    generation = IntegerField()
+
+
+def bump_table_generation(model_class: Type[MetadatabaseModel]):
+    """
+    Increments the generation counter of a table. Should be called after every change to the table's contents.
+
+    :param model_class: The model of the table.
+    """
+    MetadatabaseTableGeneration.create_table()
+    table_name = model_class._meta.table_name
+    MetadatabaseTableGeneration.insert(table_name=table_name, generation=1).on_conflict(
+        conflict_target=[MetadatabaseTableGeneration.table_name],
+        update={MetadatabaseTableGeneration.generation: MetadatabaseTableGeneration.generation + 1}).execute()
+
+
+def get_table_generations() -> Tuple[Tuple[str, int], ...]:
+    """
+    Gets the generation counters of all the tables.
+
+    :return: The pairs of table name and generation, sorted by table name.
+    """
+    if not MetadatabaseTableGeneration.table_exists():
+        return ()
+    query = MetadatabaseTableGeneration.select(MetadatabaseTableGeneration.table_name,
+                                               MetadatabaseTableGeneration.generation)
+    return tuple(query.order_by(MetadatabaseTableGeneration.table_name).tuples())
+
+
+class MetadataFileManifestEntry(MetadatabaseModel):
+    """
+    A model for the manifest of the files which have been included in the file based metadatabase tables. Allows the
+    tables to be refreshed incrementally based on the files which are new, changed, or have vanished.
+    """
+    table_name = CharField()
+    path = CharField()
+    size = IntegerField()
+    modification_time = FloatField()
+
+    class Meta:
+        """Schema meta data for the model."""
+        indexes = (
+            (('table_name', 'path'), True),
+        )
+
+
+FileState = Tuple[str, int, float]  # The path relative to the root directory, the size, and the modification time.
+
+
+def scan_directory_file_states(directory_path: Path, root_directory_path: Path,
+                               file_name_filter: Callable[[str], bool]) -> List[FileState]:
+    """
+    Scans a directory (non-recursively) for the states of the files used for a metadatabase table.
+
+    :param directory_path: The directory to scan.
+    :param root_directory_path: The root directory the paths should be made relative to.
+    :param file_name_filter: A function which determines from the file name whether a file should be included.
+    :return: The list of file states.
+    """
+    file_states = []
+    with os.scandir(directory_path) as directory_entries:
+        for entry in directory_entries:
+            if file_name_filter(entry.name) and entry.is_file():
+                stat_result = entry.stat()
+                relative_path = Path(entry.path).relative_to(root_directory_path)
+                file_states.append((str(relative_path), stat_result.st_size, stat_result.st_mtime))
+    return file_states
+
+
+def get_directory_prefix(relative_directory_path: Path) -> str:
+    """
+    Gets the path string prefix of the files directly within a directory, relative to the root directory.
+
+    :param relative_directory_path: The directory path relative to the root directory.
+    :return: The prefix string.
+    """
+    relative_directory_string = str(relative_directory_path)
+    if relative_directory_string in ('', '.'):
+        return ''
+    return relative_directory_string + os.sep
+
+
+def load_file_manifest_for_directory(table_name: str, relative_directory_path: Path) -> Dict[str, Tuple[int, float]]:
+    """
+    Loads the manifest entries of the files directly within a directory.
+
+    :param table_name: The name of the table the manifest is for.
+    :param relative_directory_path: The directory path relative to the root directory.
+    :return: The dictionary from the relative path to the size and modification time.
+    """
+    prefix = get_directory_prefix(relative_directory_path)
+    query = MetadataFileManifestEntry.select(MetadataFileManifestEntry.path, MetadataFileManifestEntry.size,
+                                             MetadataFileManifestEntry.modification_time
+                                             ).where(MetadataFileManifestEntry.table_name == table_name)
+    if prefix != '':
+        prefix_upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        query = query.where((MetadataFileManifestEntry.path >= prefix) &
+                            (MetadataFileManifestEntry.path < prefix_upper_bound))
+    manifest = {}
+    for path, size, modification_time in query.tuples().iterator():
+        if os.sep not in path[len(prefix):]:  # Only the files directly within the directory.
+            manifest[path] = (size, modification_time)
+    return manifest
+
+
+def clear_file_manifest(model_class: Type[MetadatabaseModel]):
+    """
+    Removes all the manifest entries for a table.
+
+    :param model_class: The model of the table.
+    """
+    MetadataFileManifestEntry.create_table()
+    table_name = convert_class_to_table_name(model_class)
+    MetadataFileManifestEntry.delete().where(MetadataFileManifestEntry.table_name == table_name).execute()
+
+
+def delete_rows_and_manifest_entries_for_paths(model_class: Type[MetadatabaseModel], path_field: Field,
+                                               relative_paths: List[str], delete_batch_size: int = 500):
+    """
+    Deletes the table rows and manifest entries of a list of paths.
+
+    :param model_class: The model of the table.
+    :param path_field: The field of the model containing the relative path.
+    :param relative_paths: The paths to delete.
+    :param delete_batch_size: The number of paths to delete in a single statement.
+    """
+    table_name = convert_class_to_table_name(model_class)
+    for batch_start_index in range(0, len(relative_paths), delete_batch_size):
+        batch_paths = relative_paths[batch_start_index:batch_start_index + delete_batch_size]
+        model_class.delete().where(path_field.in_(batch_paths)).execute()
+        MetadataFileManifestEntry.delete().where((MetadataFileManifestEntry.table_name == table_name) &
+                                                 (MetadataFileManifestEntry.path.in_(batch_paths))).execute()
+
+
+def refresh_rows_from_files_in_parallel(model_class: Type[MetadatabaseModel], path_field: Field,
+                                        scan_directory_function: Callable[[Path], List[FileState]],
+                                        row_dictionaries_function: Callable[[List[Path]], List[Dict[str, Any]]],
+                                        directory_paths: List[Path], number_of_processes: Optional[int] = None,
+                                        files_per_task: int = 1000) -> (int, int):
+    """
+    Brings a file based table up to date with the files on disk. The directories are scanned in a process pool,
+    the scanned file states are compared to the file manifest, and only new or changed files have their rows
+    produced (again in the process pool). The calling process acts as the single writer, inserting the rows,
+    deleting the rows of vanished files, and updating the manifest. Existing indexes are left in place. Progress and
+    throughput are reported as rows are inserted.
+
+    :param model_class: The model of the table to refresh.
+    :param path_field: The field of the model containing the path relative to the root directory.
+    :param scan_directory_function: The function run by the workers which scans a directory for its file states.
+    :param row_dictionaries_function: The function run by the workers which produces the row dictionaries for a
+                                      list of relative paths.
+    :param directory_paths: The directories to scan.
+    :param number_of_processes: The number of worker processes. Defaults to the number of CPUs.
+    :param files_per_task: The number of files to produce rows for in a single worker task.
+    :return: The number of rows inserted and the number of rows deleted.
+    """
+    MetadataFileManifestEntry.create_table()
+    table_name = convert_class_to_table_name(model_class)
+    inserted_count = 0
+    deleted_count = 0
+    start_time = time.perf_counter()
+    pending_row_results = deque()
+    scanned_directory_prefixes = set()
+
+    def insert_row_result(row_result, file_states: List[FileState]):
+        """Inserts the rows of a completed row production task and records the files in the manifest."""
+        nonlocal inserted_count
+        row_dictionaries = row_result.get()
+        bulk_upsert(model_class, row_dictionaries)
+        manifest_rows = [{'table_name': table_name, 'path': path, 'size': size,
+                          'modification_time': modification_time}
+                         for path, size, modification_time in file_states]
+        bulk_upsert(MetadataFileManifestEntry, manifest_rows)
+        inserted_count += len(row_dictionaries)
+        elapsed_time = time.perf_counter() - start_time
+        print(f'{inserted_count} rows inserted ({inserted_count / max(elapsed_time, 1e-9):.0f} rows/s)...',
+              end='\r', flush=True)
+
+    with multiprocessing.Pool(number_of_processes) as pool:
+        with metadatabase.atomic():
+            for directory_file_states in pool.imap(scan_directory_function, directory_paths):
+                if len(directory_file_states) == 0:
+                    continue
+                relative_directory_path = Path(directory_file_states[0][0]).parent
+                scanned_directory_prefixes.add(get_directory_prefix(relative_directory_path))
+                manifest = load_file_manifest_for_directory(table_name, relative_directory_path)
+                changed_file_states = [file_state for file_state in directory_file_states
+                                       if manifest.get(file_state[0]) != (file_state[1], file_state[2])]
+                current_paths = {file_state[0] for file_state in directory_file_states}
+                vanished_paths = [path for path in manifest.keys() if path not in current_paths]
+                delete_rows_and_manifest_entries_for_paths(model_class, path_field, vanished_paths)
+                deleted_count += len(vanished_paths)
+                for batch_start_index in range(0, len(changed_file_states), files_per_task):
+                    batch_file_states = changed_file_states[batch_start_index:batch_start_index + files_per_task]
+                    batch_paths = [Path(file_state[0]) for file_state in batch_file_states]
+                    row_result = pool.apply_async(row_dictionaries_function, (batch_paths,))
+                    pending_row_results.append((row_result, batch_file_states))
+                while len(pending_row_results) > 0 and pending_row_results[0][0].ready():
+                    insert_row_result(*pending_row_results.popleft())
+            while len(pending_row_results) > 0:
+                insert_row_result(*pending_row_results.popleft())
+            vanished_directory_paths = [
+                path for (path,) in MetadataFileManifestEntry.select(MetadataFileManifestEntry.path).where(
+                    MetadataFileManifestEntry.table_name == table_name).tuples().iterator()
+                if get_directory_prefix(Path(path).parent) not in scanned_directory_prefixes]
+            delete_rows_and_manifest_entries_for_paths(model_class, path_field, vanished_directory_paths)
+            deleted_count += len(vanished_directory_paths)
+    print(f'{inserted_count} rows inserted and {deleted_count} rows deleted.', flush=True)
+    return inserted_count, deleted_count
@@ -7,9 +7,10 @@ from collections import defaultdict
 from typing import List, Dict, Union
 from pathlib import Path
 
-import requests
 from bs4 import BeautifulSoup
 
+from ramjet.data_interface.response_cache import response_cache, ResponseCacheSource, fetch_url_content
+
 
 class MoaDataInterface:
     """
@@ -84,13 +85,15 @@ class MoaDataInterface:
     def get_yuki_hirao_events_data_frame() -> pd.DataFrame:
         """
         Loads the events data from Yuki Hirao's website of events
-        (http://iral2.ess.sci.osaka-u.ac.jp/~moa/anomaly/9year/).
+        (http://iral2.ess.sci.osaka-u.ac.jp/~moa/anomaly/9year/). The page is served from the response cache when
+        available.
 
         :return: The data frame of the events.
         """
         url = 'http://iral2.ess.sci.osaka-u.ac.jp/~moa/anomaly/9year/'
-        page = requests.get(url)
-        soup = BeautifulSoup(page.content, 'lxml')
+        page_content = response_cache.get_or_fetch(ResponseCacheSource.MOA_EVENTS, url,
+                                                   lambda: fetch_url_content(url))
+        soup = BeautifulSoup(page_content, 'lxml')
         tbl = soup.find("table")
         events_data_frame = pd.read_html(str(tbl))[0]
         events_data_frame[['field', 'clr', 'chip', 'subfield', 'id']] = events_data_frame['MOA INTERNAL ID'].str.split(
@@ -0,0 +1,136 @@
+"""
+Code for caching the responses of external catalog and archive lookups on disk.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+
+class ResponseCacheSource(Enum):
+    """
+    An enum of the external sources whose responses are cached. Each source has its own time to live.
+    """
+    EXOFOP_DISPOSITIONS = 'exofop_dispositions'
+    EXOFOP_NEARBY_TARGETS = 'exofop_nearby_targets'
+    GAIA = 'gaia'
+    MOA_EVENTS = 'moa_events'
+
+
+day__seconds = 24 * 60 * 60
+
+
+class ResponseCache:
+    """
+    A class for a disk backed cache of external lookup responses. Each entry is stored as a pickle file under a
+    directory per source, and expires after the time to live of its source. Entries are written to a temporary file
+    and atomically renamed into place, so concurrent processes never read partially written entries.
+
+    :ivar cache_directory: The directory the cache entries are stored in.
+    :ivar time_to_live_per_source: The number of seconds an entry of each source remains valid.
+    """
+    def __init__(self, cache_directory: Path = Path('data/response_cache')):
+        self.cache_directory: Path = cache_directory
+        self.time_to_live_per_source: Dict[ResponseCacheSource, float] = {
+            ResponseCacheSource.EXOFOP_DISPOSITIONS: 1 * day__seconds,
+            ResponseCacheSource.EXOFOP_NEARBY_TARGETS: 7 * day__seconds,
+            ResponseCacheSource.GAIA: 90 * day__seconds,
+            ResponseCacheSource.MOA_EVENTS: 7 * day__seconds,
+        }
+
+    def get_entry_path(self, source: ResponseCacheSource, key: Any) -> Path:
+        """
+        Gets the path of the cache entry for a lookup.
+
+        :param source: The source of the lookup.
+        :param key: The key uniquely identifying the lookup within the source. Converted to a string for hashing.
+        :return: The path of the entry.
+        """
+        key_hash = hashlib.sha256(str(key).encode('utf-8')).hexdigest()
+        return self.cache_directory.joinpath(source.value, f'{key_hash}.pkl')
+
+    def load(self, source: ResponseCacheSource, key: Any) -> Optional[Any]:
+        """
+        Loads an unexpired cache entry.
+
+        :param source: The source of the lookup.
+        :param key: The key uniquely identifying the lookup within the source.
+        :return: The cached response, or None if there is no unexpired entry.
+        """
+        entry_path = self.get_entry_path(source, key)
+        try:
+            if time.time() - entry_path.stat().st_mtime > self.time_to_live_per_source[source]:
+                return None
+            with entry_path.open('rb') as entry_file:
+                return pickle.load(entry_file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def save(self, source: ResponseCacheSource, key: Any, response: Any):
+        """
+        Saves a cache entry, replacing any existing entry for the lookup.
+
+        :param source: The source of the lookup.
+        :param key: The key uniquely identifying the lookup within the source.
+        :param response: The response to cache.
+        """
+        entry_path = self.get_entry_path(source, key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=entry_path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as temporary_file:
+                pickle.dump(response, temporary_file)
+            os.replace(temporary_path, entry_path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def get_or_fetch(self, source: ResponseCacheSource, key: Any, fetch_function: Callable[[], Any],
+                     refresh: bool = False) -> Any:
+        """
+        Gets the response of a lookup from the cache, fetching and caching it if there is no unexpired entry.
+
+        :param source: The source of the lookup.
+        :param key: The key uniquely identifying the lookup within the source.
+        :param fetch_function: The function to fetch the response from the source.
+        :param refresh: Whether to fetch the response even if there is an unexpired entry, replacing the entry.
+        :return: The response.
+        """
+        response = None if refresh else self.load(source, key)
+        if response is None:
+            response = fetch_function()
+            self.save(source, key, response)
+        return response
+
+    def clear(self, source: Optional[ResponseCacheSource] = None):
+        """
+        Removes the cache entries.
+
+        :param source: The source to remove the entries of. Defaults to all sources.
+        """
+        sources = list(ResponseCacheSource) if source is None else [source]
+        for source_ in sources:
+            for entry_path in self.cache_directory.joinpath(source_.value).glob('*.pkl'):
+                entry_path.unlink(missing_ok=True)
+
+
+def fetch_url_content(url: str) -> bytes:
+    """
+    Downloads the content of a URL. Unsuccessful responses raise an error rather than returning their content, so error
+    pages are never stored in the response cache.
+
+    :param url: The URL to download.
+    :return: The content of the response.
+    """
+    response = requests.get(url)
+    response.raise_for_status()
+    return response.content
+
+
+response_cache = ResponseCache()
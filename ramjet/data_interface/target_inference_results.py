@@ -0,0 +1,154 @@
+"""
+Code for the tables of per-target inference results and their aggregation across sectors. The tables are kept in their
+own database rather than the metadatabase, so inference can write results while its metadatabase connections stay
+read-only.
+"""
+from typing import Iterable, Optional, Set, Tuple
+
+import pandas as pd
+from peewee import IntegerField, CharField, FloatField, fn, chunked
+
+from ramjet.data_interface.metadatabase import MetadatabaseModel, MetadatabaseSqliteDatabase, bulk_upsert
+
+target_inference_results_database = MetadatabaseSqliteDatabase('data/target_inference_results.sqlite3',
+                                                               pragmas={'journal_mode': 'wal'},
+                                                               check_same_thread=False)
+
+
+class TargetInferenceResultsModel(MetadatabaseModel):
+    """
+    A general model for the target inference results tables.
+    """
+    class Meta:
+        """The meta information for the target inference results models."""
+        database = target_inference_results_database
+
+
+class TargetInferenceResult(TargetInferenceResultsModel):
+    """
+    A model for the table of the inference confidences of light curves, keyed by target, sector, and model checkpoint.
+    """
+    tic_id = IntegerField()
+    sector = IntegerField()
+    model_checkpoint = CharField()
+    light_curve_path = CharField()
+    confidence = FloatField()
+
+    class Meta:
+        """Schema meta data for the model."""
+        indexes = (
+            (('model_checkpoint', 'tic_id', 'sector'), True),
+        )
+
+
+class TargetInferenceAggregate(TargetInferenceResultsModel):
+    """
+    A model for the table of the inference confidences of targets aggregated across their sectors.
+    """
+    tic_id = IntegerField()
+    model_checkpoint = CharField()
+    maximum_confidence = FloatField()
+    mean_confidence = FloatField()
+    sector_count = IntegerField()
+
+    class Meta:
+        """Schema meta data for the model."""
+        indexes = (
+            (('model_checkpoint', 'tic_id'), True),
+            (('model_checkpoint', 'maximum_confidence'), False),
+        )
+
+
+class TargetInferenceResultsManager:
+    """
+    A class for storing per-sector inference results and maintaining their per-target aggregates. Only the aggregates
+    of the targets with new results are recomputed when results are saved, so adding a sector does not reprocess the
+    earlier sectors.
+
+    :ivar query_chunk_size: The number of TIC IDs per aggregation query.
+    """
+    def __init__(self):
+        self.query_chunk_size = 500
+
+    @staticmethod
+    def create_tables():
+        """
+        Creates the inference result tables if they do not exist.
+        """
+        TargetInferenceResult.create_table()
+        TargetInferenceAggregate.create_table()
+
+    @staticmethod
+    def load_inferred_tic_id_and_sector_pairs(model_checkpoint: str) -> Set[Tuple[int, int]]:
+        """
+        Loads the target and sector pairs which already have results for a model checkpoint.
+
+        :param model_checkpoint: The identifier of the model checkpoint.
+        :return: The set of TIC ID and sector pairs.
+        """
+        if not TargetInferenceResult.table_exists():
+            return set()
+        query = TargetInferenceResult.select(TargetInferenceResult.tic_id, TargetInferenceResult.sector).where(
+            TargetInferenceResult.model_checkpoint == model_checkpoint)
+        return set(query.tuples())
+
+    def save_results(self, results_data_frame: pd.DataFrame, model_checkpoint: str):
+        """
+        Saves per-sector inference results, replacing existing results of the same target, sector, and checkpoint, and
+        updates the aggregates of the affected targets.
+
+        :param results_data_frame: The data frame of results, with `tic_id`, `sector`, `light_curve_path`, and
+                                   `confidence` columns.
+        :param model_checkpoint: The identifier of the model checkpoint the results were inferred with.
+        """
+        self.create_tables()
+        row_dictionaries = [{'tic_id': int(row.tic_id), 'sector': int(row.sector),
+                             'model_checkpoint': model_checkpoint, 'light_curve_path': str(row.light_curve_path),
+                             'confidence': float(row.confidence)}
+                            for row in results_data_frame.itertuples(index=False)]
+        bulk_upsert(TargetInferenceResult, row_dictionaries)
+        self.update_aggregates(results_data_frame['tic_id'].unique().tolist(), model_checkpoint)
+
+    def update_aggregates(self, tic_ids: Iterable[int], model_checkpoint: str):
+        """
+        Recomputes the aggregates of targets from their per-sector results.
+
+        :param tic_ids: The TIC IDs of the targets to update.
+        :param model_checkpoint: The identifier of the model checkpoint.
+        """
+        with TargetInferenceAggregate._meta.database.atomic():
+            for chunk_tic_ids in chunked((int(tic_id) for tic_id in tic_ids), self.query_chunk_size):
+                query = TargetInferenceResult.select(
+                    TargetInferenceResult.tic_id,
+                    fn.MAX(TargetInferenceResult.confidence),
+                    fn.AVG(TargetInferenceResult.confidence),
+                    fn.COUNT(TargetInferenceResult.sector)
+                ).where((TargetInferenceResult.model_checkpoint == model_checkpoint) &
+                        (TargetInferenceResult.tic_id.in_(chunk_tic_ids))
+                        ).group_by(TargetInferenceResult.tic_id)
+                bulk_upsert(TargetInferenceAggregate, [
+                    {'tic_id': tic_id, 'model_checkpoint': model_checkpoint, 'maximum_confidence': maximum_confidence,
+                     'mean_confidence': mean_confidence, 'sector_count': sector_count}
+                    for tic_id, maximum_confidence, mean_confidence, sector_count in query.tuples()])
+
+    @staticmethod
+    def load_ranked_targets(model_checkpoint: str, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Loads the target aggregates of a model checkpoint, ranked by their maximum confidence.
+
+        :param model_checkpoint: The identifier of the model checkpoint.
+        :param limit: The number of top targets to load. None loads all targets.
+        :return: The data frame of the `tic_id`, `maximum_confidence`, `mean_confidence`, and `sector_count` of the
+                 targets.
+        """
+        columns = ['tic_id', 'maximum_confidence', 'mean_confidence', 'sector_count']
+        if not TargetInferenceAggregate.table_exists():
+            return pd.DataFrame(columns=columns)
+        query = TargetInferenceAggregate.select(
+            TargetInferenceAggregate.tic_id, TargetInferenceAggregate.maximum_confidence,
+            TargetInferenceAggregate.mean_confidence, TargetInferenceAggregate.sector_count
+        ).where(TargetInferenceAggregate.model_checkpoint == model_checkpoint).order_by(
+            TargetInferenceAggregate.maximum_confidence.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        return pd.DataFrame(list(query.tuples()), columns=columns)
@@ -0,0 +1,86 @@
+"""
+Code for caching TESScut target pixel file cutouts on disk.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+
+from lightkurve.targetpixelfile import TargetPixelFile, TessTargetPixelFile
+
+
+class TessCutCache:
+    """
+    A class for a size capped, least recently used, on-disk cache of TESScut cutouts, keyed by TIC ID, sector, and
+    cutout size. Cached cutouts are opened memory mapped in copy-on-write mode, so only the accessed frames are read
+    from disk and modifications never reach the cached file.
+
+    :ivar cache_directory: The directory the cutouts are stored in.
+    :ivar maximum_cache_size: The maximum total size of the cached cutouts in bytes. The least recently used cutouts are
+                              evicted when the cap is exceeded.
+    """
+    def __init__(self, cache_directory: Path = Path('data/tess_cut_cache'), maximum_cache_size: int = 20 * 2 ** 30):
+        self.cache_directory: Path = cache_directory
+        self.maximum_cache_size: int = maximum_cache_size
+
+    def get_cutout_path(self, tic_id: int, sector: Optional[int], cutout_size: int) -> Path:
+        """
+        Gets the cache path of a cutout.
+
+        :param tic_id: The TIC ID of the cutout target.
+        :param sector: The sector of the cutout. None for the first available sector.
+        :param cutout_size: The side length of the cutout in pixels.
+        :return: The path of the cached cutout.
+        """
+        sector_string = 'first' if sector is None else str(sector)
+        return self.cache_directory.joinpath(f'tic_{tic_id}_sector_{sector_string}_size_{cutout_size}.fits')
+
+    def load_target_pixel_file(self, tic_id: int, sector: Optional[int], cutout_size: int,
+                               download_function: Callable[[Path], Optional[TargetPixelFile]]
+                               ) -> Optional[TargetPixelFile]:
+        """
+        Loads a cutout from the cache, downloading it into the cache on a miss.
+
+        :param tic_id: The TIC ID of the cutout target.
+        :param sector: The sector of the cutout. None for the first available sector.
+        :param cutout_size: The side length of the cutout in pixels.
+        :param download_function: The function to download the cutout, given a directory to download it to.
+        :return: The target pixel file, or None if no cutout is available.
+        """
+        cutout_path = self.get_cutout_path(tic_id, sector, cutout_size)
+        if cutout_path.exists():
+            os.utime(cutout_path)  # Mark the cutout as recently used.
+        else:
+            self.cache_directory.mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=self.cache_directory) as download_directory:
+                downloaded_target_pixel_file = download_function(Path(download_directory))
+                if downloaded_target_pixel_file is None:
+                    return None
+                downloaded_target_pixel_file.hdu.close()
+                temporary_cutout_path = Path(download_directory).joinpath(cutout_path.name)
+                shutil.move(downloaded_target_pixel_file.path, temporary_cutout_path)
+                os.replace(temporary_cutout_path, cutout_path)
+            self.evict_least_recently_used_cutouts(keep_path=cutout_path)
+        return TessTargetPixelFile(str(cutout_path), memmap=True, mode='copyonwrite')
+
+    def evict_least_recently_used_cutouts(self, keep_path: Optional[Path] = None):
+        """
+        Removes the least recently used cutouts until the cache is within its size cap.
+
+        :param keep_path: A cutout path which should not be evicted.
+        """
+        cutout_stats = []
+        for cutout_path in self.cache_directory.glob('*.fits'):
+            try:
+                cutout_stats.append((cutout_path, cutout_path.stat()))
+            except FileNotFoundError:  # Evicted by another process.
+                continue
+        cache_size = sum(stat.st_size for _, stat in cutout_stats)
+        for cutout_path, stat in sorted(cutout_stats, key=lambda path_and_stat: path_and_stat[1].st_mtime):
+            if cache_size <= self.maximum_cache_size:
+                break
+            if cutout_path == keep_path:
+                continue
+            cutout_path.unlink(missing_ok=True)
+            cache_size -= stat.st_size
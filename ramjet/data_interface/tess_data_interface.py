@@ -13,9 +13,10 @@ import re
 import shutil
 import sys
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
-from typing import Union, List, Dict
+from typing import Union, List, Dict, Callable, Sequence
 import numpy as np
 import pandas as pd
 import requests
@@ -29,6 +30,8 @@ from bokeh.io import show
 from retrying import retry
 from bokeh.plotting import Figure
 
+from ramjet.data_interface.mast_download_manager import MastDownloadManager
+from ramjet.data_interface.tess_light_curve_product_catalog import TessLightCurveProductCatalog
 from ramjet.analysis.light_curve_visualizer import plot_light_curve, create_dual_light_curve_figure
 
 
@@ -89,6 +92,7 @@ class TessDataInterface:
         except AttributeError:
             pass
         self.mast_input_query_chunk_size = 1000
+        self.mast_query_worker_count = 4
 
     def get_all_tess_time_series_observations(self, tic_id: Union[int, List[int]] = None) -> pd.DataFrame:
         """
@@ -101,15 +105,26 @@ class TessDataInterface:
         if tic_id is None or np.isscalar(tic_id):
             observations = self.get_all_tess_time_series_observations_chunk(tic_id)
         else:
-            observations = None
-            for tic_id_list_chunk in np.array_split(tic_id, math.ceil(len(tic_id) / self.mast_input_query_chunk_size)):
-                observations_chunk = self.get_all_tess_time_series_observations_chunk(tic_id_list_chunk)
-                if observations is None:
-                    observations = observations_chunk
-                else:
-                    observations = observations.append(observations_chunk, ignore_index=True)
+            tic_id_list_chunks = np.array_split(tic_id, math.ceil(len(tic_id) / self.mast_input_query_chunk_size))
+            observations = self.run_chunked_mast_query(self.get_all_tess_time_series_observations_chunk,
+                                                       tic_id_list_chunks)
         return observations
 
+    def run_chunked_mast_query(self, chunk_query_function: Callable[[object], pd.DataFrame],
+                               query_input_chunks: Sequence) -> pd.DataFrame:
+        """
+        Runs a MAST query for each chunk of a large query input concurrently, with at most `mast_query_worker_count`
+        chunk queries in flight at once. Each chunk query keeps its own retry policy. The chunk results are combined
+        in the order of the chunks.
+
+        :param chunk_query_function: The function which queries MAST for a single chunk.
+        :param query_input_chunks: The chunks of the query input.
+        :return: The combined query results.
+        """
+        with ThreadPoolExecutor(max_workers=self.mast_query_worker_count) as executor:
+            result_chunks = list(executor.map(chunk_query_function, query_input_chunks))
+        return pd.concat(result_chunks, ignore_index=True)
+
     @staticmethod
     @retry(retry_on_exception=is_common_mast_connection_error, stop_max_attempt_number=10)
     def get_all_tess_time_series_observations_chunk(tic_id: Union[int, List[int]] = None) -> pd.DataFrame:
@@ -136,14 +151,9 @@ class TessDataInterface:
         :return: The data frame of the product list. Will be converted from Table to DataFrame for use.
         """
         if observations.shape[0] > 1:
-            product_list = None
-            for observations_chunk in np.array_split(observations,
-                                                     math.ceil(observations.shape[0] / self.mast_input_query_chunk_size)):
-                product_list_chunk = self.get_product_list_chunk(observations_chunk)
-                if product_list is None:
-                    product_list = product_list_chunk
-                else:
-                    product_list = product_list.append(product_list_chunk, ignore_index=True)
+            observations_chunks = np.array_split(observations,
+                                                 math.ceil(observations.shape[0] / self.mast_input_query_chunk_size))
+            product_list = self.run_chunked_mast_query(self.get_product_list_chunk, observations_chunks)
         else:
             product_list = self.get_product_list_chunk(observations)
         return product_list
@@ -328,7 +338,8 @@ class TessDataInterface:
     def download_two_minute_cadence_light_curve(self, tic_id: int, sector: int = None,
                                                save_directory: Union[Path, str] = None) -> Path:
         """
-        Downloads a light curve from MAST.
+        Downloads a light curve from MAST. The light curve product is resolved from the local catalog snapshot when
+        available, and from MAST queries otherwise.
 
         :param tic_id: The TIC ID of the light curve target to download.
         :param sector: The sector to download. If not specified, downloads first available sector.
@@ -336,6 +347,16 @@ class TessDataInterface:
                                directory.
         :return: The path to the downloaded file.
         """
+        if TessLightCurveProductCatalog.is_available():
+            sectors = None if sector is None else [sector]
+            light_curve_data_products = TessLightCurveProductCatalog.get_light_curve_data_products([tic_id], sectors)
+            if light_curve_data_products.shape[0] > 0:
+                if save_directory is None:
+                    save_directory = tempfile.gettempdir()
+                save_directory = Path(save_directory)
+                light_curve_data_products = light_curve_data_products.head(1)
+                MastDownloadManager().download_products(light_curve_data_products, save_directory=save_directory)
+                return save_directory.joinpath(light_curve_data_products['productFilename'].iloc[0])
         observations = self.get_all_tess_time_series_observations(tic_id=tic_id)
         single_sector_observations = self.filter_for_single_sector_observations(observations)
         two_minute_observations = self.filter_out_twenty_second_cadence_observations(single_sector_observations)
@@ -448,6 +469,17 @@ class TessDataInterface:
         target_observations = Catalogs.query_criteria(catalog='TIC', ID=tic_id).to_pandas()
         return target_observations.iloc[0]
 
+    @staticmethod
+    @retry(retry_on_exception=is_common_mast_connection_error, stop_max_attempt_number=10)
+    def get_tess_input_catalog_rows(tic_ids: List[int]) -> pd.DataFrame:
+        """
+        Get the TIC rows for a list of TIC IDs in a single query. TIC IDs not in the TIC have no row.
+
+        :param tic_ids: The targets' TIC IDs.
+        :return: The data frame of the TIC rows.
+        """
+        return Catalogs.query_criteria(catalog='TIC', ID=[int(tic_id) for tic_id in tic_ids]).to_pandas()
+
     @staticmethod
     def get_variable_data_frame_for_coordinates(coordinates, radius='21s') -> pd.DataFrame:
         """
@@ -494,7 +526,8 @@ class TessDataInterface:
 
     def download_two_minute_cadence_light_curves(self, save_directory: Path, limit: Union[None, int] = None):
         """
-        Downloads all two minute cadence light curves from TESS.
+        Downloads all two minute cadence light curves from TESS. Light curves which were already downloaded are
+        skipped, so an interrupted download can be resumed by calling this again.
 
         :param save_directory: The directory to save the light curves to.
         :param limit: Limits the number of light curves downloaded. Default of None will download all light curves.
@@ -509,12 +542,7 @@ class TessDataInterface:
         light_curve_data_products = data_products[data_products['productFilename'].str.endswith('lc.fits')]
         if limit is not None:
             light_curve_data_products = light_curve_data_products.sample(frac=1, random_state=0).head(limit)
-        download_manifest = self.download_products(light_curve_data_products, data_directory=save_directory)
-        print(f'Moving light curves to {save_directory}...')
-        for _, manifest_row in download_manifest.iterrows():
-            if manifest_row['Status'] == 'COMPLETE':
-                file_path = Path(manifest_row['Local Path'])
-                file_path.rename(save_directory.joinpath(file_path.name))
+        MastDownloadManager().download_products(light_curve_data_products, save_directory=save_directory)
         print('Database ready.')
 
     def get_sectors_target_appears_in(self, tic_id: int) -> List:
@@ -524,6 +552,10 @@ class TessDataInterface:
         :param tic_id: The TIC ID of the target.
         :return: The list of sectors.
         """
+        if TessLightCurveProductCatalog.is_available():
+            sectors = TessLightCurveProductCatalog.get_sectors_for_tic_id(tic_id)
+            if len(sectors) > 0:
+                return sectors
         time_series_observations = self.get_all_tess_time_series_observations(tic_id)
         single_sector_observations = self.filter_for_single_sector_observations(time_series_observations)
         two_minute_observations = self.filter_out_twenty_second_cadence_observations(single_sector_observations)
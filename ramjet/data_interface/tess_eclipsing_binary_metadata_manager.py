@@ -5,7 +5,8 @@ import pandas as pd
 from pathlib import Path
 from peewee import IntegerField, SchemaManager
 
-from ramjet.data_interface.metadatabase import MetadatabaseModel, metadatabase
+from ramjet.data_interface.metadatabase import MetadatabaseModel, metadatabase, bulk_upsert, BulkUpsertConflictAction, \
+    bump_table_generation
 
 
 brian_powell_eclipsing_binary_csv_path = Path('data/tess_eclipsing_binaries/TESS_EB_catalog_23Jun.csv')
@@ -23,28 +24,48 @@ class TessEclipsingBinaryMetadataManager:
     A class for managing the TESS eclipsing binary metadata.
     """
     @staticmethod
-    def build_table():
+    def refresh_table():
+        """
+        Brings the TESS eclipsing binary metadata table up to date with the catalog, inserting only the targets which
+        are new and deleting the targets which are no longer in the catalog.
+        """
+        print('Refreshing TESS eclipsing binary metadata table...')
+        eclipsing_binary_data_frame = pd.read_csv(brian_powell_eclipsing_binary_csv_path, usecols=['ID'])
+        catalog_tic_ids = set(eclipsing_binary_data_frame['ID'].astype(int).values)
+        existing_tic_ids = {tic_id for (tic_id,) in
+                            TessEclipsingBinaryMetadata.select(TessEclipsingBinaryMetadata.tic_id).tuples()}
+        new_tic_ids = sorted(catalog_tic_ids - existing_tic_ids)
+        vanished_tic_ids = sorted(existing_tic_ids - catalog_tic_ids)
+        with metadatabase.atomic():
+            bulk_upsert(TessEclipsingBinaryMetadata, ({'tic_id': tic_id} for tic_id in new_tic_ids),
+                        conflict_action=BulkUpsertConflictAction.IGNORE)
+            for batch_start_index in range(0, len(vanished_tic_ids), 500):
+                batch_tic_ids = vanished_tic_ids[batch_start_index:batch_start_index + 500]
+                TessEclipsingBinaryMetadata.delete().where(TessEclipsingBinaryMetadata.tic_id.in_(batch_tic_ids)
+                                                           ).execute()
+        print(f'Table refreshed. {len(new_tic_ids)} rows added and {len(vanished_tic_ids)} rows removed.')
+
+    @staticmethod
+    def build_table(incremental: bool = False):
         """
         Builds the TESS eclipsing binary metadata table.
+
+        :param incremental: Whether to only add the new targets and remove the vanished ones, rather than dropping and
+                            rebuilding the table.
         """
+        if incremental and TessEclipsingBinaryMetadata.table_exists():
+            TessEclipsingBinaryMetadataManager.refresh_table()
+            bump_table_generation(TessEclipsingBinaryMetadata)
+            return
         print('Building TESS eclipsing binary metadata table...')
         eclipsing_binary_data_frame = pd.read_csv(brian_powell_eclipsing_binary_csv_path, usecols=['ID'])
-        row_count = 0
         metadatabase.drop_tables([TessEclipsingBinaryMetadata])
         metadatabase.create_tables([TessEclipsingBinaryMetadata])
         SchemaManager(TessEclipsingBinaryMetadata).drop_indexes()
-        rows = []
-        for index, tic_id in enumerate(eclipsing_binary_data_frame['ID'].values):
-            row = {'tic_id': tic_id}
-            rows.append(row)
-            row_count += 1
-            if row_count % 1000 == 0:
-                with metadatabase.atomic():
-                    TessEclipsingBinaryMetadata.insert_many(rows).execute()
-                rows = []
-        with metadatabase.atomic():
-            TessEclipsingBinaryMetadata.insert_many(rows).execute()
+        rows = [{'tic_id': tic_id} for tic_id in eclipsing_binary_data_frame['ID'].values]
+        row_count = bulk_upsert(TessEclipsingBinaryMetadata, rows)
         SchemaManager(TessEclipsingBinaryMetadata).create_indexes()
+        bump_table_generation(TessEclipsingBinaryMetadata)
         print(f'Table built. {row_count} rows added.')
 
 
@@ -1,13 +1,17 @@
 """
 Code for managing the TESS FFI metadata SQL table.
 """
-import itertools
+import os
+import re
+import time
 from pathlib import Path
-from typing import List
+from typing import List, Dict, Any, Optional
 from peewee import IntegerField, CharField, FloatField, SchemaManager
 
-from ramjet.data_interface.metadatabase import MetadatabaseModel, metadatabase, metadatabase_uuid, \
-    convert_class_to_table_name, dataset_split_from_uuid
+from ramjet.data_interface.metadatabase import MetadatabaseModel, metadatabase_uuid, \
+    convert_class_to_table_name, dataset_split_from_uuid, refresh_rows_from_files_in_parallel, \
+    scan_directory_file_states, clear_file_manifest, FileState, create_random_order_value, \
+    add_missing_random_order_field, rerandomize_random_order_field, bulk_upsert, bump_table_generation
 from ramjet.photometric_database.tess_ffi_light_curve import TessFfiLightCurve
 
 
@@ -19,6 +23,7 @@ class TessFfiLightCurveMetadata(MetadatabaseModel):
     sector = IntegerField(index=True)
     path = CharField(unique=True)
     dataset_split = IntegerField()
+    random_order = IntegerField(index=True, default=create_random_order_value)
     magnitude = FloatField()
 
     class Meta:
@@ -36,6 +41,30 @@ class TessFfiLightCurveMetadataManager:
     """
     def __init__(self):
         self.light_curve_root_directory_path = Path('data/tess_ffi_light_curves')
+        self.number_of_processes: Optional[int] = None
+
+    def create_row_dictionary_for_path(self, light_curve_path: Path) -> Dict[str, Any]:
+        """
+        Creates the table row dictionary for a light curve path.
+
+        :param light_curve_path: The path of the light curve.
+        :return: The row dictionary.
+        """
+        table_name = convert_class_to_table_name(TessFfiLightCurveMetadata)
+        tic_id, sector = TessFfiLightCurve.get_tic_id_and_sector_from_file_path(light_curve_path)
+        if '2_min_cadence_targets' in str(light_curve_path):
+            magnitude = TessFfiLightCurve.get_magnitude_from_file(light_curve_path)
+        else:
+            magnitude = TessFfiLightCurve.get_floor_magnitude_from_file_path(light_curve_path)
+        relative_path = light_curve_path.relative_to(self.light_curve_root_directory_path)
+        uuid_name = f'{table_name} TIC {tic_id} sector {sector}'
+        uuid = metadatabase_uuid(uuid_name)
+        dataset_split = dataset_split_from_uuid(uuid)
+        return {TessFfiLightCurveMetadata.path.name: str(relative_path),
+                TessFfiLightCurveMetadata.tic_id.name: tic_id,
+                TessFfiLightCurveMetadata.sector.name: sector,
+                TessFfiLightCurveMetadata.magnitude.name: magnitude,
+                TessFfiLightCurveMetadata.dataset_split.name: dataset_split}
 
     def insert_multiple_rows_from_paths_into_database(self, light_curve_paths: List[Path]):
         """
@@ -43,63 +72,93 @@ class TessFfiLightCurveMetadataManager:
 
         :param light_curve_paths: The list of paths to insert.
         """
-        row_dictionary_list = []
-        table_name = convert_class_to_table_name(TessFfiLightCurveMetadata)
-        for light_curve_path in light_curve_paths:
-            tic_id, sector = TessFfiLightCurve.get_tic_id_and_sector_from_file_path(light_curve_path)
-            if '2_min_cadence_targets' in str(light_curve_path):
-                magnitude = TessFfiLightCurve.get_magnitude_from_file(light_curve_path)
-            else:
-                magnitude = TessFfiLightCurve.get_floor_magnitude_from_file_path(light_curve_path)
-            relative_path = light_curve_path.relative_to(self.light_curve_root_directory_path)
-            uuid_name = f'{table_name} TIC {tic_id} sector {sector}'
-            uuid = metadatabase_uuid(uuid_name)
-            dataset_split = dataset_split_from_uuid(uuid)
-            row_dictionary_list.append({TessFfiLightCurveMetadata.path.name: str(relative_path),
-                                        TessFfiLightCurveMetadata.tic_id.name: tic_id,
-                                        TessFfiLightCurveMetadata.sector.name: sector,
-                                        TessFfiLightCurveMetadata.magnitude.name: magnitude,
-                                        TessFfiLightCurveMetadata.dataset_split.name: dataset_split})
-        with metadatabase.atomic():
-            TessFfiLightCurveMetadata.insert_many(row_dictionary_list).execute()
+        row_dictionary_list = [self.create_row_dictionary_for_path(light_curve_path)
+                               for light_curve_path in light_curve_paths]
+        bulk_upsert(TessFfiLightCurveMetadata, row_dictionary_list)
+
+    def get_light_curve_directory_paths(self) -> List[Path]:
+        """
+        Gets the directories containing the light curve files, one per sector and magnitude bin (or two minute cadence
+        target set).
+
+        :return: The list of light curve directory paths.
+        """
+        light_curve_directory_paths = []
+        for sector in range(1, 27):
+            sector_directory_path = self.light_curve_root_directory_path.joinpath(f'tesslcs_sector_{sector}_104')
+            if not sector_directory_path.is_dir():
+                continue
+            with os.scandir(sector_directory_path) as sector_directory_entries:
+                for entry in sector_directory_entries:
+                    if entry.is_dir() and (re.fullmatch(r'tesslcs_tmag_\d+_\d+', entry.name) or
+                                           entry.name == '2_min_cadence_targets'):
+                        light_curve_directory_paths.append(Path(entry.path))
+        return sorted(light_curve_directory_paths)
+
+    def scan_light_curve_directory(self, light_curve_directory_path: Path) -> List[FileState]:
+        """
+        Scans a directory for the states of its light curve files. Designed to be run by the worker processes of a
+        parallel table refresh.
+
+        :param light_curve_directory_path: The directory containing the light curve files.
+        :return: The list of file states.
+        """
+        return scan_directory_file_states(
+            light_curve_directory_path, self.light_curve_root_directory_path,
+            lambda file_name: file_name.startswith('tesslc_') and file_name.endswith('.pkl'))
+
+    def create_row_dictionaries_for_relative_paths(self, relative_light_curve_paths: List[Path]
+                                                   ) -> List[Dict[str, Any]]:
+        """
+        Creates the table row dictionaries for a list of light curve paths. Designed to be run by the worker processes
+        of a parallel table refresh.
+
+        :param relative_light_curve_paths: The light curve paths relative to the light curve root directory.
+        :return: The list of row dictionaries.
+        """
+        return [self.create_row_dictionary_for_path(self.light_curve_root_directory_path.joinpath(relative_path))
+                for relative_path in relative_light_curve_paths]
 
     def populate_sql_database(self):
         """
-        Populates the SQL database based on the light curve files.
+        Populates the SQL database based on the light curve files. Only light curve files which are not already in the
+        file manifest (or have changed) are added, and rows for light curve files which no longer exist are removed.
         """
         print('Populating the TESS FFI light curve meta data table...', flush=True)
-        single_sector_path_globs = []
-        for sector in range(1, 27):
-            single_sector_path_glob = self.light_curve_root_directory_path.glob(
-                f'tesslcs_sector_{sector}_104/tesslcs_tmag_*_*/tesslc_*.pkl')
-            single_sector_path_globs.append(single_sector_path_glob)
-            short_cadence_single_sector_path_glob = self.light_curve_root_directory_path.glob(
-                f'tesslcs_sector_{sector}_104/2_min_cadence_targets/tesslc_*.pkl')
-            single_sector_path_globs.append(short_cadence_single_sector_path_glob)
-        path_glob = itertools.chain(*single_sector_path_globs)
-        row_count = 0
-        batch_paths = []
-        with metadatabase.atomic():
-            for index, path in enumerate(path_glob):
-                batch_paths.append(path)
-                row_count += 1
-                if index % 1000 == 0 and index != 0:
-                    self.insert_multiple_rows_from_paths_into_database(batch_paths)
-                    batch_paths = []
-                    print(f'{index} rows inserted...', end='\r', flush=True)
-            if len(batch_paths) > 0:
-                self.insert_multiple_rows_from_paths_into_database(batch_paths)
-        print(f'TESS FFI light curve meta data table populated. {row_count} rows added.', flush=True)
-
-    def build_table(self):
+        light_curve_directory_paths = self.get_light_curve_directory_paths()
+        start_time = time.perf_counter()
+        inserted_count, deleted_count = refresh_rows_from_files_in_parallel(
+            TessFfiLightCurveMetadata, TessFfiLightCurveMetadata.path, self.scan_light_curve_directory,
+            self.create_row_dictionaries_for_relative_paths, light_curve_directory_paths,
+            number_of_processes=self.number_of_processes)
+        elapsed_time = time.perf_counter() - start_time
+        print(f'TESS FFI light curve meta data table populated. {inserted_count} rows added and {deleted_count} rows '
+              f'removed in {elapsed_time:.0f}s.', flush=True)
+
+    def build_table(self, incremental: bool = False, rerandomize: bool = False):
         """
         Builds the SQL table.
+
+        :param incremental: Whether to only add the new light curve files and remove the vanished ones, rather than
+                            dropping and rebuilding the table. Indexes are left in place for an incremental build, and
+                            new rows are given their random order on insert.
+        :param rerandomize: Whether to re-randomize the random order of all the rows after an incremental build.
         """
+        if incremental and TessFfiLightCurveMetadata.table_exists():
+            add_missing_random_order_field(TessFfiLightCurveMetadata, TessFfiLightCurveMetadata.random_order)
+            self.populate_sql_database()
+            if rerandomize:
+                print('Re-randomizing the random order...', flush=True)
+                rerandomize_random_order_field(TessFfiLightCurveMetadata, TessFfiLightCurveMetadata.random_order)
+            bump_table_generation(TessFfiLightCurveMetadata)
+            return
         TessFfiLightCurveMetadata.drop_table()
         TessFfiLightCurveMetadata.create_table()
+        clear_file_manifest(TessFfiLightCurveMetadata)
         SchemaManager(TessFfiLightCurveMetadata).drop_indexes()  # To allow for fast insert.
         self.populate_sql_database()
         SchemaManager(TessFfiLightCurveMetadata).create_indexes()  # Since we dropped them before.
+        bump_table_generation(TessFfiLightCurveMetadata)
 
 
 if __name__ == '__main__':
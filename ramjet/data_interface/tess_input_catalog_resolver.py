@@ -0,0 +1,208 @@
+"""
+Code for resolving TESS input catalog rows in batches, persisting them to a local table.
+"""
+from typing import List, Dict, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+from astroquery.gaia import Gaia
+from peewee import IntegerField, FloatField
+from retrying import retry
+
+from ramjet.data_interface.metadatabase import MetadatabaseModel, bulk_upsert
+from ramjet.data_interface.response_cache import response_cache, ResponseCacheSource
+from ramjet.data_interface.tess_data_interface import TessDataInterface, is_common_mast_connection_error
+
+
+class TessInputCatalogEntry(MetadatabaseModel):
+    """
+    A model for the local table of TESS input catalog rows.
+    """
+    tic_id = IntegerField(unique=True)
+    ra = FloatField(null=True)
+    dec = FloatField(null=True)
+    radius = FloatField(null=True)
+    mass = FloatField(null=True)
+    tess_magnitude = FloatField(null=True)
+    contamination_ratio = FloatField(null=True)
+    gaia_source_id = IntegerField(null=True)
+    gaia_radius = FloatField(null=True)
+
+
+tic_column_name_to_field_name = {
+    'ID': TessInputCatalogEntry.tic_id.name,
+    'ra': TessInputCatalogEntry.ra.name,
+    'dec': TessInputCatalogEntry.dec.name,
+    'rad': TessInputCatalogEntry.radius.name,
+    'mass': TessInputCatalogEntry.mass.name,
+    'Tmag': TessInputCatalogEntry.tess_magnitude.name,
+    'contratio': TessInputCatalogEntry.contamination_ratio.name,
+    'GAIA': TessInputCatalogEntry.gaia_source_id.name,
+    'gaia_radius': TessInputCatalogEntry.gaia_radius.name,
+}
+
+
+class TessInputCatalogResolver:
+    """
+    A class for resolving the TIC rows of many targets at once. Rows are served from the local table when present.
+    The remaining targets are queried from MAST in chunks, with the Gaia radius of targets missing a TIC radius
+    retrieved in chunked ADQL queries, and the results are stored in the local table for later lookups. Gaia radii are
+    also served from and stored in the response cache. When the metadatabase connection is read-only, the retrieved
+    rows are not stored, so lookups from read-only processes never write to the metadatabase.
+
+    :ivar tic_query_chunk_size: The number of TIC IDs requested from MAST per query.
+    :ivar gaia_query_chunk_size: The number of Gaia source IDs requested from Gaia per query.
+    :ivar local_query_chunk_size: The number of TIC IDs requested from the local table per query.
+    """
+    tess_data_interface = TessDataInterface()
+
+    def __init__(self):
+        self.tic_query_chunk_size = 500
+        self.gaia_query_chunk_size = 1000
+        self.local_query_chunk_size = 500
+
+    def resolve_tic_rows(self, tic_ids: Iterable[int]) -> pd.DataFrame:
+        """
+        Resolves the TIC rows of targets.
+
+        :param tic_ids: The TIC IDs of the targets.
+        :return: The data frame of the TIC rows, indexed by TIC ID, using the TIC column names plus a `gaia_radius`
+                 column. TIC IDs not in the TIC have no row.
+        """
+        tic_ids = list(dict.fromkeys(int(tic_id) for tic_id in tic_ids))
+        tic_rows = self.load_tic_rows_from_local_table(tic_ids)
+        unresolved_tic_ids = [tic_id for tic_id in tic_ids if tic_id not in tic_rows.index]
+        if len(unresolved_tic_ids) > 0:
+            retrieved_tic_rows = self.retrieve_tic_rows(unresolved_tic_ids)
+            if self.is_local_table_writable():
+                TessInputCatalogEntry.create_table()
+                self.save_tic_rows_to_local_table(retrieved_tic_rows)
+            tic_rows = pd.concat([tic_rows, retrieved_tic_rows])
+        return tic_rows
+
+    @staticmethod
+    def is_local_table_writable() -> bool:
+        """
+        Checks if the local table can be written to, which is the case unless the metadatabase connection is read-only.
+
+        :return: Whether the local table can be written to.
+        """
+        return not getattr(TessInputCatalogEntry._meta.database, 'read_only', False)
+
+    def get_tic_row(self, tic_id: int) -> Optional[pd.Series]:
+        """
+        Resolves the TIC row of a single target.
+
+        :param tic_id: The TIC ID of the target.
+        :return: The TIC row, or None if the TIC ID is not in the TIC.
+        """
+        tic_rows = self.resolve_tic_rows([tic_id])
+        if int(tic_id) not in tic_rows.index:
+            return None
+        return tic_rows.loc[int(tic_id)]
+
+    def load_tic_rows_from_local_table(self, tic_ids: List[int]) -> pd.DataFrame:
+        """
+        Loads the TIC rows of targets from the local table.
+
+        :param tic_ids: The TIC IDs of the targets.
+        :return: The data frame of the TIC rows which are in the local table.
+        """
+        rows = []
+        if TessInputCatalogEntry.table_exists():
+            for chunk_start_index in range(0, len(tic_ids), self.local_query_chunk_size):
+                chunk_tic_ids = tic_ids[chunk_start_index:chunk_start_index + self.local_query_chunk_size]
+                query = TessInputCatalogEntry.select().where(TessInputCatalogEntry.tic_id.in_(chunk_tic_ids))
+                rows.extend(query.dicts())
+        field_name_to_tic_column_name = {field_name: column_name
+                                         for column_name, field_name in tic_column_name_to_field_name.items()}
+        tic_rows = pd.DataFrame(rows, columns=list(field_name_to_tic_column_name.keys()))
+        tic_rows = tic_rows.rename(columns=field_name_to_tic_column_name)
+        tic_rows['GAIA'] = tic_rows['GAIA'].astype(object)
+        float_columns = [column for column in tic_rows.columns if column not in ['ID', 'GAIA']]
+        tic_rows[float_columns] = tic_rows[float_columns].astype(np.float64)
+        return tic_rows.set_index(tic_rows['ID'].astype(np.int64).rename(None))
+
+    def retrieve_tic_rows(self, tic_ids: List[int]) -> pd.DataFrame:
+        """
+        Retrieves the TIC rows of targets from MAST, adding the Gaia radius of targets missing a TIC radius.
+
+        :param tic_ids: The TIC IDs of the targets.
+        :return: The data frame of the TIC rows.
+        """
+        tic_row_data_frames = []
+        for chunk_start_index in range(0, len(tic_ids), self.tic_query_chunk_size):
+            chunk_tic_ids = tic_ids[chunk_start_index:chunk_start_index + self.tic_query_chunk_size]
+            tic_row_data_frames.append(self.tess_data_interface.get_tess_input_catalog_rows(chunk_tic_ids))
+        tic_rows = pd.concat(tic_row_data_frames)
+        tic_rows = tic_rows[[column for column in tic_column_name_to_field_name.keys() if column in tic_rows.columns]]
+        tic_rows = tic_rows.reindex(columns=list(tic_column_name_to_field_name.keys()))
+        tic_rows['ID'] = tic_rows['ID'].astype(np.int64)
+        tic_rows = tic_rows.drop_duplicates(subset='ID')
+        tic_rows = tic_rows.set_index(tic_rows['ID'].rename(None))
+        requires_gaia_radius = tic_rows['rad'].isna() & tic_rows['GAIA'].notna()
+        gaia_source_ids = tic_rows.loc[requires_gaia_radius, 'GAIA'].astype(np.int64)
+        gaia_radii = self.retrieve_gaia_radii(gaia_source_ids.tolist())
+        tic_rows['gaia_radius'] = gaia_source_ids.map(gaia_radii).reindex(tic_rows.index).astype(np.float64)
+        return tic_rows
+
+    def retrieve_gaia_radii(self, gaia_source_ids: List[int]) -> Dict[int, float]:
+        """
+        Retrieves the radii of Gaia sources.
+
+        :param gaia_source_ids: The Gaia source IDs.
+        :return: The dictionary from Gaia source ID to radius. Sources not in Gaia have no entry.
+        """
+        gaia_radii = {}
+        uncached_gaia_source_ids = []
+        for gaia_source_id in gaia_source_ids:
+            cached_radius = response_cache.load(ResponseCacheSource.GAIA, gaia_source_id)
+            if cached_radius is None:
+                uncached_gaia_source_ids.append(gaia_source_id)
+            else:
+                gaia_radii[gaia_source_id] = cached_radius
+        for chunk_start_index in range(0, len(uncached_gaia_source_ids), self.gaia_query_chunk_size):
+            chunk_gaia_source_ids = uncached_gaia_source_ids[chunk_start_index:
+                                                             chunk_start_index + self.gaia_query_chunk_size]
+            chunk_gaia_radii = self.query_gaia_radii(chunk_gaia_source_ids)
+            for gaia_source_id, radius in chunk_gaia_radii.items():
+                response_cache.save(ResponseCacheSource.GAIA, gaia_source_id, radius)
+            gaia_radii.update(chunk_gaia_radii)
+        return gaia_radii
+
+    @staticmethod
+    @retry(retry_on_exception=is_common_mast_connection_error, stop_max_attempt_number=10)
+    def query_gaia_radii(gaia_source_ids: List[int]) -> Dict[int, float]:
+        """
+        Queries the radii of Gaia sources in a single ADQL query.
+
+        :param gaia_source_ids: The Gaia source IDs.
+        :return: The dictionary from Gaia source ID to radius.
+        """
+        source_id_list_string = ', '.join(str(int(gaia_source_id)) for gaia_source_id in gaia_source_ids)
+        # noinspection SqlResolve
+        gaia_job = Gaia.launch_job(f'select source_id, radius_val from gaiadr2.gaia_source '
+                                   f'where source_id in ({source_id_list_string})')
+        query_results_data_frame = gaia_job.get_results().to_pandas()
+        query_results_data_frame.columns = query_results_data_frame.columns.str.lower()
+        return dict(zip(query_results_data_frame['source_id'].astype(np.int64),
+                        query_results_data_frame['radius_val']))
+
+    @staticmethod
+    def save_tic_rows_to_local_table(tic_rows: pd.DataFrame):
+        """
+        Saves TIC rows to the local table, replacing any existing rows for the same targets.
+
+        :param tic_rows: The data frame of the TIC rows.
+        """
+        row_dictionaries = []
+        for tic_row in tic_rows.to_dict('records'):
+            row_dictionary = {}
+            for column_name, field_name in tic_column_name_to_field_name.items():
+                value = tic_row[column_name]
+                row_dictionary[field_name] = None if pd.isna(value) else value
+            if row_dictionary[TessInputCatalogEntry.gaia_source_id.name] is not None:
+                row_dictionary[TessInputCatalogEntry.gaia_source_id.name] = int(
+                    row_dictionary[TessInputCatalogEntry.gaia_source_id.name])
+            row_dictionaries.append(row_dictionary)
+        bulk_upsert(TessInputCatalogEntry, row_dictionaries)
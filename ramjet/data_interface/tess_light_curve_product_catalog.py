@@ -0,0 +1,83 @@
+"""
+Code for the local snapshot of the TESS two minute cadence light curve product catalog.
+"""
+from typing import List, Optional
+
+import pandas as pd
+from peewee import IntegerField, CharField
+
+from ramjet.data_interface.metadatabase import MetadatabaseModel
+
+
+class TessLightCurveProductCatalogEntry(MetadatabaseModel):
+    """
+    A model for the local snapshot of the MAST TESS two minute cadence light curve products.
+    """
+    tic_id = IntegerField()
+    sector = IntegerField(index=True)
+    obs_id = CharField()
+    data_uri = CharField(unique=True)
+    product_filename = CharField()
+    size = IntegerField()
+
+    class Meta:
+        """Schema meta data for the model."""
+        indexes = (
+            (('tic_id', 'sector'), False),
+        )
+
+
+class TessLightCurveProductCatalog:
+    """
+    A class for resolving TESS targets to light curve products from the local catalog snapshot, without querying MAST.
+    """
+    @staticmethod
+    def is_available() -> bool:
+        """
+        Checks if the local catalog snapshot has been created.
+
+        :return: Whether the snapshot is available.
+        """
+        return TessLightCurveProductCatalogEntry.table_exists()
+
+    @staticmethod
+    def get_light_curve_data_products(tic_ids: List[int], sectors: Optional[List[int]] = None) -> pd.DataFrame:
+        """
+        Gets the light curve data products of targets from the local catalog snapshot.
+
+        :param tic_ids: The TIC IDs of the targets.
+        :param sectors: The sectors to limit the products to. Defaults to all sectors.
+        :return: The data products, with the `dataURI`, `productFilename`, `size`, and `obs_id` columns of a MAST product
+                 list, plus `tic_id` and `sector` columns. Sorted by TIC ID and sector.
+        """
+        tic_ids = [int(tic_id) for tic_id in tic_ids]
+        query = TessLightCurveProductCatalogEntry.select(
+            TessLightCurveProductCatalogEntry.data_uri.alias('dataURI'),
+            TessLightCurveProductCatalogEntry.product_filename.alias('productFilename'),
+            TessLightCurveProductCatalogEntry.size,
+            TessLightCurveProductCatalogEntry.obs_id,
+            TessLightCurveProductCatalogEntry.tic_id,
+            TessLightCurveProductCatalogEntry.sector)
+        rows = []
+        maximum_tic_ids_per_query = 500
+        for chunk_start_index in range(0, len(tic_ids), maximum_tic_ids_per_query):
+            chunk_tic_ids = tic_ids[chunk_start_index:chunk_start_index + maximum_tic_ids_per_query]
+            chunk_query = query.where(TessLightCurveProductCatalogEntry.tic_id.in_(chunk_tic_ids))
+            if sectors is not None:
+                chunk_query = chunk_query.where(TessLightCurveProductCatalogEntry.sector.in_(list(map(int, sectors))))
+            rows.extend(chunk_query.dicts())
+        data_products = pd.DataFrame(rows, columns=['dataURI', 'productFilename', 'size', 'obs_id', 'tic_id',
+                                                    'sector'])
+        return data_products.sort_values(['tic_id', 'sector'], ignore_index=True)
+
+    @staticmethod
+    def get_sectors_for_tic_id(tic_id: int) -> List[int]:
+        """
+        Gets the sectors a target has light curve products for in the local catalog snapshot.
+
+        :param tic_id: The TIC ID of the target.
+        :return: The sorted list of sectors.
+        """
+        query = TessLightCurveProductCatalogEntry.select(TessLightCurveProductCatalogEntry.sector).where(
+            TessLightCurveProductCatalogEntry.tic_id == int(tic_id)).distinct()
+        return sorted(sector for (sector,) in query.tuples())
@@ -0,0 +1,57 @@
+"""
+Code for creating the local snapshot of the TESS two minute cadence light curve product catalog.
+"""
+import pandas as pd
+
+from ramjet.data_interface.metadatabase import metadatabase, bulk_upsert, bump_table_generation
+from ramjet.data_interface.tess_data_interface import TessDataInterface
+from ramjet.data_interface.tess_light_curve_product_catalog import TessLightCurveProductCatalogEntry
+
+
+class TessLightCurveProductCatalogManager:
+    """
+    A class for snapshotting the MAST observation and product lists of the TESS two minute cadence light curves into
+    the local catalog table.
+    """
+    tess_data_interface = TessDataInterface()
+
+    def create_row_data_frame(self, data_products: pd.DataFrame) -> pd.DataFrame:
+        """
+        Creates the table rows from a MAST product list, keeping only the light curve products.
+
+        :param data_products: The MAST product list.
+        :return: The data frame of the table rows.
+        """
+        light_curve_data_products = data_products[data_products['productFilename'].str.endswith('lc.fits')]
+        rows = pd.DataFrame({
+            TessLightCurveProductCatalogEntry.obs_id.name: light_curve_data_products['obs_id'].values,
+            TessLightCurveProductCatalogEntry.data_uri.name: light_curve_data_products['dataURI'].values,
+            TessLightCurveProductCatalogEntry.product_filename.name:
+                light_curve_data_products['productFilename'].values,
+            TessLightCurveProductCatalogEntry.size.name: light_curve_data_products['size'].values})
+        rows[TessLightCurveProductCatalogEntry.tic_id.name] = rows['obs_id'].map(
+            self.tess_data_interface.get_tic_id_from_single_sector_obs_id)
+        rows[TessLightCurveProductCatalogEntry.sector.name] = rows['obs_id'].map(
+            self.tess_data_interface.get_sector_from_single_sector_obs_id)
+        return rows
+
+    def build_table(self):
+        """
+        Builds the local catalog table from the current MAST observation and product lists.
+        """
+        print('Retrieving observations list from MAST...', flush=True)
+        single_sector_observations = self.tess_data_interface.get_all_two_minute_single_sector_observations()
+        print('Retrieving data products list from MAST...', flush=True)
+        data_products = self.tess_data_interface.get_product_list(single_sector_observations)
+        rows = self.create_row_data_frame(data_products)
+        print('Building TESS light curve product catalog table...', flush=True)
+        metadatabase.drop_tables([TessLightCurveProductCatalogEntry])
+        metadatabase.create_tables([TessLightCurveProductCatalogEntry])
+        row_count = bulk_upsert(TessLightCurveProductCatalogEntry, rows.to_dict('records'))
+        bump_table_generation(TessLightCurveProductCatalogEntry)
+        print(f'Table built. {row_count} rows added.', flush=True)
+
+
+if __name__ == '__main__':
+    catalog_manager = TessLightCurveProductCatalogManager()
+    catalog_manager.build_table()
@@ -1,12 +1,14 @@
 """
 Code for managing the metadata of the TESS targets.
 """
+import os
 from pathlib import Path
-from typing import List
+from typing import List, Dict, Set
 from peewee import IntegerField, SchemaManager
 
 from ramjet.data_interface.metadatabase import MetadatabaseModel, metadatabase, convert_class_to_table_name, \
-    metadatabase_uuid, dataset_split_from_uuid
+    metadatabase_uuid, dataset_split_from_uuid, bulk_upsert, BulkUpsertConflictAction, \
+    bump_table_generation
 from ramjet.data_interface.tess_data_interface import TessDataInterface
 
 
@@ -27,6 +29,21 @@ class TessTargetMetadataManger:
     def __init__(self):
         self.light_curve_root_directory_path = Path('data/tess_two_minute_cadence_light_curves')
 
+    @staticmethod
+    def create_row_dictionary_for_tic_id(tic_id: int) -> Dict[str, int]:
+        """
+        Creates the table row dictionary for a target.
+
+        :param tic_id: The TIC ID of the target.
+        :return: The row dictionary.
+        """
+        table_name = convert_class_to_table_name(TessTargetMetadata)
+        uuid_name = f'{table_name} TIC {tic_id}'
+        uuid = metadatabase_uuid(uuid_name)
+        dataset_split = dataset_split_from_uuid(uuid)
+        return {TessTargetMetadata.tic_id.name: tic_id,
+                TessTargetMetadata.dataset_split.name: dataset_split}
+
     def insert_multiple_rows_from_paths_into_database(self, light_curve_paths: List[Path]) -> int:
         """
         Inserts sets targets into the table from light curve paths.
@@ -35,17 +52,10 @@ class TessTargetMetadataManger:
         :return: The number of rows inserted.
         """
         row_dictionary_list = []
-        table_name = convert_class_to_table_name(TessTargetMetadata)
         for light_curve_path in light_curve_paths:
             tic_id, _ = self.tess_data_interface.get_tic_id_and_sector_from_file_path(light_curve_path)
-            uuid_name = f'{table_name} TIC {tic_id}'
-            uuid = metadatabase_uuid(uuid_name)
-            dataset_split = dataset_split_from_uuid(uuid)
-            row_dictionary_list.append({TessTargetMetadata.tic_id.name: tic_id,
-                                        TessTargetMetadata.dataset_split.name: dataset_split})
-        with metadatabase.atomic():
-            number_of_rows_inserted = TessTargetMetadata.insert_many(row_dictionary_list).on_conflict_ignore().execute()
-        return number_of_rows_inserted
+            row_dictionary_list.append(self.create_row_dictionary_for_tic_id(tic_id))
+        return bulk_upsert(TessTargetMetadata, row_dictionary_list, conflict_action=BulkUpsertConflictAction.IGNORE)
 
     def populate_sql_database(self):
         """
@@ -69,13 +79,57 @@ class TessTargetMetadataManger:
                 row_count += self.insert_multiple_rows_from_paths_into_database(batch_paths)
         print(f'TESS target metadata table populated. {row_count} rows added.')
 
-    def build_table(self):
+    def get_light_curve_tic_ids(self) -> Set[int]:
+        """
+        Gets the set of TIC IDs which have light curve files in the light curve directory.
+
+        :return: The set of TIC IDs.
+        """
+        tic_ids = set()
+        directory_paths_to_walk = [self.light_curve_root_directory_path]
+        while len(directory_paths_to_walk) > 0:
+            with os.scandir(directory_paths_to_walk.pop()) as directory_entries:
+                for entry in directory_entries:
+                    if entry.is_dir():
+                        directory_paths_to_walk.append(Path(entry.path))
+                    elif entry.name.endswith('.fits'):
+                        tic_id, _ = self.tess_data_interface.get_tic_id_and_sector_from_file_path(entry.name)
+                        tic_ids.add(tic_id)
+        return tic_ids
+
+    def refresh_sql_database(self):
+        """
+        Brings the table up to date with the light curve files, inserting only the targets which are new and deleting
+        the targets which no longer have any light curve files.
+        """
+        print('Refreshing the TESS target light curve metadata table...')
+        light_curve_tic_ids = self.get_light_curve_tic_ids()
+        existing_tic_ids = {tic_id for (tic_id,) in TessTargetMetadata.select(TessTargetMetadata.tic_id).tuples()}
+        new_tic_ids = sorted(light_curve_tic_ids - existing_tic_ids)
+        vanished_tic_ids = sorted(existing_tic_ids - light_curve_tic_ids)
+        with metadatabase.atomic():
+            bulk_upsert(TessTargetMetadata, map(self.create_row_dictionary_for_tic_id, new_tic_ids),
+                        conflict_action=BulkUpsertConflictAction.IGNORE)
+            for batch_start_index in range(0, len(vanished_tic_ids), 500):
+                batch_tic_ids = vanished_tic_ids[batch_start_index:batch_start_index + 500]
+                TessTargetMetadata.delete().where(TessTargetMetadata.tic_id.in_(batch_tic_ids)).execute()
+        print(f'TESS target metadata table refreshed. {len(new_tic_ids)} rows added and {len(vanished_tic_ids)} rows '
+              f'removed.')
+
+    def build_table(self, incremental: bool = False):
         """
         Builds the SQL table.
+
+        :param incremental: Whether to only add the new targets and remove the vanished ones, rather than dropping and
+                            rebuilding the table.
         """
-        TessTargetMetadata.drop_table()
-        TessTargetMetadata.create_table()
-        self.populate_sql_database()
+        if incremental and TessTargetMetadata.table_exists():
+            self.refresh_sql_database()
+        else:
+            TessTargetMetadata.drop_table()
+            TessTargetMetadata.create_table()
+            self.populate_sql_database()
+        bump_table_generation(TessTargetMetadata)
 
 
 if __name__ == '__main__':
@@ -1,12 +1,16 @@
 import warnings
 from enum import Enum
 from pathlib import Path
-from typing import Union
+from typing import Union, Iterable
 
+import numpy as np
 import pandas as pd
 import requests
 
+from ramjet.data_interface.mast_download_manager import MastDownloadManager
+from ramjet.data_interface.response_cache import response_cache, ResponseCacheSource, fetch_url_content
 from ramjet.data_interface.tess_data_interface import TessDataInterface
+from ramjet.data_interface.tess_light_curve_product_catalog import TessLightCurveProductCatalog
 
 
 class ToiColumns(Enum):
@@ -43,56 +47,67 @@ class TessToiDataInterface:
         self.light_curves_directory = self.data_directory.joinpath('light_curves')
         self.toi_dispositions_: Union[pd.DataFrame, None] = None
         self.ctoi_dispositions_: Union[pd.DataFrame, None] = None
+        self.toi_and_ctoi_dispositions_: Union[pd.DataFrame, None] = None
 
     @property
     def toi_dispositions(self):
         """
         The TOI dispositions data frame property. Will load as an instance attribute on first access. Updates from
-        ExoFOP on first access.
+        ExoFOP on first access, serving the ExoFOP response from the response cache when available.
 
         :return: The TOI dispositions data frame.
         """
         if self.toi_dispositions_ is None:
             try:
-                self.update_toi_dispositions_file()
-            except requests.exceptions.ConnectionError:
+                self.update_toi_dispositions_file(use_response_cache=True)
+            except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError):
                 warnings.warn('Unable to connect to update TOI file. Attempting to use existing file...')
             self.toi_dispositions_ = self.load_toi_dispositions_in_project_format()
         return self.toi_dispositions_
 
-    def update_toi_dispositions_file(self):
+    def update_toi_dispositions_file(self, use_response_cache: bool = False):
         """
-        Downloads the latest TOI dispositions file.
+        Downloads the latest TOI dispositions file. The downloaded ExoFOP response is stored in the response cache.
+
+        :param use_response_cache: Whether to serve the ExoFOP response from the response cache when available, rather
+                                   than always downloading it.
         """
         toi_csv_url = 'https://exofop.ipac.caltech.edu/tess/download_toi.php?sort=toi&output=csv'
-        response = requests.get(toi_csv_url)
+        csv_content = response_cache.get_or_fetch(ResponseCacheSource.EXOFOP_DISPOSITIONS, toi_csv_url,
+                                                  lambda: fetch_url_content(toi_csv_url),
+                                                  refresh=not use_response_cache)
         with self.toi_dispositions_path.open('wb') as csv_file:
-            csv_file.write(response.content)
+            csv_file.write(csv_content)
 
     @property
     def ctoi_dispositions(self):
         """
         The CTOI dispositions data frame property. Will load as an instance attribute on first access. Updates from
-        ExoFOP on first access.
+        ExoFOP on first access, serving the ExoFOP response from the response cache when available.
 
         :return: The CTOI dispositions data frame.
         """
         if self.ctoi_dispositions_ is None:
             try:
-                self.update_ctoi_dispositions_file()
-            except requests.exceptions.ConnectionError:
+                self.update_ctoi_dispositions_file(use_response_cache=True)
+            except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError):
                 warnings.warn('Unable to connect to update TOI file. Attempting to use existing file...')
             self.ctoi_dispositions_ = self.load_ctoi_dispositions_in_project_format()
         return self.ctoi_dispositions_
 
-    def update_ctoi_dispositions_file(self):
+    def update_ctoi_dispositions_file(self, use_response_cache: bool = False):
         """
-        Downloads the latest CTOI dispositions file.
+        Downloads the latest CTOI dispositions file. The downloaded ExoFOP response is stored in the response cache.
+
+        :param use_response_cache: Whether to serve the ExoFOP response from the response cache when available, rather
+                                   than always downloading it.
         """
         ctoi_csv_url = 'https://exofop.ipac.caltech.edu/tess/download_ctoi.php?sort=ctoi&output=csv'
-        response = requests.get(ctoi_csv_url)
+        csv_content = response_cache.get_or_fetch(ResponseCacheSource.EXOFOP_DISPOSITIONS, ctoi_csv_url,
+                                                  lambda: fetch_url_content(ctoi_csv_url),
+                                                  refresh=not use_response_cache)
         with self.ctoi_dispositions_path.open('wb') as csv_file:
-            csv_file.write(response.content)
+            csv_file.write(csv_content)
 
     def load_toi_dispositions_in_project_format(self) -> pd.DataFrame:
         """
@@ -130,6 +145,22 @@ class TessToiDataInterface:
         dispositions[ToiColumns.disposition.value] = dispositions[ToiColumns.disposition.value].fillna('')
         return dispositions
 
+    @property
+    def toi_and_ctoi_dispositions(self) -> pd.DataFrame:
+        """
+        The combined TOI and CTOI dispositions data frame property, indexed by TIC ID. Will be built as an instance
+        attribute on first access.
+
+        :return: The combined dispositions data frame.
+        """
+        if self.toi_and_ctoi_dispositions_ is None:
+            toi_and_ctoi_dispositions = pd.concat([self.toi_dispositions, self.ctoi_dispositions], axis=0,
+                                                  ignore_index=True)
+            toi_and_ctoi_dispositions = toi_and_ctoi_dispositions.set_index(
+                toi_and_ctoi_dispositions[ToiColumns.tic_id.value].rename(None))
+            self.toi_and_ctoi_dispositions_ = toi_and_ctoi_dispositions.sort_index(kind='stable')
+        return self.toi_and_ctoi_dispositions_
+
     def retrieve_exofop_toi_and_ctoi_planet_disposition_for_tic_id(self, tic_id: int) -> pd.DataFrame:
         """
         Retrieves the ExoFOP disposition information for a given TIC ID from <https://exofop.ipac.caltech.edu/tess/>`_.
@@ -137,11 +168,10 @@ class TessToiDataInterface:
         :param tic_id: The TIC ID to get available data for.
         :return: The disposition data frame.
         """
-        toi_dispositions = self.toi_dispositions
-        ctoi_dispositions = self.ctoi_dispositions
-        toi_and_coi_dispositions = pd.concat([toi_dispositions, ctoi_dispositions], axis=0, ignore_index=True)
-        tic_target_dispositions = toi_and_coi_dispositions[toi_and_coi_dispositions['TIC ID'] == tic_id]
-        return tic_target_dispositions
+        toi_and_ctoi_dispositions = self.toi_and_ctoi_dispositions
+        if tic_id not in toi_and_ctoi_dispositions.index:
+            return toi_and_ctoi_dispositions.iloc[0:0].reset_index(drop=True)
+        return toi_and_ctoi_dispositions.loc[[tic_id]].reset_index(drop=True)
 
     def has_any_exofop_dispositions_for_tic_id(self, tic_id: int) -> bool:
         """
@@ -150,11 +180,28 @@ class TessToiDataInterface:
         :param tic_id: The TIC ID to check.
         :return: True if there are dispositions, False if none.
         """
-        existing_dispositions = self.retrieve_exofop_toi_and_ctoi_planet_disposition_for_tic_id(tic_id)
-        if existing_dispositions.shape[0] != 0:
-            return True
-        else:
-            return False
+        return tic_id in self.toi_and_ctoi_dispositions.index
+
+    def has_any_exofop_dispositions_for_tic_ids(self, tic_ids: Iterable[int]) -> np.ndarray:
+        """
+        Returns whether or not any dispositions exist for each of a list of TIC IDs.
+
+        :param tic_ids: The TIC IDs to check.
+        :return: The boolean array stating whether each TIC ID has dispositions.
+        """
+        return pd.Index(list(tic_ids)).isin(self.toi_and_ctoi_dispositions.index)
+
+    def add_has_exofop_dispositions_column(self, data_frame: pd.DataFrame, tic_id_column_name: str = 'tic_id'
+                                           ) -> pd.DataFrame:
+        """
+        Annotates a data frame of targets with whether each target has any dispositions.
+
+        :param data_frame: The data frame of targets.
+        :param tic_id_column_name: The name of the TIC ID column of the data frame.
+        :return: The data frame with the added `has_exofop_dispositions` column.
+        """
+        return data_frame.assign(
+            has_exofop_dispositions=self.has_any_exofop_dispositions_for_tic_ids(data_frame[tic_id_column_name]))
 
     def print_exofop_toi_and_ctoi_planet_dispositions_for_tic_target(self, tic_id):
         """
@@ -182,6 +229,9 @@ class TessToiDataInterface:
         if isinstance(directory, str):
             directory = Path(directory)
         tic_ids = self.toi_dispositions[ToiColumns.tic_id.value].unique()
+        if TessLightCurveProductCatalog.is_available():
+            self.download_exofop_toi_light_curves_from_local_catalog(tic_ids, directory)
+            return
         print('Downloading TESS observation list...')
         single_sector_observations = tess_data_interface.get_all_two_minute_single_sector_observations(tic_ids)
         print("Downloading light curves which are confirmed or suspected planets in TOI dispositions...")
@@ -201,6 +251,26 @@ class TessToiDataInterface:
                 file_path = Path(row['Local Path'])
                 file_path.rename(directory.joinpath(file_path.name))
 
+    def download_exofop_toi_light_curves_from_local_catalog(self, tic_ids: np.ndarray, directory: Path):
+        """
+        Downloads the ExoFOP TOI light curve files which are confirmed or suspected planets, resolving the light curve
+        products from the local catalog snapshot rather than MAST queries.
+
+        :param tic_ids: The TIC IDs of the TOI targets.
+        :param directory: The directory to download the light curves to.
+        """
+        print('Resolving light curves from the local catalog...')
+        data_products = TessLightCurveProductCatalog.get_light_curve_data_products(list(tic_ids))
+        suspected_planet_dispositions = self.toi_dispositions[
+            self.toi_dispositions[ToiColumns.disposition.value] != 'FP']
+        suspected_planet_target_sectors = suspected_planet_dispositions[
+            [ToiColumns.tic_id.value, ToiColumns.sector.value]].drop_duplicates()
+        suspected_planet_target_sectors.columns = ['tic_id', 'sector']
+        suspected_planet_data_products = pd.merge(data_products, suspected_planet_target_sectors.astype(int),
+                                                  how='inner', on=['tic_id', 'sector'])
+        print("Downloading light curves which are confirmed or suspected planets in TOI dispositions...")
+        MastDownloadManager().download_products(suspected_planet_data_products, save_directory=directory)
+
 
 if __name__ == '__main__':
     tess_toi_data_interface = TessToiDataInterface()
@@ -3,13 +3,14 @@ Code for managing the TESS transit metadata.
 """
 import sqlite3
 import warnings
-from typing import List
+from typing import List, Dict
 
 import pandas as pd
 from enum import Enum
 from peewee import IntegerField, CharField
 
-from ramjet.data_interface.metadatabase import MetadatabaseModel, metadatabase
+from ramjet.data_interface.metadatabase import MetadatabaseModel, metadatabase, bulk_upsert, BulkUpsertConflictAction, \
+    bump_table_generation
 from ramjet.data_interface.tess_toi_data_interface import TessToiDataInterface, ToiColumns
 from ramjet.database.tess_planet_disposition import TessPlanetDisposition
 
@@ -42,11 +43,12 @@ class TessTransitMetadataManager:
     A class for managing the TESS transit metadata.
     """
     @staticmethod
-    def build_table():
+    def get_database_dispositions_by_tic_id() -> Dict[int, str]:
         """
-        Builds the TESS transit metadata table.
+        Gets the database disposition of each target based on the TOI and CTOI dispositions.
+
+        :return: The dictionary from TIC ID to database disposition.
         """
-        print('Building TESS transit metadata table...')
         tess_toi_data_interface = TessToiDataInterface()
         toi_dispositions = tess_toi_data_interface.toi_dispositions
         ctoi_dispositions = tess_toi_data_interface.ctoi_dispositions
@@ -55,27 +57,67 @@ class TessTransitMetadataManager:
         all_dispositions = pd.concat([toi_filtered_dispositions, ctoi_filtered_dispositions], ignore_index=True)
         target_grouped_dispositions = all_dispositions.groupby(ToiColumns.tic_id.value)[ToiColumns.disposition.value
                                                                                         ].apply(set)
-        row_count = 0
+        database_dispositions_by_tic_id = {}
+        for tic_id, disposition_set in target_grouped_dispositions.items():
+            # As a target can have multiple dispositions, use the most forgiving available disposition.
+            if 'KP' in disposition_set or 'CP' in disposition_set:
+                database_disposition = Disposition.CONFIRMED.value
+            elif 'PC' in disposition_set or '' in disposition_set or 'APC' in disposition_set:
+                database_disposition = Disposition.CANDIDATE.value
+            elif 'FP' in disposition_set or 'FA' in disposition_set:
+                database_disposition = Disposition.FALSE_POSITIVE.value
+            else:
+                warnings.warn(f'Dispositions for TIC {tic_id} are {disposition_set}, which does not contain a known'
+                              f'disposition.')
+                continue
+            database_dispositions_by_tic_id[tic_id] = database_disposition
+        return database_dispositions_by_tic_id
+
+    @staticmethod
+    def build_table(incremental: bool = False):
+        """
+        Builds the TESS transit metadata table.
+
+        :param incremental: Whether to only insert the new or changed dispositions and remove the vanished ones, rather
+                            than dropping and rebuilding the table.
+        """
+        if incremental and TessTransitMetadata.table_exists():
+            TessTransitMetadataManager.refresh_table()
+            bump_table_generation(TessTransitMetadata)
+            return
+        print('Building TESS transit metadata table...')
+        database_dispositions_by_tic_id = TessTransitMetadataManager.get_database_dispositions_by_tic_id()
         metadatabase.drop_tables([TessTransitMetadata])
         metadatabase.create_tables([TessTransitMetadata])
-        with metadatabase.atomic():
-            for tic_id, disposition_set in target_grouped_dispositions.items():
-                # As a target can have multiple dispositions, use the most forgiving available disposition.
-                if 'KP' in disposition_set or 'CP' in disposition_set:
-                    database_disposition = Disposition.CONFIRMED.value
-                elif 'PC' in disposition_set or '' in disposition_set or 'APC' in disposition_set:
-                    database_disposition = Disposition.CANDIDATE.value
-                elif 'FP' in disposition_set or 'FA' in disposition_set:
-                    database_disposition = Disposition.FALSE_POSITIVE.value
-                else:
-                    warnings.warn(f'Dispositions for TIC {tic_id} are {disposition_set}, which does not contain a known'
-                                  f'disposition.')
-                    continue
-                row = TessTransitMetadata(tic_id=tic_id, disposition=database_disposition)
-                row.save()
-                row_count += 1
+        rows = [{'tic_id': tic_id, 'disposition': database_disposition}
+                for tic_id, database_disposition in database_dispositions_by_tic_id.items()]
+        row_count = bulk_upsert(TessTransitMetadata, rows)
+        bump_table_generation(TessTransitMetadata)
         print(f'Table built. {row_count} rows added.')
 
+    @staticmethod
+    def refresh_table():
+        """
+        Brings the TESS transit metadata table up to date with the TOI and CTOI dispositions, only writing the rows
+        which are new or have a changed disposition, and deleting the targets which no longer have a disposition.
+        """
+        print('Refreshing TESS transit metadata table...')
+        database_dispositions_by_tic_id = TessTransitMetadataManager.get_database_dispositions_by_tic_id()
+        existing_dispositions_by_tic_id = dict(
+            TessTransitMetadata.select(TessTransitMetadata.tic_id, TessTransitMetadata.disposition).tuples())
+        changed_rows = [{'tic_id': tic_id, 'disposition': disposition}
+                        for tic_id, disposition in database_dispositions_by_tic_id.items()
+                        if existing_dispositions_by_tic_id.get(tic_id) != disposition]
+        vanished_tic_ids = [tic_id for tic_id in existing_dispositions_by_tic_id.keys()
+                            if tic_id not in database_dispositions_by_tic_id]
+        with metadatabase.atomic():
+            bulk_upsert(TessTransitMetadata, changed_rows, conflict_action=BulkUpsertConflictAction.UPDATE,
+                        conflict_target=[TessTransitMetadata.tic_id])
+            for batch_start_index in range(0, len(vanished_tic_ids), 500):
+                batch_tic_ids = vanished_tic_ids[batch_start_index:batch_start_index + 500]
+                TessTransitMetadata.delete().where(TessTransitMetadata.tic_id.in_(batch_tic_ids)).execute()
+        print(f'Table refreshed. {len(changed_rows)} rows added or updated and {len(vanished_tic_ids)} rows removed.')
+
     @staticmethod
     def add_tic_ids_as_confirmed(tic_ids: List[int]):
         """
@@ -83,17 +125,9 @@ class TessTransitMetadataManager:
 
         :param tic_ids: The list of TIC IDs.
         """
-        rows_added = 0
-        with metadatabase.atomic():
-            for tic_id in tic_ids:
-                query = TessTransitMetadata.select().where(TessTransitMetadata.tic_id == tic_id)
-                if query.exists():
-                    continue
-                transit = TessTransitMetadata()
-                transit.tic_id = tic_id
-                transit.disposition = Disposition.CONFIRMED.value
-                transit.save()
-                rows_added += 1
+        rows = [{'tic_id': tic_id, 'disposition': Disposition.CONFIRMED.value} for tic_id in tic_ids]
+        rows_added = bulk_upsert(TessTransitMetadata, rows, conflict_action=BulkUpsertConflictAction.IGNORE)
+        bump_table_generation(TessTransitMetadata)
         print(f'{rows_added} rows added.')
 
 
@@ -1,12 +1,16 @@
 """
 Code for managing the meta data of the two minute cadence TESS light curves.
 """
+import os
+import time
 from pathlib import Path
-from typing import List
+from typing import List, Dict, Any, Optional
 from peewee import IntegerField, CharField, SchemaManager
 
-from ramjet.data_interface.metadatabase import MetadatabaseModel, metadatabase, metadatabase_uuid, \
-    convert_class_to_table_name, dataset_split_from_uuid
+from ramjet.data_interface.metadatabase import MetadatabaseModel, metadatabase_uuid, \
+    convert_class_to_table_name, dataset_split_from_uuid, refresh_rows_from_files_in_parallel, \
+    scan_directory_file_states, clear_file_manifest, FileState, create_random_order_value, \
+    add_missing_random_order_field, rerandomize_random_order_field, bulk_upsert, bump_table_generation
 from ramjet.data_interface.tess_data_interface import TessDataInterface
 
 
@@ -18,6 +22,7 @@ class TessTwoMinuteCadenceLightCurveMetadata(MetadatabaseModel):
     sector = IntegerField(index=True)
     path = CharField(unique=True)
     dataset_split = IntegerField()
+    random_order = IntegerField(index=True, default=create_random_order_value)
 
     class Meta:
         """Schema meta data for the model."""
@@ -34,6 +39,24 @@ class TessTwoMinuteCadenceLightCurveMetadataManger:
 
     def __init__(self):
         self.light_curve_root_directory_path = Path('data/tess_two_minute_cadence_light_curves')
+        self.number_of_processes: Optional[int] = None
+
+    def create_row_dictionary_for_path(self, light_curve_path: Path) -> Dict[str, Any]:
+        """
+        Creates the table row dictionary for a light curve path.
+
+        :param light_curve_path: The path of the light curve, relative to the light curve root directory.
+        :return: The row dictionary.
+        """
+        table_name = convert_class_to_table_name(TessTwoMinuteCadenceLightCurveMetadata)
+        tic_id, sector = self.tess_data_interface.get_tic_id_and_sector_from_file_path(light_curve_path)
+        uuid_name = f'{table_name} TIC {tic_id} sector {sector}'
+        uuid = metadatabase_uuid(uuid_name)
+        dataset_split = dataset_split_from_uuid(uuid)
+        return {TessTwoMinuteCadenceLightCurveMetadata.path.name: str(light_curve_path),
+                TessTwoMinuteCadenceLightCurveMetadata.tic_id.name: tic_id,
+                TessTwoMinuteCadenceLightCurveMetadata.sector.name: sector,
+                TessTwoMinuteCadenceLightCurveMetadata.dataset_split.name: dataset_split}
 
     def insert_multiple_rows_from_paths_into_database(self, light_curve_paths: List[Path]):
         """
@@ -41,50 +64,91 @@ class TessTwoMinuteCadenceLightCurveMetadataManger:
 
         :param light_curve_paths: The list of paths to insert.
         """
-        row_dictionary_list = []
-        table_name = convert_class_to_table_name(TessTwoMinuteCadenceLightCurveMetadata)
-        for light_curve_path in light_curve_paths:
-            tic_id, sector = self.tess_data_interface.get_tic_id_and_sector_from_file_path(light_curve_path)
-            uuid_name = f'{table_name} TIC {tic_id} sector {sector}'
-            uuid = metadatabase_uuid(uuid_name)
-            dataset_split = dataset_split_from_uuid(uuid)
-            row_dictionary_list.append({TessTwoMinuteCadenceLightCurveMetadata.path.name: str(light_curve_path),
-                                        TessTwoMinuteCadenceLightCurveMetadata.tic_id.name: tic_id,
-                                        TessTwoMinuteCadenceLightCurveMetadata.sector.name: sector,
-                                        TessTwoMinuteCadenceLightCurveMetadata.dataset_split.name: dataset_split})
-        with metadatabase.atomic():
-            TessTwoMinuteCadenceLightCurveMetadata.insert_many(row_dictionary_list).execute()
+        row_dictionary_list = [self.create_row_dictionary_for_path(light_curve_path)
+                               for light_curve_path in light_curve_paths]
+        bulk_upsert(TessTwoMinuteCadenceLightCurveMetadata, row_dictionary_list)
+
+    def get_light_curve_directory_paths(self) -> List[Path]:
+        """
+        Gets the root light curve directory and all of its subdirectories.
+
+        :return: The list of light curve directory paths.
+        """
+        light_curve_directory_paths = []
+        directory_paths_to_walk = [self.light_curve_root_directory_path]
+        while len(directory_paths_to_walk) > 0:
+            directory_path = directory_paths_to_walk.pop()
+            light_curve_directory_paths.append(directory_path)
+            with os.scandir(directory_path) as directory_entries:
+                for entry in directory_entries:
+                    if entry.is_dir():
+                        directory_paths_to_walk.append(Path(entry.path))
+        return sorted(light_curve_directory_paths)
+
+    def scan_light_curve_directory(self, light_curve_directory_path: Path) -> List[FileState]:
+        """
+        Scans a directory for the states of its light curve files. Designed to be run by the worker processes of a
+        parallel table refresh.
+
+        :param light_curve_directory_path: The directory containing the light curve files.
+        :return: The list of file states.
+        """
+        return scan_directory_file_states(light_curve_directory_path, self.light_curve_root_directory_path,
+                                          lambda file_name: file_name.endswith('.fits'))
+
+    def create_row_dictionaries_for_relative_paths(self, relative_light_curve_paths: List[Path]
+                                                   ) -> List[Dict[str, Any]]:
+        """
+        Creates the table row dictionaries for a list of light curve paths. Designed to be run by the worker processes
+        of a parallel table refresh.
+
+        :param relative_light_curve_paths: The light curve paths relative to the light curve root directory.
+        :return: The list of row dictionaries.
+        """
+        return [self.create_row_dictionary_for_path(relative_path) for relative_path in relative_light_curve_paths]
 
     def populate_sql_database(self):
         """
-        Populates the SQL database based on the light curve files.
+        Populates the SQL database based on the light curve files. Only light curve files which are not already in the
+        file manifest (or have changed) are added, and rows for light curve files which no longer exist are removed.
         """
         print('Populating the TESS two minute cadence light curve meta data table...')
-        path_glob = self.light_curve_root_directory_path.glob('**/*.fits')
-        row_count = 0
-        batch_paths = []
-        with metadatabase.atomic():
-            for index, path in enumerate(path_glob):
-                batch_paths.append(path.relative_to(self.light_curve_root_directory_path))
-                row_count += 1
-                if index % 1000 == 0 and index != 0:
-                    self.insert_multiple_rows_from_paths_into_database(batch_paths)
-                    batch_paths = []
-                    print(f'{index} rows inserted...', end='\r')
-            if len(batch_paths) > 0:
-                self.insert_multiple_rows_from_paths_into_database(batch_paths)
-        print(f'TESS two minute cadence light curve meta data table populated. {row_count} rows added.')
-
-    def build_table(self):
+        start_time = time.perf_counter()
+        inserted_count, deleted_count = refresh_rows_from_files_in_parallel(
+            TessTwoMinuteCadenceLightCurveMetadata, TessTwoMinuteCadenceLightCurveMetadata.path,
+            self.scan_light_curve_directory, self.create_row_dictionaries_for_relative_paths,
+            self.get_light_curve_directory_paths(), number_of_processes=self.number_of_processes)
+        elapsed_time = time.perf_counter() - start_time
+        print(f'TESS two minute cadence light curve meta data table populated. {inserted_count} rows added and '
+              f'{deleted_count} rows removed in {elapsed_time:.0f}s.')
+
+    def build_table(self, incremental: bool = False, rerandomize: bool = False):
         """
         Builds the SQL table.
+
+        :param incremental: Whether to only add the new light curve files and remove the vanished ones, rather than
+                            dropping and rebuilding the table. Indexes are left in place for an incremental build, and
+                            new rows are given their random order on insert.
+        :param rerandomize: Whether to re-randomize the random order of all the rows after an incremental build.
         """
+        if incremental and TessTwoMinuteCadenceLightCurveMetadata.table_exists():
+            add_missing_random_order_field(TessTwoMinuteCadenceLightCurveMetadata,
+                                           TessTwoMinuteCadenceLightCurveMetadata.random_order)
+            self.populate_sql_database()
+            if rerandomize:
+                print('Re-randomizing the random order...', flush=True)
+                rerandomize_random_order_field(TessTwoMinuteCadenceLightCurveMetadata,
+                                               TessTwoMinuteCadenceLightCurveMetadata.random_order)
+            bump_table_generation(TessTwoMinuteCadenceLightCurveMetadata)
+            return
         TessTwoMinuteCadenceLightCurveMetadata.drop_table()
         TessTwoMinuteCadenceLightCurveMetadata.create_table()
+        clear_file_manifest(TessTwoMinuteCadenceLightCurveMetadata)
         SchemaManager(TessTwoMinuteCadenceLightCurveMetadata).drop_indexes()  # To allow for fast insert.
         self.populate_sql_database()
         print('Building indexes...')
         SchemaManager(TessTwoMinuteCadenceLightCurveMetadata).create_indexes()  # Since we dropped them before.
+        bump_table_generation(TessTwoMinuteCadenceLightCurveMetadata)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,100 @@
+"""
+Code for inferring only on the light curves of target sectors which have not yet been inferred on.
+"""
+from functools import partial
+from pathlib import Path
+from typing import Callable, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from ramjet.data_interface.target_inference_results import TargetInferenceResultsManager
+from ramjet.inference_result_writer import build_confidences_data_frame, get_sort_column_name
+from ramjet.photometric_database.standard_and_injected_light_curve_database import \
+    StandardAndInjectedLightCurveDatabase
+from ramjet.photometric_database.tess_ffi_light_curve import TessFfiLightCurve
+
+
+def is_new_target_sector_path(get_tic_id_and_sector_from_path: Callable[[Path], Tuple[int, Union[int, None]]],
+                              inferred_tic_id_and_sector_pairs: Set[Tuple[int, int]], path: Path) -> bool:
+    """
+    Checks if a light curve path is of a target sector which has not been inferred on.
+
+    :param get_tic_id_and_sector_from_path: The function to get the TIC ID and sector of a path.
+    :param inferred_tic_id_and_sector_pairs: The set of TIC ID and sector pairs already inferred on.
+    :param path: The light curve path.
+    :return: Whether the path is of a new target sector.
+    """
+    return get_tic_id_and_sector_from_path(path) not in inferred_tic_id_and_sector_pairs
+
+
+class IncrementalTargetInferenceRunner:
+    """
+    A class for inferring on the inference collections of a database, skipping the target sectors which already have
+    results for the model checkpoint. Results are stored per target sector, and the aggregates of each target across
+    its sectors are updated as results are saved. Results are only written by the process running the inference, to
+    the target inference results database, so the metadatabase connections can be read-only.
+
+    :ivar model: The model to infer with.
+    :ivar database: The database whose inference collections are inferred on.
+    :ivar model_checkpoint: The identifier of the model checkpoint, used to key the results.
+    :ivar get_tic_id_and_sector_from_path: The function to get the TIC ID and sector of a light curve path.
+    :ivar rows_per_save: The number of results at which the results are saved.
+    """
+    def __init__(self, model: tf.keras.Model, database: StandardAndInjectedLightCurveDatabase, model_checkpoint: str,
+                 get_tic_id_and_sector_from_path: Callable[[Path], Tuple[int, Union[int, None]]] =
+                 TessFfiLightCurve.get_tic_id_and_sector_from_file_path,
+                 rows_per_save: int = 10_000):
+        self.model: tf.keras.Model = model
+        self.database: StandardAndInjectedLightCurveDatabase = database
+        self.model_checkpoint: str = model_checkpoint
+        self.get_tic_id_and_sector_from_path: Callable[[Path], Tuple[int, Union[int, None]]] = \
+            get_tic_id_and_sector_from_path
+        self.rows_per_save: int = rows_per_save
+        self.results_manager = TargetInferenceResultsManager()
+
+    def run(self) -> int:
+        """
+        Infers on the new target sectors.
+
+        :return: The number of light curves inferred on.
+        """
+        inferred_tic_id_and_sector_pairs = self.results_manager.load_inferred_tic_id_and_sector_pairs(
+            self.model_checkpoint)
+        print(f'{len(inferred_tic_id_and_sector_pairs)} target sectors previously inferred on.', flush=True)
+        path_filter = partial(is_new_target_sector_path, self.get_tic_id_and_sector_from_path,
+                              inferred_tic_id_and_sector_pairs)
+        dataset = self.database.generate_inference_dataset(path_filter=path_filter)
+        batch_data_frames = []
+        buffered_row_count = 0
+        examples_count = 0
+        for paths, examples in dataset:
+            confidences = self.model(examples, training=False)
+            batch_data_frames.append(build_confidences_data_frame(paths.numpy(), np.asarray(confidences)))
+            buffered_row_count += batch_data_frames[-1].shape[0]
+            examples_count += batch_data_frames[-1].shape[0]
+            if buffered_row_count >= self.rows_per_save:
+                self.save_results(batch_data_frames)
+                batch_data_frames = []
+                buffered_row_count = 0
+            print(f'{examples_count} examples inferred on.', flush=True)
+        if buffered_row_count > 0:
+            self.save_results(batch_data_frames)
+        return examples_count
+
+    def save_results(self, batch_data_frames: [pd.DataFrame]):
+        """
+        Saves batch results to the per target sector results table.
+
+        :param batch_data_frames: The batch results data frames.
+        """
+        results_data_frame = pd.concat(batch_data_frames, ignore_index=True)
+        tic_ids_and_sectors = [self.get_tic_id_and_sector_from_path(Path(path))
+                               for path in results_data_frame['light_curve_path']]
+        if any(sector is None for _, sector in tic_ids_and_sectors):
+            raise ValueError('Incremental inference requires the sector of every light curve path.')
+        results_data_frame['tic_id'] = [tic_id for tic_id, _ in tic_ids_and_sectors]
+        results_data_frame['sector'] = [sector for _, sector in tic_ids_and_sectors]
+        results_data_frame['confidence'] = results_data_frame[get_sort_column_name(results_data_frame)]
+        self.results_manager.save_results(results_data_frame, self.model_checkpoint)
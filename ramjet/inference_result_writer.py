@@ -0,0 +1,271 @@
+"""
+Code for streaming inference results to disk with a constant memory footprint.
+"""
+import heapq
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def build_confidences_data_frame(paths: np.ndarray, confidences: np.ndarray) -> pd.DataFrame:
+    """
+    Builds the results data frame of a batch of inferred light curves.
+
+    :param paths: The light curve paths of the batch.
+    :param confidences: The model confidences of the batch, with one column per label.
+    :return: The batch results data frame, with a single confidence column for single label models and a confidence
+             column per label otherwise.
+    """
+    if confidences.shape[1] == 1:
+        return pd.DataFrame({'light_curve_path': paths.astype(str), 'confidence': np.squeeze(confidences, axis=1)})
+    confidences_data_frame = pd.DataFrame({'light_curve_path': paths.astype(str)})
+    for label_index in range(confidences.shape[1]):
+        confidences_data_frame[f'label_{label_index}_confidence'] = confidences[:, label_index]
+    return confidences_data_frame
+
+
+def build_ensemble_confidences_data_frame(paths: np.ndarray, confidences_per_model: Dict[str, np.ndarray]
+                                          ) -> pd.DataFrame:
+    """
+    Builds the results data frame of a batch of light curves inferred on by an ensemble of models. The mean confidence
+    across the models takes the place of the single model confidence, so the results are sorted by the mean.
+
+    :param paths: The light curve paths of the batch.
+    :param confidences_per_model: The dictionary from model name to the confidences of the batch, with one column per
+                                  label.
+    :return: The batch results data frame, with each model's confidences, and the mean and variance of the confidences
+             across the models.
+    """
+    model_names = list(confidences_per_model.keys())
+    stacked_confidences = np.stack([confidences_per_model[model_name] for model_name in model_names])
+    mean_confidences = np.mean(stacked_confidences, axis=0)
+    confidence_variances = np.var(stacked_confidences, axis=0)
+    confidences_data_frame = pd.DataFrame({'light_curve_path': paths.astype(str)})
+    for label_index in range(stacked_confidences.shape[2]):
+        label_prefix = '' if stacked_confidences.shape[2] == 1 else f'label_{label_index}_'
+        confidences_data_frame[f'{label_prefix}confidence'] = mean_confidences[:, label_index]
+        confidences_data_frame[f'{label_prefix}confidence_variance'] = confidence_variances[:, label_index]
+        for model_index, model_name in enumerate(model_names):
+            confidences_data_frame[f'{model_name}_{label_prefix}confidence'] = stacked_confidences[model_index, :,
+                                                                                                   label_index]
+    return confidences_data_frame
+
+
+def get_sort_column_name(data_frame: pd.DataFrame) -> str:
+    """
+    Gets the name of the confidence column the results are sorted by.
+
+    :param data_frame: A data frame of results.
+    :return: The sort column name.
+    """
+    if 'confidence' in data_frame.columns:
+        return 'confidence'
+    return 'label_0_confidence'
+
+
+def get_confidence_column_names(data_frame: pd.DataFrame) -> List[str]:
+    """
+    Gets the names of the confidence columns of a results data frame.
+
+    :param data_frame: A data frame of results.
+    :return: The confidence column names.
+    """
+    return [column_name for column_name in data_frame.columns
+            if column_name == 'confidence' or (column_name.startswith('label_') and
+                                               column_name.endswith('_confidence'))]
+
+
+class InferenceResultWriter:
+    """
+    A class for writing inference results as they are produced. Batches are buffered until a run is full, at which
+    point the run is sorted by confidence and appended to disk as its own CSV file. Finalizing merges the sorted runs
+    into the results file with an external k-way merge, so memory use is bounded by the run size rather than the size
+    of the inferred collection.
+
+    :ivar infer_results_path: The path of the final results file.
+    :ivar rows_per_run: The number of buffered rows at which a sorted run is written to disk.
+    :ivar rows_per_merge_chunk: The number of rows read from each run, and written to the results file, at a time
+                                during the merge.
+    :ivar column_names: The column names of the results, taken from the first batch. None until a batch is written.
+    """
+    def __init__(self, infer_results_path: Path, rows_per_run: int = 1_000_000, rows_per_merge_chunk: int = 10_000):
+        self.infer_results_path: Path = infer_results_path
+        self.rows_per_run: int = rows_per_run
+        self.rows_per_merge_chunk: int = rows_per_merge_chunk
+        self.infer_results_path.parent.mkdir(parents=True, exist_ok=True)
+        self.run_directory: Path = Path(tempfile.mkdtemp(prefix=f'{self.infer_results_path.stem} runs ',
+                                                         dir=self.infer_results_path.parent))
+        self.run_paths: List[Path] = []
+        self.buffered_batch_data_frames: List[pd.DataFrame] = []
+        self.buffered_row_count: int = 0
+        self.written_row_count: int = 0
+        self.column_names: Optional[List[str]] = None
+
+    def write_batch(self, batch_data_frame: pd.DataFrame):
+        """
+        Adds a batch of results, writing a sorted run to disk when the buffer is full.
+
+        :param batch_data_frame: The data frame of the batch results.
+        """
+        if self.column_names is None:
+            self.column_names = batch_data_frame.columns.tolist()
+        self.buffered_batch_data_frames.append(batch_data_frame)
+        self.buffered_row_count += batch_data_frame.shape[0]
+        if self.buffered_row_count >= self.rows_per_run:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered results to disk as a sorted run.
+        """
+        if self.buffered_row_count == 0:
+            return
+        run_data_frame = pd.concat(self.buffered_batch_data_frames, ignore_index=True)
+        run_data_frame = run_data_frame.sort_values(get_sort_column_name(run_data_frame), ascending=False,
+                                                    kind='stable')
+        run_path = self.run_directory.joinpath(f'run_{len(self.run_paths)}.csv')
+        run_data_frame.to_csv(run_path, index=False)
+        self.run_paths.append(run_path)
+        self.written_row_count += self.buffered_row_count
+        self.buffered_batch_data_frames = []
+        self.buffered_row_count = 0
+
+    def iterate_run_rows(self, run_path: Path) -> Iterator[tuple]:
+        """
+        Iterates over the rows of a sorted run, reading it in chunks.
+
+        :param run_path: The path of the run.
+        :return: The iterator of row tuples, in column order.
+        """
+        for run_chunk in pd.read_csv(run_path, chunksize=self.rows_per_merge_chunk,
+                                     dtype={'light_curve_path': str}):
+            yield from run_chunk.itertuples(index=False, name=None)
+
+    def finalize(self):
+        """
+        Merges the sorted runs into the results file, sorted by descending confidence, and removes the runs. If no rows
+        were inferred, the results file only contains the header.
+        """
+        self.flush()
+        try:
+            if len(self.run_paths) == 0:
+                column_names = self.column_names or ['light_curve_path', 'confidence']
+                merged_rows = iter([])
+            else:
+                column_names = pd.read_csv(self.run_paths[0], nrows=0).columns.tolist()
+                sort_column_index = column_names.index(get_sort_column_name(pd.DataFrame(columns=column_names)))
+                merged_rows = heapq.merge(*[self.iterate_run_rows(run_path) for run_path in self.run_paths],
+                                          key=lambda row: row[sort_column_index], reverse=True)
+            temporary_results_path = self.run_directory.joinpath('merged.csv')
+            merged_row_count = 0
+            chunk_rows = []
+            for row in merged_rows:
+                chunk_rows.append(row)
+                if len(chunk_rows) == self.rows_per_merge_chunk:
+                    self.append_merge_chunk(chunk_rows, column_names, merged_row_count, temporary_results_path)
+                    merged_row_count += len(chunk_rows)
+                    chunk_rows = []
+            if len(chunk_rows) > 0 or merged_row_count == 0:
+                self.append_merge_chunk(chunk_rows, column_names, merged_row_count, temporary_results_path)
+            shutil.move(temporary_results_path, self.infer_results_path)
+        finally:
+            shutil.rmtree(self.run_directory, ignore_errors=True)
+
+    @staticmethod
+    def append_merge_chunk(chunk_rows: List[tuple], column_names: List[str], start_index: int, path: Path):
+        """
+        Appends a chunk of merged rows to the results file.
+
+        :param chunk_rows: The merged row tuples.
+        :param column_names: The names of the columns of the rows.
+        :param start_index: The index of the first row of the chunk in the results file.
+        :param path: The path of the results file being written.
+        """
+        chunk_data_frame = pd.DataFrame(chunk_rows, columns=column_names,
+                                        index=pd.RangeIndex(start_index, start_index + len(chunk_rows)))
+        chunk_data_frame.to_csv(path, index_label='index', mode='w' if start_index == 0 else 'a',
+                                header=start_index == 0)
+
+
+class TopPredictionAccumulator:
+    """
+    A class for keeping only the top predictions during inference. Batches are buffered and periodically reduced, using
+    a partial sort of each confidence column, to the union of the top candidates of each label. Memory use is therefore
+    bounded by a small multiple of the number of predictions kept, regardless of the size of the inferred collection.
+    The results file holds the candidates sorted by the first confidence column, so the top predictions of any other
+    label are recovered by sorting the file by that label. The current top predictions are saved to the results file
+    on a time interval, so a long run has usable results before it completes.
+
+    :ivar infer_results_path: The path of the results file.
+    :ivar number_of_top_predictions_to_keep: The number of top predictions to keep for each label.
+    :ivar checkpoint_interval: The number of seconds between saves of the current top predictions.
+    """
+    def __init__(self, infer_results_path: Path, number_of_top_predictions_to_keep: int,
+                 checkpoint_interval: float = 600):
+        self.infer_results_path: Path = infer_results_path
+        self.number_of_top_predictions_to_keep: int = number_of_top_predictions_to_keep
+        self.checkpoint_interval: float = checkpoint_interval
+        self.candidate_data_frames: List[pd.DataFrame] = []
+        self.candidate_row_count: int = 0
+        self.last_checkpoint_time: float = time.monotonic()
+
+    def write_batch(self, batch_data_frame: pd.DataFrame):
+        """
+        Adds a batch of results to the candidates, saving the current top predictions if the checkpoint interval has
+        passed.
+
+        :param batch_data_frame: The data frame of the batch results.
+        """
+        self.candidate_data_frames.append(batch_data_frame)
+        self.candidate_row_count += batch_data_frame.shape[0]
+        if self.candidate_row_count >= 2 * max(self.number_of_top_predictions_to_keep, 1_000):
+            self.reduce()
+        if time.monotonic() - self.last_checkpoint_time >= self.checkpoint_interval:
+            self.save()
+
+    def reduce(self):
+        """
+        Reduces the candidates to the union of the top predictions of each confidence column.
+        """
+        if len(self.candidate_data_frames) == 0:
+            return
+        candidate_data_frame = pd.concat(self.candidate_data_frames, ignore_index=True)
+        if candidate_data_frame.shape[0] > self.number_of_top_predictions_to_keep:
+            keep_mask = np.zeros(candidate_data_frame.shape[0], dtype=bool)
+            for confidence_column_name in get_confidence_column_names(candidate_data_frame):
+                negative_confidences = -candidate_data_frame[confidence_column_name].to_numpy()
+                if self.number_of_top_predictions_to_keep > 0:
+                    top_indexes = np.argpartition(negative_confidences, self.number_of_top_predictions_to_keep - 1
+                                                  )[:self.number_of_top_predictions_to_keep]
+                    keep_mask[top_indexes] = True
+            candidate_data_frame = candidate_data_frame[keep_mask]
+        self.candidate_data_frames = [candidate_data_frame]
+        self.candidate_row_count = candidate_data_frame.shape[0]
+
+    def save(self):
+        """
+        Saves the current top predictions to the results file.
+        """
+        self.reduce()
+        if len(self.candidate_data_frames) != 0:
+            candidate_data_frame = self.candidate_data_frames[0]
+            candidate_data_frame = candidate_data_frame.sort_values(get_sort_column_name(candidate_data_frame),
+                                                                    ascending=False, kind='stable')
+            candidate_data_frame = candidate_data_frame.reset_index(drop=True)
+            self.infer_results_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary_results_path = self.infer_results_path.with_name(f'{self.infer_results_path.name}.tmp')
+            candidate_data_frame.to_csv(temporary_results_path, index_label='index')
+            os.replace(temporary_results_path, self.infer_results_path)
+        self.last_checkpoint_time = time.monotonic()
+
+    def finalize(self):
+        """
+        Saves the final top predictions to the results file.
+        """
+        self.save()
@@ -0,0 +1,348 @@
+"""
+Code for a long-running local inference service, which loads a model once and scores light curves on request.
+"""
+import json
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+import numpy as np
+import requests
+import tensorflow as tf
+
+from ramjet.photometric_database.standard_and_injected_light_curve_database import \
+    StandardAndInjectedLightCurveDatabase
+
+Examples = Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]
+
+
+class DynamicBatcher:
+    """
+    A class for merging concurrent inference requests into batches. A worker thread waits for a request, then gathers
+    further requests until the batch is full or the maximum wait has passed, infers on the merged batch, and splits the
+    confidences back to the requests.
+
+    :ivar model: The model to infer with.
+    :ivar max_batch_size: The maximum number of examples in a merged batch. A single larger request is inferred on as
+                          its own batch.
+    :ivar max_wait: The maximum number of seconds to wait for further requests after the first request of a batch.
+    """
+    def __init__(self, model: Callable, max_batch_size: int = 64, max_wait: float = 0.01):
+        self.model: Callable = model
+        self.max_batch_size: int = max_batch_size
+        self.max_wait: float = max_wait
+        self.request_queue: queue.Queue = queue.Queue()
+        self.worker_thread: Optional[threading.Thread] = None
+        self.is_running: bool = False
+
+    def start(self):
+        """
+        Starts the worker thread.
+        """
+        self.is_running = True
+        self.worker_thread = threading.Thread(target=self.process_requests, daemon=True)
+        self.worker_thread.start()
+
+    def stop(self):
+        """
+        Stops the worker thread after the current batch.
+        """
+        self.is_running = False
+        self.request_queue.put(None)
+        self.worker_thread.join()
+
+    def infer(self, examples: Examples) -> np.ndarray:
+        """
+        Infers on examples, blocking until the batch containing them has been inferred on.
+
+        :param examples: The examples to infer on.
+        :return: The confidences of the examples.
+        """
+        future = Future()
+        self.request_queue.put((examples, future))
+        return future.result()
+
+    def process_requests(self):
+        """
+        Infers on merged batches of requests until stopped.
+        """
+        while self.is_running:
+            request = self.request_queue.get()
+            if request is None:
+                continue
+            requests_ = [request]
+            example_count = get_example_count(request[0])
+            deadline = time.monotonic() + self.max_wait
+            while example_count < self.max_batch_size:
+                remaining_wait = deadline - time.monotonic()
+                if remaining_wait <= 0:
+                    break
+                try:
+                    request = self.request_queue.get(timeout=remaining_wait)
+                except queue.Empty:
+                    break
+                if request is None:
+                    break
+                if example_count + get_example_count(request[0]) > self.max_batch_size:
+                    self.request_queue.put(request)  # Deferred to the next batch.
+                    break
+                requests_.append(request)
+                example_count += get_example_count(request[0])
+            self.infer_merged_requests(requests_)
+
+    def infer_merged_requests(self, requests_: List[Tuple[Examples, Future]]):
+        """
+        Infers on the merged examples of requests and sets the confidences of each request.
+
+        :param requests_: The requests, as pairs of examples and the future of their confidences.
+        """
+        try:
+            merged_examples = tf.nest.map_structure(lambda *arrays: np.concatenate(arrays),
+                                                    *[examples for examples, _ in requests_])
+            confidences = np.asarray(self.model(merged_examples, training=False))
+        except Exception as error:
+            for _, future in requests_:
+                future.set_exception(error)
+            return
+        start_index = 0
+        for examples, future in requests_:
+            end_index = start_index + get_example_count(examples)
+            future.set_result(confidences[start_index:end_index])
+            start_index = end_index
+
+
+def get_example_count(examples: Examples) -> int:
+    """
+    Gets the number of examples in a batch of examples.
+
+    :param examples: The examples.
+    :return: The number of examples.
+    """
+    return tf.nest.flatten(examples)[0].shape[0]
+
+
+class InferenceServer:
+    """
+    A class for a local HTTP inference service. The model is loaded once, and light curves are scored on request by
+    path or by flux array. Concurrent requests are merged into batches by a dynamic batcher, while the light curves of
+    each request are loaded and preprocessed in the request's own thread.
+
+    Requests are JSON `POST`s to `/score`, with either a `paths` list (and an optional index of the database's inference
+    collection used to load them, `collection_index`), or a `fluxes` list of flux arrays (with optional `times` and
+    `auxiliary_information` lists). The response is a JSON object with a `confidences` list of per example lists.
+
+    :ivar model: The model to infer with.
+    :ivar database: The database defining how the light curves are preprocessed.
+    :ivar batcher: The dynamic batcher merging the requests.
+    :ivar http_server: The HTTP server.
+    """
+    def __init__(self, model: Callable, database: StandardAndInjectedLightCurveDatabase, host: str = '127.0.0.1',
+                 port: int = 8642, max_batch_size: int = 64, max_wait: float = 0.01):
+        self.model: Callable = model
+        self.database: StandardAndInjectedLightCurveDatabase = database
+        self.batcher = DynamicBatcher(model, max_batch_size=max_batch_size, max_wait=max_wait)
+        self.http_server = ThreadingHTTPServer((host, port), create_request_handler_class(self))
+        self.http_server.daemon_threads = True
+        self.server_thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """
+        The URL of the server.
+
+        :return: The URL.
+        """
+        host, port = self.http_server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """
+        Starts serving in a background thread.
+        """
+        self.batcher.start()
+        self.server_thread = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+        self.server_thread.start()
+
+    def serve_forever(self):
+        """
+        Serves in the current thread until interrupted.
+        """
+        self.batcher.start()
+        print(f'Serving inference at {self.url}.', flush=True)
+        try:
+            self.http_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.http_server.server_close()
+            self.batcher.stop()
+
+    def stop(self):
+        """
+        Stops serving.
+        """
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        self.batcher.stop()
+
+    def __enter__(self) -> 'InferenceServer':
+        self.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.stop()
+
+    def preprocess_paths(self, paths: List[str], collection_index: int = 0) -> Examples:
+        """
+        Loads and preprocesses the light curves of paths into examples.
+
+        :param paths: The light curve paths.
+        :param collection_index: The index of the database's inference collection used to load the paths.
+        :return: The examples.
+        """
+        light_curve_collection = self.database.inference_light_curve_collections[collection_index]
+        preprocessed = [self.database.preprocess_infer_light_curve(
+            light_curve_collection.load_times_fluxes_and_flux_errors_from_path,
+            light_curve_collection.load_auxiliary_information_for_path, tf.constant(str(path)))[1:]
+            for path in paths]
+        return self.stack_examples(preprocessed)
+
+    def preprocess_arrays(self, fluxes_list: List[List[float]], times_list: Optional[List[List[float]]] = None,
+                          auxiliary_information_list: Optional[List[List[float]]] = None) -> Examples:
+        """
+        Preprocesses light curve arrays into examples.
+
+        :param fluxes_list: The fluxes of each light curve.
+        :param times_list: The times of each light curve. Required if the database includes times.
+        :param auxiliary_information_list: The auxiliary information of each light curve. Required if the database
+                                           uses auxiliary information.
+        :return: The examples.
+        """
+        preprocessed = []
+        for index, fluxes in enumerate(fluxes_list):
+            times = None if times_list is None else np.array(times_list[index], dtype=np.float32)
+            light_curve = self.database.build_light_curve_array(fluxes=np.array(fluxes, dtype=np.float32),
+                                                                times=times)
+            example = self.database.preprocess_light_curve(light_curve, evaluation_mode=True)
+            if self.database.number_of_auxiliary_values > 0:
+                preprocessed.append((example, np.array(auxiliary_information_list[index], dtype=np.float32)))
+            else:
+                preprocessed.append((example,))
+        return self.stack_examples(preprocessed)
+
+    @staticmethod
+    def stack_examples(preprocessed: List[Tuple[np.ndarray, ...]]) -> Examples:
+        """
+        Stacks individually preprocessed examples into a batch.
+
+        :param preprocessed: The tuples of the light curve example, and the auxiliary information if used.
+        :return: The batch of examples.
+        """
+        light_curves = np.stack([elements[0] for elements in preprocessed]).astype(np.float32)
+        if len(preprocessed[0]) == 1:
+            return light_curves
+        auxiliary_information = np.stack([elements[1] for elements in preprocessed]).astype(np.float32)
+        return light_curves, auxiliary_information
+
+    def score(self, request: dict) -> np.ndarray:
+        """
+        Scores the light curves of a request.
+
+        :param request: The decoded JSON request.
+        :return: The confidences of the light curves.
+        """
+        if 'paths' in request:
+            examples = self.preprocess_paths(request['paths'], request.get('collection_index', 0))
+        elif 'fluxes' in request:
+            examples = self.preprocess_arrays(request['fluxes'], request.get('times'),
+                                              request.get('auxiliary_information'))
+        else:
+            raise ValueError('A score request requires either `paths` or `fluxes`.')
+        return self.batcher.infer(examples)
+
+
+def create_request_handler_class(server: InferenceServer) -> type:
+    """
+    Creates the HTTP request handler class for an inference server.
+
+    :param server: The inference server.
+    :return: The request handler class.
+    """
+    class InferenceRequestHandler(BaseHTTPRequestHandler):
+        """
+        The handler of the inference server's HTTP requests.
+        """
+        def do_GET(self):
+            if self.path == '/health':
+                self.send_json(200, {'status': 'ok'})
+            else:
+                self.send_json(404, {'error': f'Unknown endpoint {self.path}.'})
+
+        def do_POST(self):
+            if self.path != '/score':
+                self.send_json(404, {'error': f'Unknown endpoint {self.path}.'})
+                return
+            try:
+                content_length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(content_length))
+                confidences = server.score(request)
+            except (ValueError, KeyError, IndexError, FileNotFoundError) as error:
+                self.send_json(400, {'error': f'{type(error).__name__}: {error}'})
+                return
+            except Exception as error:
+                traceback.print_exc()
+                self.send_json(500, {'error': f'{type(error).__name__}: {error}'})
+                return
+            self.send_json(200, {'confidences': confidences.tolist()})
+
+        def send_json(self, status_code: int, response: dict):
+            """Sends a JSON response."""
+            response_bytes = json.dumps(response).encode('utf-8')
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response_bytes)))
+            self.end_headers()
+            self.wfile.write(response_bytes)
+
+        def log_message(self, format_, *args):
+            pass  # Requests are not logged, to keep the serving output readable.
+    return InferenceRequestHandler
+
+
+def score_paths_with_server(paths: List[Union[Path, str]], url: str = 'http://127.0.0.1:8642',
+                            collection_index: int = 0) -> np.ndarray:
+    """
+    Scores light curves by path using a running inference server.
+
+    :param paths: The light curve paths.
+    :param url: The URL of the server.
+    :param collection_index: The index of the server database's inference collection used to load the paths.
+    :return: The confidences of the light curves.
+    """
+    response = requests.post(f'{url}/score', json={'paths': [str(path) for path in paths],
+                                                   'collection_index': collection_index})
+    response.raise_for_status()
+    return np.array(response.json()['confidences'])
+
+
+def score_fluxes_with_server(fluxes_list: List[np.ndarray], url: str = 'http://127.0.0.1:8642',
+                             times_list: Optional[List[np.ndarray]] = None) -> np.ndarray:
+    """
+    Scores light curves by flux array using a running inference server.
+
+    :param fluxes_list: The fluxes of each light curve.
+    :param url: The URL of the server.
+    :param times_list: The times of each light curve. Required if the server database includes times.
+    :return: The confidences of the light curves.
+    """
+    request = {'fluxes': [np.asarray(fluxes).tolist() for fluxes in fluxes_list]}
+    if times_list is not None:
+        request['times'] = [np.asarray(times).tolist() for times in times_list]
+    response = requests.post(f'{url}/score', json=request)
+    response.raise_for_status()
+    return np.array(response.json()['confidences'])
@@ -77,7 +77,7 @@ class TessFfiHeartBeatHardNegativeLightcurveCollection(TessFfiLightCurveCollecti
                  magnitude_range: (Union[float, None], Union[float, None]) = (None, None)):
         super().__init__(dataset_splits=dataset_splits, magnitude_range=magnitude_range)
         self.label = 0
-        self.hard_negative_ids = list(pd.read_csv('data/heart_beat_hard_negatives.csv')['tic_id'].values)
+        self.hard_negative_ids = pd.read_csv('data/heart_beat_hard_negatives.csv')['tic_id'].values
 
     def get_sql_query(self) -> Select:
         """
@@ -85,5 +85,5 @@ class TessFfiHeartBeatHardNegativeLightcurveCollection(TessFfiLightCurveCollecti
         :return: The SQL query.
         """
         query = super().get_sql_query()
-        query = query.where(TessFfiLightCurveMetadata.tic_id.in_(self.hard_negative_ids))
+        query = self.join_id_list_table(query, TessFfiLightCurveMetadata.tic_id, self.hard_negative_ids)
         return query
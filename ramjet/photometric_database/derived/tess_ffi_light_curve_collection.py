@@ -4,7 +4,7 @@ Code for a light curve collection of the TESS FFI data, as produced by Brian Pow
 import numpy as np
 from pathlib import Path
 from typing import Union, List
-from peewee import Select
+from peewee import Select, Field
 
 from ramjet.data_interface.metadatabase import MetadatabaseModel
 from ramjet.data_interface.tess_ffi_light_curve_metadata_manager import TessFfiLightCurveMetadataManager, \
@@ -44,6 +44,14 @@ class TessFfiLightCurveCollection(SqlMetadataLightCurveCollection):
             query = query.where(TessFfiLightCurveMetadata.dataset_split.in_(self.dataset_splits))
         return query
 
+    def get_random_order_field(self) -> Field:
+        """
+        Gets the indexed random order field of the model the SQL query selects.
+
+        :return: The random order field.
+        """
+        return TessFfiLightCurveMetadata.random_order
+
     def get_path_from_model(self, model: MetadatabaseModel) -> Path:
         """
         Gets the light curve path from the SQL database model.
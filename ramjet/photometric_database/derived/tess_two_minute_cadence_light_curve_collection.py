@@ -5,7 +5,7 @@ import numpy as np
 from pathlib import Path
 from typing import Iterable, Union, List
 
-from peewee import Select
+from peewee import Select, Field
 
 from ramjet.data_interface.metadatabase import MetadatabaseModel
 from ramjet.data_interface.tess_data_interface import TessDataInterface, TessFluxType
@@ -40,6 +40,14 @@ class TessTwoMinuteCadenceLightCurveCollection(SqlMetadataLightCurveCollection):
             query = query.where(TessTwoMinuteCadenceLightCurveMetadata.dataset_split.in_(self.dataset_splits))
         return query
 
+    def get_random_order_field(self) -> Field:
+        """
+        Gets the indexed random order field of the model the SQL query selects.
+
+        :return: The random order field.
+        """
+        return TessTwoMinuteCadenceLightCurveMetadata.random_order
+
     def get_path_from_model(self, model: MetadatabaseModel) -> Path:
         """
         Gets the light curve path from the SQL database model.
@@ -0,0 +1,74 @@
+"""
+Code for verifying the files of light curve collections in parallel.
+"""
+import time
+from functools import partial
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pathos.multiprocessing as multiprocessing
+
+from ramjet.data_interface.light_curve_quarantine import LightCurveQuarantine
+from ramjet.photometric_database.light_curve_collection import LightCurveCollection
+
+
+def verify_light_curve_path(light_curve_collection: LightCurveCollection, path: str) -> (str, Optional[str]):
+    """
+    Verifies a light curve file can be loaded by its collection and contains usable data.
+
+    :param light_curve_collection: The collection the light curve belongs to.
+    :param path: The path of the light curve.
+    :return: The path and the description of the verification error. The error is None if the file is valid.
+    """
+    try:
+        times, fluxes, _ = light_curve_collection.load_times_fluxes_and_flux_errors_from_path(Path(path))
+        if np.shape(times)[0] == 0 or np.shape(times)[0] != np.shape(fluxes)[0]:
+            return path, f'Loaded {np.shape(times)[0]} times and {np.shape(fluxes)[0]} fluxes.'
+    except Exception as error:
+        return path, f'{type(error).__name__}: {error}'
+    return path, None
+
+
+class LightCurveIntegrityScanner:
+    """
+    A class for verifying every file of a light curve collection in a process pool. Files which fail verification are
+    recorded in the quarantine, and quarantined files which now pass are released.
+
+    :ivar number_of_processes: The number of worker processes. Defaults to the number of CPUs.
+    :ivar paths_per_task: The number of paths verified in a single worker task.
+    """
+    def __init__(self, number_of_processes: Optional[int] = None):
+        self.number_of_processes: Optional[int] = number_of_processes
+        self.paths_per_task: int = 100
+
+    def scan_collection(self, light_curve_collection: LightCurveCollection) -> List[str]:
+        """
+        Verifies the files of a light curve collection, updating the quarantine with the results.
+
+        :param light_curve_collection: The collection to verify.
+        :return: The paths which failed verification.
+        """
+        paths = [str(path) for path in light_curve_collection.get_paths()]
+        previously_quarantined_paths = LightCurveQuarantine.load_quarantined_paths()
+        failed_path_errors = {}
+        passed_quarantined_paths = []
+        verified_count = 0
+        start_time = time.perf_counter()
+        verify_function = partial(verify_light_curve_path, light_curve_collection)
+        with multiprocessing.Pool(self.number_of_processes) as pool:
+            for path, error in pool.imap_unordered(verify_function, paths, chunksize=self.paths_per_task):
+                if error is not None:
+                    failed_path_errors[path] = error
+                elif path in previously_quarantined_paths:
+                    passed_quarantined_paths.append(path)
+                verified_count += 1
+                if verified_count % 1000 == 0:
+                    elapsed_time = time.perf_counter() - start_time
+                    print(f'{verified_count}/{len(paths)} files verified ({verified_count / elapsed_time:.0f} files/s, '
+                          f'{len(failed_path_errors)} failed)...', end='\r', flush=True)
+        LightCurveQuarantine.quarantine_paths(failed_path_errors)
+        LightCurveQuarantine.release_paths(passed_quarantined_paths)
+        print(f'{len(paths)} files verified. {len(failed_path_errors)} quarantined and '
+              f'{len(passed_quarantined_paths)} released.', flush=True)
+        return sorted(failed_path_errors.keys())
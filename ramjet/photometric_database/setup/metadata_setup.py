@@ -1,6 +1,8 @@
 """
 Code to prepare the metadata tables.
 """
+import sys
+
 from ramjet.data_interface.tess_eclipsing_binary_metadata_manager import TessEclipsingBinaryMetadataManager
 from ramjet.data_interface.tess_ffi_light_curve_metadata_manager import TessFfiLightCurveMetadataManager
 from ramjet.data_interface.tess_target_metadata_manager import TessTargetMetadataManger
@@ -9,21 +11,25 @@ from ramjet.data_interface.tess_two_minute_cadence_light_curve_metadata_manager
     TessTwoMinuteCadenceLightCurveMetadataManger
 
 
-def build_tables():
+def build_tables(incremental: bool = False, rerandomize: bool = False):
     """
     Prepare the metadata tables needed for TESS two minute transit related trials.
+
+    :param incremental: Whether to only update the existing tables with the changes, rather than rebuilding them.
+    :param rerandomize: Whether to re-randomize the random order of the light curve tables after an incremental update.
     """
     tess_ffi_light_curve_metadata_manger = TessFfiLightCurveMetadataManager()
-    tess_ffi_light_curve_metadata_manger.build_table()
+    tess_ffi_light_curve_metadata_manger.build_table(incremental=incremental, rerandomize=rerandomize)
     tess_eclipsing_binary_metadata_manger = TessEclipsingBinaryMetadataManager()
-    tess_eclipsing_binary_metadata_manger.build_table()
+    tess_eclipsing_binary_metadata_manger.build_table(incremental=incremental)
     tess_two_minute_cadence_light_curve_metadata_manger = TessTwoMinuteCadenceLightCurveMetadataManger()
-    tess_two_minute_cadence_light_curve_metadata_manger.build_table()
+    tess_two_minute_cadence_light_curve_metadata_manger.build_table(incremental=incremental,
+                                                                     rerandomize=rerandomize)
     tess_transit_metadata_manager = TessTransitMetadataManager()
-    tess_transit_metadata_manager.build_table()
+    tess_transit_metadata_manager.build_table(incremental=incremental)
     tess_target_metadata_manger = TessTargetMetadataManger()
-    tess_target_metadata_manger.build_table()
+    tess_target_metadata_manger.build_table(incremental=incremental)
 
 
 if __name__ == '__main__':
-    build_tables()
+    build_tables(incremental='--incremental' in sys.argv, rerandomize='--rerandomize' in sys.argv)
@@ -1,24 +1,69 @@
 """
 Code for a light curve collection that stores its metadata in the SQL database.
 """
+import hashlib
 import random
+from collections import OrderedDict
+from enum import Enum
 from pathlib import Path
-from typing import Iterable, List, Union
+from typing import Iterable, List, Union, Dict, Optional, Tuple, Any, Callable
 from uuid import uuid4
 
-from peewee import Select, Field, Case
+import numpy as np
+from peewee import Select, Field, Case, Table, Column, Tuple as SqlTuple
 
-from ramjet.data_interface.metadatabase import MetadatabaseModel
+from ramjet.data_interface.metadatabase import MetadatabaseModel, create_random_order_value, get_table_generations
 from ramjet.photometric_database.light_curve_collection import LightCurveCollection, \
     LightCurveCollectionMethodNotImplementedError
 
 
+class PathSnapshotOrder(Enum):
+    """
+    An enum of the orders the path snapshot can be traversed in for each pass over the collection.
+    """
+    QUERY = 'query'
+    RANDOM_START = 'random_start'
+    SHUFFLE = 'shuffle'
+
+
+sql_query_result_cache: Dict[Tuple, Any] = OrderedDict()
+maximum_sql_query_result_cache_size = 32
+
+
+def clear_sql_query_result_cache():
+    """
+    Removes all the results from the SQL query result cache.
+    """
+    sql_query_result_cache.clear()
+
+
 class SqlMetadataLightCurveCollection(LightCurveCollection):
     """
     Class for a light curve collection that stores its metadata in the SQL database.
+
+    :ivar use_path_snapshot: Whether to query the database once and serve the paths from an in-memory array afterward.
+    :ivar path_snapshot_order: The order the path snapshot is traversed in for each pass over the collection. Defaults
+                               to the query order, so each pass has the same order as the collection query. Collections
+                               can opt in to a random start position or a shuffle for each pass.
+    :ivar path_snapshot_field_names: The names of additional model fields to store alongside the path snapshot.
+    :ivar use_random_order_pagination: Whether to stream the paths from the database in the order of the indexed random
+                                       order field, starting from a random position, one page at a time. Takes
+                                       precedence over the path snapshot.
+    :ivar random_order_page_size: The number of rows to query for each page of the random order pagination.
+    :ivar use_query_result_cache: Whether to share the count and path snapshot results between collections running the
+                                  same query, until a metadata manager rebuilds a table.
     """
     def __init__(self):
         super().__init__()
+        self.use_path_snapshot: bool = True
+        self.path_snapshot_order: PathSnapshotOrder = PathSnapshotOrder.QUERY
+        self.path_snapshot_field_names: List[str] = []
+        self.path_snapshot: Optional[np.ndarray] = None
+        self.path_snapshot_field_arrays: Dict[str, np.ndarray] = {}
+        self.path_snapshot_index_for_path_: Optional[Dict[str, int]] = None
+        self.use_random_order_pagination: bool = False
+        self.random_order_page_size: int = 10000
+        self.use_query_result_cache: bool = True
 
     def get_sql_query(self) -> Select:
         """
@@ -34,7 +79,34 @@ class SqlMetadataLightCurveCollection(LightCurveCollection):
 
         :return: The count.
         """
-        return self.get_sql_query().count()
+        if self.path_snapshot is not None:
+            return self.path_snapshot.shape[0]
+        query = self.get_sql_query()
+        return self.load_query_result_from_cache(query, 'count', query.count)
+
+    def load_query_result_from_cache(self, query: Select, result_name: str, compute_result: Callable[[], Any]) -> Any:
+        """
+        Loads a result computed from a query from the SQL query result cache, computing and caching it if it is not
+        present. The result is keyed on the collection class, the name of the result, the SQL text and parameters of
+        the query, and the generation counters of the tables, so any table rebuild invalidates the result.
+
+        :param query: The query the result is computed from.
+        :param result_name: The name of the result.
+        :param compute_result: The function which computes the result.
+        :return: The result.
+        """
+        if not self.use_query_result_cache:
+            return compute_result()
+        sql, parameters = query.sql()
+        cache_key = (type(self).__qualname__, result_name, sql, tuple(parameters), get_table_generations())
+        if cache_key in sql_query_result_cache:
+            sql_query_result_cache.move_to_end(cache_key)
+            return sql_query_result_cache[cache_key]
+        result = compute_result()
+        sql_query_result_cache[cache_key] = result
+        while len(sql_query_result_cache) > maximum_sql_query_result_cache_size:
+            sql_query_result_cache.popitem(last=False)
+        return result
 
     def get_path_from_model(self, model: MetadatabaseModel) -> Path:
         """
@@ -44,10 +116,35 @@ class SqlMetadataLightCurveCollection(LightCurveCollection):
         """
         raise LightCurveCollectionMethodNotImplementedError
 
+    def get_random_order_field(self) -> Field:
+        """
+        Gets the indexed random order field of the model the SQL query selects.
+
+        :return: The random order field.
+        """
+        raise LightCurveCollectionMethodNotImplementedError
+
     def get_paths(self) -> Iterable[Path]:
         """
         Gets the paths for the light curves in the collection.
 
+        :return: An iterable of the light curve paths.
+        """
+        if self.use_random_order_pagination:
+            yield from self.get_paths_from_random_order_pages()
+            return
+        if not self.use_path_snapshot:
+            yield from self.get_paths_from_sql_query()
+            return
+        if self.path_snapshot is None:
+            self.create_path_snapshot()
+        for snapshot_index in self.get_path_snapshot_indexes_for_pass():
+            yield Path(self.path_snapshot[snapshot_index].decode('utf-8'))
+
+    def get_paths_from_sql_query(self) -> Iterable[Path]:
+        """
+        Gets the paths for the light curves in the collection directly from the SQL query.
+
         :return: An iterable of the light curve paths.
         """
         query = self.get_sql_query()
@@ -55,6 +152,159 @@ class SqlMetadataLightCurveCollection(LightCurveCollection):
         for model in query:
             yield Path(self.get_path_from_model(model))
 
+    def get_paths_from_random_order_pages(self) -> Iterable[Path]:
+        """
+        Gets the paths for the light curves in the collection in the order of the random order field. The traversal
+        starts at a random value and loops back to the minimum value to include all entities. Rows are queried in pages
+        using the last value seen (keyset pagination), so each page is read directly from the random order index.
+
+        :return: An iterable of the light curve paths.
+        """
+        start_value = create_random_order_value()
+        yield from self.get_paths_from_random_order_range(lower_bound=start_value, upper_bound=None)
+        yield from self.get_paths_from_random_order_range(lower_bound=None, upper_bound=start_value)
+
+    def get_paths_from_random_order_range(self, lower_bound: Optional[int], upper_bound: Optional[int]
+                                          ) -> Iterable[Path]:
+        """
+        Gets the paths for the light curves with a random order value within a range, in the order of the value. Rows
+        are ordered by their random order value and then their row ID, and each page continues after the pair of the
+        last row seen, so rows with tied random order values are neither skipped nor repeated across pages.
+
+        :param lower_bound: The inclusive lower bound of the random order value. None for no lower bound.
+        :param upper_bound: The exclusive upper bound of the random order value. None for no upper bound.
+        :return: An iterable of the light curve paths.
+        """
+        random_order_field = self.get_random_order_field()
+        row_id_column = Column(random_order_field.model, 'rowid')
+        last_key = None  # The random order value and row ID pair of the last row yielded.
+        while True:
+            query = self.get_sql_query().select_extend(random_order_field, row_id_column.alias('random_order_row_id'))
+            if last_key is not None:
+                query = query.where(SqlTuple(random_order_field, row_id_column) > last_key)
+            elif lower_bound is not None:
+                query = query.where(random_order_field >= lower_bound)
+            if upper_bound is not None:
+                query = query.where(random_order_field < upper_bound)
+            query = query.order_by(random_order_field, row_id_column).limit(self.random_order_page_size)
+            models = list(query.objects().iterator())
+            for model in models:
+                yield Path(self.get_path_from_model(model))
+            if len(models) < self.random_order_page_size:
+                return
+            last_key = (getattr(models[-1], random_order_field.name), models[-1].random_order_row_id)
+
+    def create_path_snapshot(self):
+        """
+        Runs the SQL query once and stores the resulting paths (and any requested additional fields) in compact NumPy
+        arrays. Subsequent passes over the collection are served from these arrays rather than the database.
+        """
+        query = self.get_sql_query()
+        result_name = f'path snapshot with fields {self.path_snapshot_field_names}'
+        self.path_snapshot, self.path_snapshot_field_arrays = self.load_query_result_from_cache(
+            query, result_name, lambda: self.run_path_snapshot_query(query))
+        self.path_snapshot_index_for_path_ = None
+
+    def run_path_snapshot_query(self, query: Select) -> (np.ndarray, Dict[str, np.ndarray]):
+        """
+        Runs the SQL query and collects the resulting paths and additional snapshot fields into NumPy arrays.
+
+        :param query: The SQL query.
+        :return: The path array and the additional field arrays.
+        """
+        query = query.objects().iterator()  # Disable Peewee's cache and graph for better performance.
+        path_strings = []
+        field_value_lists = {field_name: [] for field_name in self.path_snapshot_field_names}
+        for model in query:
+            path_strings.append(str(self.get_path_from_model(model)).encode('utf-8'))
+            for field_name, field_value_list in field_value_lists.items():
+                field_value_list.append(getattr(model, field_name))
+        path_snapshot = np.array(path_strings, dtype=np.bytes_)
+        path_snapshot_field_arrays = {field_name: np.array(field_value_list)
+                                      for field_name, field_value_list in field_value_lists.items()}
+        return path_snapshot, path_snapshot_field_arrays
+
+    def clear_path_snapshot(self):
+        """
+        Removes the path snapshot, so the next pass over the collection will query the database again.
+        """
+        self.path_snapshot = None
+        self.path_snapshot_field_arrays = {}
+        self.path_snapshot_index_for_path_ = None
+
+    def get_path_snapshot_indexes_for_pass(self) -> np.ndarray:
+        """
+        Gets the order of the path snapshot indexes for a single pass over the collection.
+
+        :return: The array of indexes into the path snapshot.
+        """
+        snapshot_size = self.path_snapshot.shape[0]
+        if self.path_snapshot_order == PathSnapshotOrder.SHUFFLE:
+            return np.random.permutation(snapshot_size)
+        indexes = np.arange(snapshot_size)
+        if self.path_snapshot_order == PathSnapshotOrder.RANDOM_START and snapshot_size > 0:
+            indexes = np.roll(indexes, -np.random.randint(snapshot_size))
+        return indexes
+
+    def load_path_snapshot_field_for_path(self, field_name: str, path: Path):
+        """
+        Loads the value of an additional snapshot field for a given path.
+
+        :param field_name: The name of the field stored in the snapshot.
+        :param path: The path of the light curve.
+        :return: The value of the field for the path.
+        """
+        if self.path_snapshot is None:
+            self.create_path_snapshot()
+        if self.path_snapshot_index_for_path_ is None:
+            self.path_snapshot_index_for_path_ = {path_bytes.decode('utf-8'): index
+                                                  for index, path_bytes in enumerate(self.path_snapshot)}
+        snapshot_index = self.path_snapshot_index_for_path_[str(path)]
+        return self.path_snapshot_field_arrays[field_name][snapshot_index]
+
+    def __getstate__(self):
+        """
+        Excludes the path snapshot when pickling, as the collection is sent to the preprocessing worker processes with
+        each example and the workers only need the path loading methods.
+
+        :return: The state to pickle.
+        """
+        state = self.__dict__.copy()
+        state['path_snapshot'] = None
+        state['path_snapshot_field_arrays'] = {}
+        state['path_snapshot_index_for_path_'] = None
+        return state
+
+    @staticmethod
+    def join_id_list_table(select_query: Select, id_field: Field, ids: Iterable[int]) -> Select:
+        """
+        Filters a query to the rows whose ID field is in a list of IDs. Rather than placing the IDs in the query as a
+        literal `IN` list, the IDs are loaded into an indexed temporary table which the query joins against. This
+        keeps the query parse time small and avoids SQLite's variable limit for lists of any length. The temporary
+        table is named by the content of the ID list, so it is only loaded once per connection for each list. As
+        temporary tables belong to a single connection, the returned query should be run by the thread which created
+        it.
+
+        :param select_query: The query to filter.
+        :param id_field: The integer ID field to filter on.
+        :param ids: The IDs to keep.
+        :return: The query updated to include the join.
+        """
+        ids_array = np.unique(np.asarray(ids, dtype=np.int64))
+        table_name = f'id_list_{hashlib.md5(ids_array.tobytes()).hexdigest()}'
+        database = id_field.model._meta.database
+        table_exists_cursor = database.execute_sql(
+            "SELECT 1 FROM sqlite_temp_master WHERE type = 'table' AND name = ?", (table_name,))
+        if table_exists_cursor.fetchone() is None:
+            with database.atomic():
+                database.execute_sql(f'CREATE TEMP TABLE "{table_name}" (id INTEGER PRIMARY KEY)')
+                database.cursor().executemany(f'INSERT INTO temp."{table_name}" (id) VALUES (?)',
+                                              ((int(id_value),) for id_value in ids_array))
+        id_list_table = Table(table_name, ('id',), schema='temp')
+        updated_select_query = select_query.join_from(id_field.model, id_list_table,
+                                                      on=(id_field == id_list_table.id)).switch(id_field.model)
+        return updated_select_query
+
     @staticmethod
     def order_by_uuid_with_random_start(select_query: Select, uuid_field: Field) -> Select:
         """
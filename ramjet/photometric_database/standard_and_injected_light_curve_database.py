@@ -10,9 +10,10 @@ import numpy as np
 import scipy.stats
 import tensorflow as tf
 from pathlib import Path
-from typing import List, Union, Callable, Tuple, Optional
+from typing import List, Union, Callable, Tuple, Optional, Iterable, Set
 from scipy.interpolate import interp1d
 
+from ramjet.data_interface.light_curve_quarantine import LightCurveQuarantine
 from ramjet.logging.wandb_logger import WandbLogger, WandbLoggableLightCurve, \
     WandbLoggableInjection
 from ramjet.photometric_database.light_curve import LightCurve
@@ -60,6 +61,7 @@ class StandardAndInjectedLightCurveDatabase(LightCurveDatabase):
             OutOfBoundsInjectionHandlingMethod.ERROR
         self.baseline_flux_estimation_method = BaselineFluxEstimationMethod.MEDIAN
         self.logger: Optional[WandbLogger] = None
+        self.skip_quarantined_paths: bool = True
 
     @property
     def number_of_input_channels(self) -> int:
@@ -181,7 +183,8 @@ class StandardAndInjectedLightCurveDatabase(LightCurveDatabase):
         return standard_paths_datasets, injectee_path_dataset, injectable_paths_datasets
 
     def generate_paths_dataset_from_light_curve_collection(self, light_curve_collection: LightCurveCollection,
-                                                           repeat: bool = True, shuffle: bool = True
+                                                           repeat: bool = True, shuffle: bool = True,
+                                                           path_filter: Optional[Callable[[Path], bool]] = None
                                                            ) -> tf.data.Dataset:
         """
         Generates a paths dataset for a light curve collection.
@@ -189,15 +192,65 @@ class StandardAndInjectedLightCurveDatabase(LightCurveDatabase):
         :param light_curve_collection: The light curve collection to generate a paths dataset for.
         :param repeat: Whether to repeat the dataset or not.
         :param shuffle: Whether to shuffle the dataset or not.
+        :param path_filter: A function returning whether a path should be included. None includes all paths.
         :return: The paths dataset.
         """
-        dataset = self.paths_dataset_from_list_or_generator_factory(light_curve_collection.get_paths)
+        paths_factory = self.create_paths_factory_for_light_curve_collection(light_curve_collection, path_filter)
+        dataset = self.paths_dataset_from_list_or_generator_factory(paths_factory)
         if repeat:
             dataset = dataset.repeat()
         if shuffle:
             dataset = dataset.shuffle(self.shuffle_buffer_size)
         return dataset
 
+    def create_paths_factory_for_light_curve_collection(self, light_curve_collection: LightCurveCollection,
+                                                        path_filter: Optional[Callable[[Path], bool]] = None
+                                                        ) -> Callable[[], Iterable[Path]]:
+        """
+        Creates the function producing the paths of a light curve collection which should be used, skipping the
+        quarantined paths if enabled.
+
+        :param light_curve_collection: The light curve collection.
+        :param path_filter: A function returning whether a path should be included. None includes all paths.
+        :return: The paths factory.
+        """
+        paths_factory = light_curve_collection.get_paths
+        if self.skip_quarantined_paths:
+            quarantined_paths = LightCurveQuarantine.load_quarantined_paths()
+            if len(quarantined_paths) > 0:
+                paths_factory = partial(self.get_unquarantined_paths, light_curve_collection, quarantined_paths)
+        if path_filter is not None:
+            paths_factory = partial(self.get_filtered_paths, paths_factory, path_filter)
+        return paths_factory
+
+    @staticmethod
+    def get_unquarantined_paths(light_curve_collection: LightCurveCollection, quarantined_paths: Set[str]
+                                ) -> Iterable[Path]:
+        """
+        Gets the paths of a light curve collection, skipping the paths of quarantined light curve files.
+
+        :param light_curve_collection: The light curve collection.
+        :param quarantined_paths: The set of quarantined path strings.
+        :return: The paths which are not quarantined.
+        """
+        for path in light_curve_collection.get_paths():
+            if str(path) not in quarantined_paths:
+                yield path
+
+    @staticmethod
+    def get_filtered_paths(paths_factory: Callable[[], Iterable[Path]], path_filter: Callable[[Path], bool]
+                           ) -> Iterable[Path]:
+        """
+        Gets the paths of a paths factory which pass a filter.
+
+        :param paths_factory: The function producing the paths.
+        :param path_filter: The function returning whether a path should be included.
+        :return: The paths which pass the filter.
+        """
+        for path in paths_factory():
+            if path_filter(path):
+                yield path
+
     def generate_paths_datasets_from_light_curve_collection_list(self,
                                                                  light_curve_collections: List[LightCurveCollection],
                                                                  shuffle: bool = True) -> List[tf.data.Dataset]:
@@ -573,34 +626,85 @@ class StandardAndInjectedLightCurveDatabase(LightCurveDatabase):
         flat_mapped_dataset = zipped_dataset.flat_map(flat_map_interspersing_function)
         return flat_mapped_dataset
 
-    def generate_inference_dataset(self):
+    def generate_inference_dataset(self, path_filter: Optional[Callable[[Path], bool]] = None,
+                                   include_collection_index: bool = False,
+                                   paths_per_collection: Optional[List[List[Path]]] = None):
         """
-        Generates the dataset to infer over.
+        Generates the dataset to infer over. The paths of the inference collections are interleaved in round-robin
+        order, each tagged with the index of its collection, and preprocessed by a single shared map, so every
+        collection feeds the same batches and the preprocessing workers stay busy until all collections are exhausted.
 
+        :param path_filter: A function returning whether a path should be inferred on. None infers on all paths.
+        :param include_collection_index: Whether to include the index of the inference collection each example came
+                                         from as a third element of the batches.
+        :param paths_per_collection: The paths to infer on for each inference collection, in place of the paths the
+                                     collections list. None uses the collections' paths.
         :return: The inference dataset.
         """
-        batch_dataset = None
-        for light_curve_collection in self.inference_light_curve_collections:
-            example_paths_dataset = self.generate_paths_dataset_from_light_curve_collection(light_curve_collection,
-                                                                                            repeat=False, shuffle=False)
-            if self.number_of_auxiliary_values > 0:
-                examples_dataset = self.generate_infer_path_and_light_curve_dataset(
-                    example_paths_dataset, light_curve_collection.load_times_fluxes_and_flux_errors_from_path,
-                    light_curve_collection.load_auxiliary_information_for_path)
-                examples_dataset = self.from_path_light_curve_and_auxiliary_to_path_and_observation(
-                    examples_dataset)
-            else:
-                examples_dataset = self.generate_infer_path_and_light_curve_dataset(
-                    example_paths_dataset, light_curve_collection.load_times_fluxes_and_flux_errors_from_path,
-                    light_curve_collection.load_auxiliary_information_for_path)
-            collection_batch_dataset = examples_dataset.batch(self.batch_size)
-            if batch_dataset is None:
-                batch_dataset = collection_batch_dataset
+        tagged_paths_datasets = []
+        for collection_index, light_curve_collection in enumerate(self.inference_light_curve_collections):
+            if paths_per_collection is None:
+                example_paths_dataset = self.generate_paths_dataset_from_light_curve_collection(
+                    light_curve_collection, repeat=False, shuffle=False, path_filter=path_filter)
             else:
-                batch_dataset = batch_dataset.concatenate(collection_batch_dataset)
+                collection_paths = paths_per_collection[collection_index]
+                if path_filter is not None:
+                    collection_paths = [path for path in collection_paths if path_filter(path)]
+                example_paths_dataset = self.paths_dataset_from_list_or_generator_factory(collection_paths)
+            tagged_paths_datasets.append(example_paths_dataset.map(
+                partial(tag_with_collection_index, collection_index=collection_index)))
+        round_robin_choice_dataset = tf.data.Dataset.range(len(tagged_paths_datasets)).repeat()
+        tagged_paths_dataset = tf.data.Dataset.choose_from_datasets(tagged_paths_datasets, round_robin_choice_dataset,
+                                                                    stop_on_empty_dataset=False)
+        examples_dataset = self.generate_infer_path_light_curve_and_collection_index_dataset(tagged_paths_dataset)
+        if self.number_of_auxiliary_values > 0:
+            examples_dataset = examples_dataset.map(
+                lambda path, light_curve, auxiliary, collection_index: (path, (light_curve, auxiliary),
+                                                                        collection_index))
+        batch_dataset = examples_dataset.batch(self.batch_size)
+        if not include_collection_index:
+            batch_dataset = batch_dataset.map(lambda paths, examples, collection_indexes: (paths, examples))
         batch_dataset = batch_dataset.prefetch(5)
         return batch_dataset
 
+    def generate_infer_path_light_curve_and_collection_index_dataset(self, tagged_paths_dataset: tf.data.Dataset
+                                                                     ) -> tf.data.Dataset:
+        """
+        Generates a path, light curve, and collection index dataset from a dataset of paths tagged with the index of
+        their inference collection, loading each light curve with its collection's functions.
+
+        :param tagged_paths_dataset: The dataset of path and collection index pairs.
+        :return: The path, light curve (and auxiliary information, if used), and collection index dataset.
+        """
+        if self.number_of_auxiliary_values == 0:
+            output_types = (tf.string, tf.float32, tf.int64)
+            output_shapes = [(), (self.time_steps_per_example, self.number_of_input_channels), ()]
+        else:
+            output_types = (tf.string, tf.float32, tf.float32, tf.int64)
+            output_shapes = [(), (self.time_steps_per_example, self.number_of_input_channels),
+                             (self.number_of_auxiliary_values,), ()]
+        return map_py_function_to_dataset(tagged_paths_dataset,
+                                          self.preprocess_infer_light_curve_from_inference_collection,
+                                          self.number_of_parallel_processes_per_map,
+                                          output_types=output_types,
+                                          output_shapes=output_shapes)
+
+    def preprocess_infer_light_curve_from_inference_collection(self, light_curve_path_tensor: tf.Tensor,
+                                                               collection_index_tensor: tf.Tensor) -> Tuple:
+        """
+        Preprocesses an individual inference light curve using the loading functions of its inference collection.
+
+        :param light_curve_path_tensor: The tensor containing the path to the light curve file.
+        :param collection_index_tensor: The tensor containing the index of the light curve's inference collection.
+        :return: The path, example array (and auxiliary information, if used), and collection index.
+        """
+        collection_index = int(collection_index_tensor.numpy())
+        light_curve_collection = self.inference_light_curve_collections[collection_index]
+        preprocessed = self.preprocess_infer_light_curve(
+            light_curve_collection.load_times_fluxes_and_flux_errors_from_path,
+            light_curve_collection.load_auxiliary_information_for_path, light_curve_path_tensor)
+        return (*preprocessed, collection_index)
+
     @staticmethod
     def from_light_curve_auxiliary_and_label_to_observation_and_label(
             light_curve_auxiliary_and_label_dataset: tf.data.Dataset) -> tf.data.Dataset:
@@ -667,6 +771,17 @@ class StandardAndInjectedLightCurveDatabase(LightCurveDatabase):
         return unbatched_window_dataset.batch(batch_size)
 
 
+def tag_with_collection_index(path: tf.Tensor, collection_index: int) -> (tf.Tensor, tf.Tensor):
+    """
+    Pairs a path with the index of the collection it came from.
+
+    :param path: The path tensor.
+    :param collection_index: The index of the collection.
+    :return: The path and collection index pair.
+    """
+    return path, tf.constant(collection_index, dtype=tf.int64)
+
+
 def repeat_each_element(element: tf.Tensor, number_of_repeats: int) -> tf.data.Dataset:
     """
     A dataset mappable function which repeats the elements a given number of times.
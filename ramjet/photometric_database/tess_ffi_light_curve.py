@@ -22,6 +22,7 @@ try:
 except ImportError:
     from backports.strenum import StrEnum
 
+from ramjet.data_interface.light_curve_quarantine import LightCurveQuarantine, QuarantinedLightCurveError
 from ramjet.data_interface.tess_data_interface import TessDataInterface
 from ramjet.photometric_database.tess_light_curve import TessLightCurve
 
@@ -80,7 +81,8 @@ class TessFfiLightCurve(TessLightCurve):
     def from_path(cls, path: Path, column_names_to_load: Union[List[TessFfiColumnName], None] = None,
                   remove_bad_quality_data: bool = True) -> TessFfiLightCurve:
         """
-        Creates an FFI TESS light curve from a path to one of Brian Powell's pickle files.
+        Creates an FFI TESS light curve from a path to one of Brian Powell's pickle files. Failed loads are retried,
+        unless the file is quarantined as corrupt, in which case the error is raised immediately.
 
         :param path: The path to the pickle file to load.
         :param column_names_to_load: The FFI light curve columns to load from the pickle file. By default, all will be
@@ -107,6 +109,8 @@ class TessFfiLightCurve(TessLightCurve):
             light_curve.tic_id, light_curve.sector = light_curve.get_tic_id_and_sector_from_file_path(path)
             return light_curve
         except (pickle.UnpicklingError, OSError, IsADirectoryError) as error:
+            if LightCurveQuarantine.is_quarantined(path):
+                raise QuarantinedLightCurveError(f'{path} is quarantined as corrupt.') from error
             raise AdaptIntermittentException(f'Errored on path {path}.') from error
 
     @staticmethod
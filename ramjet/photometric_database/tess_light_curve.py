@@ -4,6 +4,8 @@ Code to represent a TESS light curve.
 from __future__ import annotations
 
 import copy
+from functools import partial
+from pathlib import Path
 from typing import Union, Optional, List
 
 import lightkurve
@@ -17,6 +19,7 @@ from lightkurve import SearchResult
 from lightkurve.targetpixelfile import TargetPixelFile
 from retrying import retry
 
+from ramjet.data_interface.tess_cut_cache import TessCutCache
 from ramjet.data_interface.tess_data_interface import is_common_mast_connection_error
 from ramjet.photometric_database.light_curve import LightCurve
 
@@ -25,6 +28,7 @@ class TessLightCurve(LightCurve):
     """
     A class to represent a TESS light curve.
     """
+    tess_cut_cache = TessCutCache()
 
     def __init__(self):
         super().__init__()
@@ -49,10 +53,14 @@ class TessLightCurve(LightCurve):
         tic_row = self.get_tic_row()
         return float(tic_row['Tmag'])
 
+    def get_ffi_time_series_from_tess_cut(self, cutout_size: int = 10) -> TargetPixelFile:
+        return self.tess_cut_cache.load_target_pixel_file(self.tic_id, self.sector, cutout_size,
+                                                          partial(self.download_tess_cut, cutout_size=cutout_size))
+
     @retry(retry_on_exception=is_common_mast_connection_error, stop_max_attempt_number=10)
-    def get_ffi_time_series_from_tess_cut(self) -> TargetPixelFile:
+    def download_tess_cut(self, download_directory: Path, cutout_size: int = 10) -> TargetPixelFile:
         search_result: SearchResult = lightkurve.search_tesscut(f'TIC{self.tic_id}', sector=self.sector)
-        target_pixel_file = search_result.download(cutout_size=10)
+        target_pixel_file = search_result.download(cutout_size=cutout_size, download_dir=str(download_directory))
         return target_pixel_file
 
     def estimate_photometric_centroid_of_variability_from_tess_ffi(self, minimum_period: Optional[float] = None,
@@ -116,12 +124,11 @@ class TessLightCurve(LightCurve):
     def load_tic_rows_from_mast_for_list(cls, light_curves: List[TessLightCurve]) -> None:
         light_curve_tic_ids: List[int] = [light_curve.tic_id for light_curve in light_curves]
         tic_row_data_frame = Catalogs.query_criteria(ID=light_curve_tic_ids, catalog='TIC').to_pandas()
+        tic_rows = {}
+        for _, tic_row in tic_row_data_frame.iterrows():
+            tic_rows.setdefault(int(tic_row['ID']), tic_row)
         for light_curve in light_curves:
-            light_curve_tic_row_data_frame = tic_row_data_frame[tic_row_data_frame['ID'] == str(light_curve.tic_id)]
-            if light_curve_tic_row_data_frame.shape[0] == 0:
-                light_curve._tic_row = MissingTicRow
-            else:
-                light_curve._tic_row = light_curve_tic_row_data_frame.iloc[0]
+            light_curve._tic_row = tic_rows.get(int(light_curve.tic_id), MissingTicRow)
 
 
 class MissingTicRow:
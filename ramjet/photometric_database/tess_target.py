@@ -7,19 +7,19 @@ import io
 import math
 import numpy as np
 import pandas as pd
-from typing import Union
+from typing import Union, List, Iterable
 
-import requests
 from astroquery.gaia import Gaia
 
-from ramjet.data_interface.tess_data_interface import TessDataInterface
+from ramjet.data_interface.response_cache import response_cache, ResponseCacheSource, fetch_url_content
+from ramjet.data_interface.tess_input_catalog_resolver import TessInputCatalogResolver
 
 
 class TessTarget:
     """
     A class to represent an TESS target. Usually a star or star system.
     """
-    tess_data_interface = TessDataInterface()
+    tess_input_catalog_resolver = TessInputCatalogResolver()
 
     def __init__(self):
         self.tic_id: Union[int, None] = None
@@ -36,33 +36,51 @@ class TessTarget:
         :param tic_id: The TIC ID to create the target from.
         :return: The target.
         """
-        target = TessTarget()
-        target.tic_id = tic_id
-        tic_row = cls.tess_data_interface.get_tess_input_catalog_row(target.tic_id)
-        target.radius = tic_row['rad']
-        if np.isnan(target.radius):
-            gaia_source_id_string = tic_row['GAIA']
-            if pd.notna(gaia_source_id_string):
-                target.radius = target.get_radius_from_gaia(int(gaia_source_id_string))
-        target.mass = tic_row['mass']
-        # noinspection SpellCheckingInspection
-        target.magnitude = tic_row['Tmag']
-        # noinspection SpellCheckingInspection
-        target.contamination_ratio = tic_row['contratio']
-        return target
+        return cls.from_tic_ids([tic_id])[0]
+
+    @classmethod
+    def from_tic_ids(cls, tic_ids: Iterable[int]) -> List[TessTarget]:
+        """
+        Creates targets from TIC IDs, resolving their TIC rows in batches.
+
+        :param tic_ids: The TIC IDs to create the targets from.
+        :return: The targets.
+        """
+        tic_ids = list(tic_ids)
+        tic_rows = cls.tess_input_catalog_resolver.resolve_tic_rows(tic_ids)
+        missing_tic_ids = [tic_id for tic_id in tic_ids if int(tic_id) not in tic_rows.index]
+        if len(missing_tic_ids) > 0:
+            raise ValueError(f'No TIC rows were found for TIC IDs {missing_tic_ids}.')
+        targets = []
+        for tic_id in tic_ids:
+            tic_row = tic_rows.loc[int(tic_id)]
+            target = TessTarget()
+            target.tic_id = tic_id
+            target.radius = tic_row['rad']
+            if np.isnan(target.radius):
+                target.radius = tic_row['gaia_radius']
+            target.mass = tic_row['mass']
+            # noinspection SpellCheckingInspection
+            target.magnitude = tic_row['Tmag']
+            # noinspection SpellCheckingInspection
+            target.contamination_ratio = tic_row['contratio']
+            targets.append(target)
+        return targets
 
     @staticmethod
     def get_radius_from_gaia(gaia_source_id: int) -> float:
         """
-        Retrieves the radius of a body from Gaia.
+        Retrieves the radius of a body from Gaia. The radius is served from the response cache when available.
 
         :param gaia_source_id: The Gaia source ID for the target to retrieve the radius of.
         :return: The radius.
         """
-        # noinspection SqlResolve
-        gaia_job = Gaia.launch_job(f'select * from gaiadr2.gaia_source where source_id={gaia_source_id}')
-        query_results_data_frame = gaia_job.get_results().to_pandas()
-        radius = query_results_data_frame['radius_val'].iloc[0]
+        def retrieve_radius() -> float:
+            # noinspection SqlResolve
+            gaia_job = Gaia.launch_job(f'select * from gaiadr2.gaia_source where source_id={gaia_source_id}')
+            query_results_data_frame = gaia_job.get_results().to_pandas()
+            return query_results_data_frame['radius_val'].iloc[0]
+        radius = response_cache.get_or_fetch(ResponseCacheSource.GAIA, gaia_source_id, retrieve_radius)
         return radius
 
     def calculate_transiting_body_radius(self, transit_depth: float, allow_unknown_contamination_ratio: bool = False
@@ -84,12 +102,15 @@ class TessTarget:
 
     def retrieve_nearby_tic_targets(self) -> pd.DataFrame:
         """
-        Retrieves the data frame of nearby targets from ExoFOP.
+        Retrieves the data frame of nearby targets from ExoFOP. The ExoFOP response is served from the response cache
+        when available.
 
         :return: The data frame of nearby targets.
         """
         csv_url = f'https://exofop.ipac.caltech.edu/tess/download_nearbytarget.php?id={self.tic_id}&output=csv'
-        csv_string = requests.get(csv_url).content.decode('utf-8')
+        csv_content = response_cache.get_or_fetch(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, csv_url,
+                                                  lambda: fetch_url_content(csv_url))
+        csv_string = csv_content.decode('utf-8')
         if 'Distance Err' not in csv_string:  # Correct ExoFOP bug where distance error column header is missing.
             csv_string = csv_string.replace('Distance(pc)', 'Distance (pc),Distance Err (pc)')
         data_frame = pd.read_csv(io.StringIO(csv_string), index_col=False)
@@ -0,0 +1,278 @@
+"""
+Code for running resumable inference over huge light curve collections in shards across processes.
+"""
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Set, Union
+
+import multiprocess
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from ramjet.inference_result_writer import InferenceResultWriter, TopPredictionAccumulator, \
+    build_confidences_data_frame
+from ramjet.photometric_database.standard_and_injected_light_curve_database import \
+    StandardAndInjectedLightCurveDatabase
+
+
+def get_path_shard_index(path: Union[Path, str], number_of_shards: int) -> int:
+    """
+    Gets the shard a light curve path belongs to. The assignment depends only on the path, so it is the same across
+    runs regardless of the order the collections list their paths in.
+
+    :param path: The light curve path.
+    :param number_of_shards: The total number of shards.
+    :return: The index of the shard.
+    """
+    path_hash = hashlib.md5(str(path).encode('utf-8')).digest()
+    return int.from_bytes(path_hash[:8], byteorder='little') % number_of_shards
+
+
+class ShardedInferenceRunner:
+    """
+    A class for running inference on the inference collections of a database, split deterministically into shards by
+    path. The collections are enumerated once, and the path list of each shard is saved before inference starts, so
+    the workers only read their own shard's paths. Shards are inferred in parallel worker processes, each with its own
+    copy of the database and model, and a bounded TensorFlow thread budget. Each shard checkpoints its results as
+    numbered part files, and marks itself complete when done, so a restarted run skips completed shards and already
+    inferred paths. A restarted run reuses the saved path lists, so light curves added after the first run are not
+    included. The part files of all shards are then merged into a single results file.
+
+    :ivar database_factory: The function creating the database to infer on.
+    :ivar model_factory: The function creating the model to infer with, including loading its weights.
+    :ivar results_directory: The directory the shard results are stored in.
+    :ivar number_of_shards: The number of shards to split the paths into.
+    :ivar number_of_processes: The number of worker processes. Defaults to the number of CPUs. A single process infers
+                               on the shards in the current process.
+    :ivar threads_per_process: The number of TensorFlow intra-op and inter-op threads of each worker process.
+    :ivar rows_per_checkpoint: The number of results at which a shard writes a part file.
+    """
+    def __init__(self, database_factory: Callable[[], StandardAndInjectedLightCurveDatabase],
+                 model_factory: Callable[[], tf.keras.Model], results_directory: Path, number_of_shards: int,
+                 number_of_processes: Optional[int] = None, threads_per_process: int = 1,
+                 rows_per_checkpoint: int = 10_000):
+        self.database_factory: Callable[[], StandardAndInjectedLightCurveDatabase] = database_factory
+        self.model_factory: Callable[[], tf.keras.Model] = model_factory
+        self.results_directory: Path = results_directory
+        self.number_of_shards: int = number_of_shards
+        if number_of_processes is None:
+            number_of_processes = os.cpu_count()
+        self.number_of_processes: int = number_of_processes
+        self.threads_per_process: int = threads_per_process
+        self.rows_per_checkpoint: int = rows_per_checkpoint
+
+    def get_shard_directory(self, shard_index: int) -> Path:
+        """
+        Gets the directory of the results of a shard.
+
+        :param shard_index: The index of the shard.
+        :return: The shard directory.
+        """
+        return self.results_directory.joinpath(f'shard_{shard_index}_of_{self.number_of_shards}')
+
+    def get_shard_part_paths(self, shard_index: int) -> List[Path]:
+        """
+        Gets the paths of the result part files written by a shard, in the order they were written.
+
+        :param shard_index: The index of the shard.
+        :return: The part file paths.
+        """
+        return sorted(self.get_shard_directory(shard_index).glob('part_*.csv'))
+
+    def get_shard_paths_path(self, shard_index: int) -> Path:
+        """
+        Gets the path of the file listing the light curve paths assigned to a shard.
+
+        :param shard_index: The index of the shard.
+        :return: The shard paths file path.
+        """
+        return self.get_shard_directory(shard_index).joinpath('paths.csv')
+
+    def are_shard_paths_assigned(self) -> bool:
+        """
+        Checks if the light curve paths have been assigned to the shards.
+
+        :return: Whether the paths have been assigned.
+        """
+        return self.results_directory.joinpath('paths_assigned').exists()
+
+    def assign_shard_paths(self):
+        """
+        Enumerates the paths of the database's inference collections once, and saves the list of paths assigned to each
+        shard, along with the index of the inference collection each path came from.
+        """
+        if self.are_shard_paths_assigned():
+            return
+        database = self.database_factory()
+        shard_paths = [[] for _ in range(self.number_of_shards)]
+        shard_collection_indexes = [[] for _ in range(self.number_of_shards)]
+        for collection_index, light_curve_collection in enumerate(database.inference_light_curve_collections):
+            paths_factory = database.create_paths_factory_for_light_curve_collection(light_curve_collection)
+            for path in paths_factory():
+                shard_index = get_path_shard_index(path, self.number_of_shards)
+                shard_paths[shard_index].append(str(path))
+                shard_collection_indexes[shard_index].append(collection_index)
+        for shard_index in range(self.number_of_shards):
+            self.get_shard_directory(shard_index).mkdir(parents=True, exist_ok=True)
+            shard_paths_path = self.get_shard_paths_path(shard_index)
+            temporary_shard_paths_path = shard_paths_path.with_name(f'{shard_paths_path.name}.tmp')
+            pd.DataFrame({'light_curve_path': shard_paths[shard_index],
+                          'collection_index': shard_collection_indexes[shard_index]}
+                         ).to_csv(temporary_shard_paths_path, index=False)
+            os.replace(temporary_shard_paths_path, shard_paths_path)
+        self.results_directory.joinpath('paths_assigned').touch()
+
+    def load_remaining_paths_per_collection(self, shard_index: int, number_of_collections: int) -> List[List[Path]]:
+        """
+        Loads the paths assigned to a shard which have not yet been inferred on, grouped by inference collection.
+
+        :param shard_index: The index of the shard.
+        :param number_of_collections: The number of inference collections of the database.
+        :return: The list of remaining paths of each inference collection.
+        """
+        completed_paths = self.load_completed_paths(shard_index)
+        shard_paths_data_frame = pd.read_csv(self.get_shard_paths_path(shard_index),
+                                             dtype={'light_curve_path': str, 'collection_index': int})
+        paths_per_collection = [[] for _ in range(number_of_collections)]
+        for path, collection_index in zip(shard_paths_data_frame['light_curve_path'],
+                                          shard_paths_data_frame['collection_index']):
+            if path not in completed_paths:
+                paths_per_collection[collection_index].append(Path(path))
+        return paths_per_collection
+
+    def is_shard_complete(self, shard_index: int) -> bool:
+        """
+        Checks if a shard has been completely inferred on.
+
+        :param shard_index: The index of the shard.
+        :return: Whether the shard is complete.
+        """
+        return self.get_shard_directory(shard_index).joinpath('complete').exists()
+
+    def load_completed_paths(self, shard_index: int) -> Set[str]:
+        """
+        Loads the paths a shard has already inferred on.
+
+        :param shard_index: The index of the shard.
+        :return: The set of completed path strings.
+        """
+        completed_paths = set()
+        for part_path in self.get_shard_part_paths(shard_index):
+            completed_paths.update(pd.read_csv(part_path, usecols=['light_curve_path'],
+                                               dtype={'light_curve_path': str})['light_curve_path'])
+        return completed_paths
+
+    def limit_tensorflow_threads(self):
+        """
+        Limits the number of threads TensorFlow uses in the current process.
+        """
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(self.threads_per_process)
+            tf.config.threading.set_inter_op_parallelism_threads(self.threads_per_process)
+        except RuntimeError:  # TensorFlow was already initialized in this process.
+            pass
+
+    def infer_shard(self, shard_index: int) -> int:
+        """
+        Infers on the remaining paths of a shard, checkpointing the results as part files. The paths must already be
+        assigned to the shards.
+
+        :param shard_index: The index of the shard.
+        :return: The index of the shard.
+        """
+        if self.is_shard_complete(shard_index):
+            return shard_index
+        self.limit_tensorflow_threads()
+        shard_directory = self.get_shard_directory(shard_index)
+        shard_directory.mkdir(parents=True, exist_ok=True)
+        part_index = len(self.get_shard_part_paths(shard_index))
+        database = self.database_factory()
+        model = self.model_factory()
+        paths_per_collection = self.load_remaining_paths_per_collection(
+            shard_index, len(database.inference_light_curve_collections))
+        dataset = database.generate_inference_dataset(paths_per_collection=paths_per_collection)
+        batch_data_frames = []
+        buffered_row_count = 0
+        for paths, examples in dataset:
+            confidences = model(examples, training=False)
+            batch_data_frames.append(build_confidences_data_frame(paths.numpy(), np.asarray(confidences)))
+            buffered_row_count += batch_data_frames[-1].shape[0]
+            if buffered_row_count >= self.rows_per_checkpoint:
+                self.save_part(shard_index, part_index, batch_data_frames)
+                part_index += 1
+                batch_data_frames = []
+                buffered_row_count = 0
+        if buffered_row_count > 0:
+            self.save_part(shard_index, part_index, batch_data_frames)
+        shard_directory.joinpath('complete').touch()
+        return shard_index
+
+    def save_part(self, shard_index: int, part_index: int, batch_data_frames: List[pd.DataFrame]):
+        """
+        Atomically saves a part file of shard results.
+
+        :param shard_index: The index of the shard.
+        :param part_index: The index of the part within the shard.
+        :param batch_data_frames: The batch results data frames of the part.
+        """
+        part_path = self.get_shard_directory(shard_index).joinpath(f'part_{part_index:06d}.csv')
+        temporary_part_path = part_path.with_name(f'{part_path.name}.tmp')
+        pd.concat(batch_data_frames, ignore_index=True).to_csv(temporary_part_path, index=False)
+        os.replace(temporary_part_path, part_path)
+
+    def run(self):
+        """
+        Assigns the paths to the shards, if not yet assigned, and infers on all incomplete shards.
+        """
+        self.assign_shard_paths()
+        incomplete_shard_indexes = [shard_index for shard_index in range(self.number_of_shards)
+                                    if not self.is_shard_complete(shard_index)]
+        print(f'{self.number_of_shards - len(incomplete_shard_indexes)}/{self.number_of_shards} shards previously '
+              f'completed.', flush=True)
+        start_time = time.perf_counter()
+        if self.number_of_processes == 1:
+            completed_shard_indexes = map(self.infer_shard, incomplete_shard_indexes)
+            self.report_shard_progress(completed_shard_indexes, len(incomplete_shard_indexes), start_time)
+        else:
+            # Workers are spawned rather than forked, as TensorFlow does not support being used in forked processes.
+            with multiprocess.get_context('spawn').Pool(self.number_of_processes) as pool:
+                completed_shard_indexes = pool.imap_unordered(self.infer_shard, incomplete_shard_indexes)
+                self.report_shard_progress(completed_shard_indexes, len(incomplete_shard_indexes), start_time)
+
+    @staticmethod
+    def report_shard_progress(completed_shard_indexes, number_of_shards_to_infer: int, start_time: float):
+        """
+        Prints the progress of the shards as they complete.
+
+        :param completed_shard_indexes: The iterable of shard indexes, yielded as the shards complete.
+        :param number_of_shards_to_infer: The number of shards being inferred on.
+        :param start_time: The time inference started.
+        """
+        for completed_count, shard_index in enumerate(completed_shard_indexes, start=1):
+            elapsed_time = time.perf_counter() - start_time
+            print(f'Shard {shard_index} complete. {completed_count}/{number_of_shards_to_infer} shards inferred on '
+                  f'in {elapsed_time:.0f}s.', flush=True)
+
+    def merge(self, infer_results_path: Path, number_of_top_predictions_to_keep: Optional[int] = None):
+        """
+        Merges the results of all shards into a single results file, sorted by descending confidence.
+
+        :param infer_results_path: The path to save the merged results to.
+        :param number_of_top_predictions_to_keep: The number of top results to keep. None will save all results.
+        """
+        incomplete_shard_indexes = [shard_index for shard_index in range(self.number_of_shards)
+                                    if not self.is_shard_complete(shard_index)]
+        if len(incomplete_shard_indexes) > 0:
+            raise ValueError(f'Shards {incomplete_shard_indexes} are not complete and cannot be merged.')
+        if number_of_top_predictions_to_keep is None:
+            result_writer = InferenceResultWriter(infer_results_path)
+        else:
+            result_writer = TopPredictionAccumulator(infer_results_path, number_of_top_predictions_to_keep)
+        for shard_index in range(self.number_of_shards):
+            for part_path in self.get_shard_part_paths(shard_index):
+                for part_chunk in pd.read_csv(part_path, chunksize=100_000, dtype={'light_curve_path': str}):
+                    result_writer.write_batch(part_chunk)
+        result_writer.finalize()
@@ -4,9 +4,8 @@ Boilerplate code for running trials.
 import datetime
 
 import numpy as np
-import pandas as pd
 import tensorflow as tf
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 try:
     from enum import StrEnum
@@ -16,6 +15,8 @@ except ImportError:
 import wandb.keras
 from tensorflow.keras import callbacks
 
+from ramjet.inference_result_writer import InferenceResultWriter, TopPredictionAccumulator, \
+    build_confidences_data_frame, build_ensemble_confidences_data_frame
 from ramjet.logging.wandb_logger import WandbLogger
 from ramjet.photometric_database.standard_and_injected_light_curve_database import StandardAndInjectedLightCurveDatabase
 
@@ -35,48 +36,45 @@ def infer(model: tf.keras.Model, dataset: tf.data.Dataset, infer_results_path: P
     :param infer_results_path: The path to save the resulting predictions to.
     :param number_of_top_predictions_to_keep: The number of top results to keep. None will save all results.
     """
-    confidences_data_frame = None
+    if number_of_top_predictions_to_keep is None:
+        result_writer = InferenceResultWriter(infer_results_path)
+    else:
+        result_writer = TopPredictionAccumulator(infer_results_path, number_of_top_predictions_to_keep)
     examples_count = 0
-    for batch_index, (paths, examples) in enumerate(dataset):
+    for paths, examples in dataset:
         confidences = model(examples, training=False)
-        if confidences.shape[1] == 1:
-            batch_confidences_data_frame = pd.DataFrame({'light_curve_path': paths.numpy().astype(str),
-                                                         'confidence': np.squeeze(confidences, axis=1)})
-        else:
-            batch_confidences_data_frame = pd.DataFrame({'light_curve_path': paths.numpy().astype(str)})
-            for label_index in range(confidences.shape[1]):
-                batch_confidences_data_frame[f'label_{label_index}_confidence'] = confidences[:, label_index]
+        batch_confidences_data_frame = build_confidences_data_frame(paths.numpy(), np.asarray(confidences))
         examples_count += batch_confidences_data_frame.shape[0]
-        if confidences_data_frame is None:
-            confidences_data_frame = batch_confidences_data_frame
-        else:
-            confidences_data_frame = pd.concat([confidences_data_frame, batch_confidences_data_frame])
+        result_writer.write_batch(batch_confidences_data_frame)
         print(f'{examples_count} examples inferred on.', flush=True)
-        if number_of_top_predictions_to_keep is not None and batch_index % 100 == 0:
-            confidences_data_frame = save_results(confidences_data_frame, infer_results_path,
-                                                  number_of_top_predictions_to_keep)
-    save_results(confidences_data_frame, infer_results_path, number_of_top_predictions_to_keep)
+    result_writer.finalize()
 
 
-def save_results(confidences_data_frame: pd.DataFrame, infer_results_path: Path,
-                 number_of_top_predictions_to_keep: int = None) -> pd.DataFrame:
+def infer_ensemble(models: Dict[str, tf.keras.Model], dataset: tf.data.Dataset, infer_results_path: Path,
+                   number_of_top_predictions_to_keep: int = None):
     """
-    Saves a predictions data frame to a file.
+    Performs inference of an ensemble of models on a dataset saving the results to a file. Each batch is loaded and
+    preprocessed once, and passed to every model. The results contain each model's confidences, and the mean and
+    variance of the confidences across the models, sorted by the mean.
 
-    :param confidences_data_frame: The data frame of predictions to save.
+    :param models: The dictionary from model name to the model to infer with.
+    :param dataset: The dataset to infer on.
     :param infer_results_path: The path to save the resulting predictions to.
     :param number_of_top_predictions_to_keep: The number of top results to keep. None will save all results.
-    :return: The updated data frame.
     """
-    try:
-        confidences_data_frame = confidences_data_frame.sort_values('confidence', ascending=False)
-    except KeyError:
-        confidences_data_frame = confidences_data_frame.sort_values('label_0_confidence', ascending=False)
-    if number_of_top_predictions_to_keep is not None:
-        confidences_data_frame = confidences_data_frame.head(number_of_top_predictions_to_keep)
-    confidences_data_frame = confidences_data_frame.reset_index(drop=True)
-    confidences_data_frame.to_csv(infer_results_path, index_label='index')
-    return confidences_data_frame
+    if number_of_top_predictions_to_keep is None:
+        result_writer = InferenceResultWriter(infer_results_path)
+    else:
+        result_writer = TopPredictionAccumulator(infer_results_path, number_of_top_predictions_to_keep)
+    examples_count = 0
+    for paths, examples in dataset:
+        confidences_per_model = {model_name: np.asarray(model(examples, training=False))
+                                 for model_name, model in models.items()}
+        batch_confidences_data_frame = build_ensemble_confidences_data_frame(paths.numpy(), confidences_per_model)
+        examples_count += batch_confidences_data_frame.shape[0]
+        result_writer.write_batch(batch_confidences_data_frame)
+        print(f'{examples_count} examples inferred on.', flush=True)
+    result_writer.finalize()
 
 
 def create_logging_metrics() -> List[tf.metrics.Metric]:
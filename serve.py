@@ -0,0 +1,25 @@
+"""Code for serving a trained model locally, so light curves can be scored without reloading the model."""
+
+from pathlib import Path
+
+from ramjet.data_interface.metadatabase import metadatabase
+from ramjet.models.hades import Hades
+from ramjet.photometric_database.derived.tess_two_minute_cadence_transit_databases import \
+    TessTwoMinuteCadenceStandardAndInjectedTransitDatabase
+from ramjet.analysis.model_loader import get_latest_log_directory
+from ramjet.inference_server import InferenceServer
+
+log_name = get_latest_log_directory(logs_directory='logs')  # Uses the latest model in the log directory.
+# log_name = 'logs/baseline YYYY-MM-DD-hh-mm-ss'  # Specify the path to the model to use.
+saved_log_directory = Path(f'{log_name}')
+
+print('Setting up database...', flush=True)
+metadatabase.use_read_only_connections()  # Inference only queries the metadatabase.
+database = TessTwoMinuteCadenceStandardAndInjectedTransitDatabase()
+
+print('Loading model...', flush=True)
+model = Hades(database.number_of_label_values)
+model.load_weights(str(saved_log_directory.joinpath('latest_model.ckpt'))).expect_partial()
+
+server = InferenceServer(model, database, max_batch_size=database.batch_size, max_wait=0.01)
+server.serve_forever()
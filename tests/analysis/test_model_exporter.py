@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from ramjet.analysis.model_exporter import export_saved_model, export_tflite_model, load_exported_model, \
+    SavedModelInferrer, TfLiteInferrer, compare_inference_paths, QuantizationMode, create_representative_dataset, \
+    evaluate_quantization
+from ramjet.models.single_layer_model import SingleLayerModel, SingleLayerModelWithAuxiliary
+from ramjet.photometric_database.derived.toy_database import ToyDatabase, ToyDatabaseWithAuxiliary
+
+
+class TestModelExporter:
+    @pytest.fixture
+    def database(self) -> ToyDatabase:
+        """
+        A fixture of the toy database.
+
+        :return: The database.
+        """
+        return ToyDatabase()
+
+    @pytest.fixture
+    def model(self, database) -> tf.keras.Model:
+        """
+        A fixture of a built single layer model for the toy database.
+
+        :return: The model.
+        """
+        model = SingleLayerModel()
+        model(np.zeros([1, database.time_steps_per_example, database.number_of_input_channels], dtype=np.float32))
+        return model
+
+    def test_saved_model_matches_the_eager_model(self, database, model, tmp_path):
+        examples = np.random.random([4, database.time_steps_per_example, 1]).astype(np.float32)
+        export_directory = export_saved_model(model, database, tmp_path.joinpath('saved_model'))
+        inferrer = load_exported_model(export_directory)
+        assert isinstance(inferrer, SavedModelInferrer)
+        assert np.allclose(inferrer(examples, training=False), model(examples, training=False), atol=1e-6)
+
+    def test_tflite_model_matches_the_eager_model_across_batch_sizes(self, database, model, tmp_path):
+        saved_model_directory = export_saved_model(model, database, tmp_path.joinpath('saved_model'))
+        tflite_path = export_tflite_model(saved_model_directory, tmp_path.joinpath('model.tflite'))
+        inferrer = load_exported_model(tflite_path)
+        assert isinstance(inferrer, TfLiteInferrer)
+        for batch_size in [4, 2, 4]:
+            examples = np.random.random([batch_size, database.time_steps_per_example, 1]).astype(np.float32)
+            assert np.allclose(inferrer(examples), model(examples, training=False), atol=1e-5)
+
+    def test_saved_model_supports_auxiliary_inputs(self, tmp_path):
+        database = ToyDatabaseWithAuxiliary()
+        model = SingleLayerModelWithAuxiliary()
+        light_curves = np.random.random([3, database.time_steps_per_example, 1]).astype(np.float32)
+        auxiliary_information = np.random.random([3, 2]).astype(np.float32)
+        model((light_curves, auxiliary_information))
+        inferrer = load_exported_model(export_saved_model(model, database, tmp_path.joinpath('saved_model')))
+        assert np.allclose(inferrer((light_curves, auxiliary_information)),
+                           model((light_curves, auxiliary_information), training=False), atol=1e-6)
+
+    def test_comparison_reports_each_inference_path(self, database, model, tmp_path):
+        comparison_data_frame = compare_inference_paths(model, database, tmp_path, number_of_batches=2)
+        assert comparison_data_frame['inference_path'].tolist() == ['eager', 'saved_model', 'tflite']
+        assert (comparison_data_frame['throughput'] > 0).all()
+
+    @pytest.mark.parametrize('quantization_mode', list(QuantizationMode))
+    def test_quantized_models_approximate_the_float_model(self, database, model, tmp_path, quantization_mode):
+        saved_model_directory = export_saved_model(model, database, tmp_path.joinpath('saved_model'))
+        representative_dataset = create_representative_dataset(database, number_of_batches=2)
+        tflite_path = export_tflite_model(saved_model_directory, tmp_path.joinpath('model.tflite'),
+                                          quantization_mode=quantization_mode,
+                                          representative_dataset=representative_dataset)
+        inferrer = TfLiteInferrer(tflite_path)
+        examples = next(representative_dataset())[0]
+        assert np.allclose(inferrer(examples), model(examples, training=False), atol=0.05)
+
+    def test_full_integer_quantization_requires_a_representative_dataset(self, database, model, tmp_path):
+        saved_model_directory = export_saved_model(model, database, tmp_path.joinpath('saved_model'))
+        with pytest.raises(ValueError):
+            export_tflite_model(saved_model_directory, tmp_path.joinpath('model.tflite'),
+                                quantization_mode=QuantizationMode.FULL_INTEGER)
+
+    def test_quantization_evaluation_reports_drift_against_the_float_model(self, database, model, tmp_path):
+        evaluation_data_frame = evaluate_quantization(model, database, tmp_path, number_of_validation_batches=2,
+                                                      number_of_representative_batches=2)
+        assert evaluation_data_frame['model'].tolist() == ['float', 'dynamic_range', 'full_integer', 'float16']
+        assert evaluation_data_frame['area_under_roc_curve_drift'].iloc[0] == 0
+        assert evaluation_data_frame['throughput_gain'].iloc[0] == 1
+
+    def test_quantization_evaluation_supports_auxiliary_inputs(self, tmp_path):
+        database = ToyDatabaseWithAuxiliary()
+        model = SingleLayerModelWithAuxiliary()
+        model((np.zeros([1, database.time_steps_per_example, 1], dtype=np.float32),
+               np.zeros([1, database.number_of_auxiliary_values], dtype=np.float32)))
+        representative_inputs = next(create_representative_dataset(database, number_of_batches=1)())
+        assert [input_array.shape[1:] for input_array in representative_inputs] == [
+            (database.time_steps_per_example, 1), (database.number_of_auxiliary_values,)]
+        evaluation_data_frame = evaluate_quantization(model, database, tmp_path, number_of_validation_batches=2,
+                                                      number_of_representative_batches=2)
+        assert evaluation_data_frame['model'].tolist() == ['float', 'dynamic_range', 'full_integer', 'float16']
+        assert (evaluation_data_frame['throughput'] > 0).all()
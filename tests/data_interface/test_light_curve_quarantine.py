@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import pytest
+from peewee import SqliteDatabase
+
+from ramjet.data_interface.light_curve_quarantine import LightCurveQuarantine, QuarantinedLightCurve
+
+
+class TestLightCurveQuarantine:
+    @pytest.fixture
+    def test_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the quarantine model.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([QuarantinedLightCurve]):
+            yield test_database
+
+    def test_no_paths_are_quarantined_before_the_table_exists(self, test_database):
+        assert LightCurveQuarantine.load_quarantined_paths() == set()
+        assert not LightCurveQuarantine.is_quarantined(Path('a.pkl'))
+
+    def test_can_quarantine_and_release_paths(self, test_database):
+        LightCurveQuarantine.quarantine_paths({Path('a.pkl'): 'UnpicklingError', Path('b.pkl'): 'EOFError'})
+        assert LightCurveQuarantine.load_quarantined_paths() == {'a.pkl', 'b.pkl'}
+        assert LightCurveQuarantine.is_quarantined(Path('a.pkl'))
+        assert not LightCurveQuarantine.is_quarantined(Path('c.pkl'))
+        LightCurveQuarantine.release_paths([Path('a.pkl')])
+        assert LightCurveQuarantine.load_quarantined_paths() == {'b.pkl'}
+
+    def test_quarantining_a_path_again_replaces_its_error(self, test_database):
+        LightCurveQuarantine.quarantine_paths({'a.pkl': 'UnpicklingError'})
+        LightCurveQuarantine.quarantine_paths({'a.pkl': 'EOFError'})
+        assert [(row.path, row.error) for row in QuarantinedLightCurve.select()] == [('a.pkl', 'EOFError')]
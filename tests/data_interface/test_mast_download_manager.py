@@ -0,0 +1,111 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+import pytest
+import requests
+
+from ramjet.data_interface.mast_download_manager import MastDownloadManager, DownloadFailuresError, \
+    is_retryable_download_error
+
+
+class StandInMastRequestHandler(BaseHTTPRequestHandler):
+    """
+    A local stand-in for the MAST download endpoint, serving the data URI repeated as the file contents. Error statuses
+    queued for a data URI are responded with before the product is served.
+    """
+    requested_uris = []
+    queued_error_statuses: Dict[str, List[int]] = {}
+
+    def do_GET(self):
+        """Serves a data product."""
+        data_uri = parse_qs(urlparse(self.path).query)['uri'][0]
+        self.requested_uris.append(data_uri)
+        if len(self.queued_error_statuses.get(data_uri, [])) > 0:
+            self.send_error(self.queued_error_statuses[data_uri].pop(0))
+            return
+        contents = data_uri.encode('utf-8') * 10
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(contents)))
+        self.end_headers()
+        self.wfile.write(contents)
+
+    def log_message(self, format_, *args):
+        """Silences the request logging."""
+        pass
+
+
+class TestMastDownloadManager:
+    @pytest.fixture
+    def download_manager(self) -> MastDownloadManager:
+        """
+        A download manager pointed at a local stand-in for the MAST download endpoint.
+
+        :return: The download manager.
+        """
+        StandInMastRequestHandler.requested_uris = []
+        StandInMastRequestHandler.queued_error_statuses = {}
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StandInMastRequestHandler)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        download_manager = MastDownloadManager()
+        download_manager.download_url_template = f'http://127.0.0.1:{server.server_port}/download?uri={{data_uri}}'
+        download_manager.download_worker_count = 3
+        yield download_manager
+        server.shutdown()
+        server.server_close()
+
+    @staticmethod
+    def create_data_products(count: int) -> pd.DataFrame:
+        """
+        Creates a product list of fake data products.
+
+        :param count: The number of products.
+        :return: The product list.
+        """
+        data_uris = [f'mast:TESS/product/fake_{index}_lc.fits' for index in range(count)]
+        return pd.DataFrame({'dataURI': data_uris,
+                             'productFilename': [Path(data_uri).name for data_uri in data_uris],
+                             'size': [len(data_uri) * 10 for data_uri in data_uris]})
+
+    def test_downloads_products_atomically_and_records_them_in_the_manifest(self, download_manager, tmp_path):
+        data_products = self.create_data_products(5)
+        downloaded_count, skipped_count = download_manager.download_products(data_products, tmp_path)
+        assert (downloaded_count, skipped_count) == (5, 0)
+        for data_uri, file_name in zip(data_products['dataURI'], data_products['productFilename']):
+            assert tmp_path.joinpath(file_name).read_bytes() == data_uri.encode('utf-8') * 10
+        assert list(tmp_path.glob('*.part')) == []
+        assert download_manager.load_manifest(tmp_path) == set(data_products['productFilename'])
+
+    def test_resumed_download_only_downloads_missing_or_unverified_products(self, download_manager, tmp_path):
+        data_products = self.create_data_products(5)
+        download_manager.download_products(data_products.iloc[:2], tmp_path)
+        tmp_path.joinpath('fake_2_lc.fits').write_bytes(b'truncated')
+        tmp_path.joinpath('fake_3_lc.fits').write_bytes(b'mast:TESS/product/fake_3_lc.fits' * 10)
+        StandInMastRequestHandler.requested_uris = []
+        downloaded_count, skipped_count = download_manager.download_products(data_products, tmp_path)
+        assert (downloaded_count, skipped_count) == (2, 3)
+        assert sorted(StandInMastRequestHandler.requested_uris) == ['mast:TESS/product/fake_2_lc.fits',
+                                                                    'mast:TESS/product/fake_4_lc.fits']
+        assert download_manager.load_manifest(tmp_path) == set(data_products['productFilename'])
+
+    @pytest.mark.parametrize('status_code, expected_is_retryable', [(429, True), (500, True), (503, True),
+                                                                    (403, False), (404, False)])
+    def test_only_rate_limit_and_server_error_responses_are_retried(self, status_code, expected_is_retryable):
+        response = requests.Response()
+        response.status_code = status_code
+        assert is_retryable_download_error(requests.exceptions.HTTPError(response=response)) == expected_is_retryable
+
+    def test_failed_products_are_reported_after_the_rest_of_the_batch_is_downloaded(self, download_manager,
+                                                                                        tmp_path):
+        data_products = self.create_data_products(5)
+        StandInMastRequestHandler.queued_error_statuses = {'mast:TESS/product/fake_1_lc.fits': [404],
+                                                           'mast:TESS/product/fake_3_lc.fits': [503, 503]}
+        with pytest.raises(DownloadFailuresError, match='1 of 5'):
+            download_manager.download_products(data_products, tmp_path)
+        assert StandInMastRequestHandler.requested_uris.count('mast:TESS/product/fake_1_lc.fits') == 1
+        assert StandInMastRequestHandler.requested_uris.count('mast:TESS/product/fake_3_lc.fits') == 3
+        assert download_manager.load_manifest(tmp_path) == set(data_products['productFilename']) - {'fake_1_lc.fits'}
@@ -1,8 +1,47 @@
+import time
 from uuid import UUID
 
+import numpy as np
 import pytest
+from unittest.mock import patch
+from peewee import SqliteDatabase, CharField, IntegerField, OperationalError
+from playhouse.migrate import SqliteMigrator, migrate
 
-from ramjet.data_interface.metadatabase import metadatabase_uuid, dataset_split_from_uuid
+import ramjet.data_interface.metadatabase as module
+from ramjet.data_interface.metadatabase import metadatabase_uuid, dataset_split_from_uuid, MetadatabaseModel, \
+    rerandomize_random_order_field, bulk_upsert, BulkUpsertConflictAction, MetadatabaseSqliteDatabase, \
+    add_missing_random_order_field, random_order_minimum_value
+from ramjet.data_interface.tess_ffi_light_curve_metadata_manager import TessFfiLightCurveMetadata
+from ramjet.data_interface.tess_two_minute_cadence_light_curve_metadata_manager import \
+    TessTwoMinuteCadenceLightCurveMetadata
+
+
+class LegacyMetadata(MetadatabaseModel):
+    """
+    A model of a table created before the random order field existed.
+    """
+    path = CharField(unique=True)
+
+
+class RandomOrderMetadata(MetadatabaseModel):
+    """
+    The same table as `LegacyMetadata`, but including the random order field.
+    """
+    path = CharField(unique=True)
+    random_order = IntegerField(index=True)
+
+    class Meta:
+        """Schema meta data for the model."""
+        table_function = lambda model_class: 'LegacyMetadata'
+
+
+class UpsertMetadata(MetadatabaseModel):
+    """
+    A model to test the bulk upsert with.
+    """
+    tic_id = IntegerField(unique=True)
+    sector = IntegerField(default=0)
+    disposition = CharField()
 
 
 class TestMetadatabase():
@@ -14,3 +53,118 @@ class TestMetadatabase():
     def test_dataset_split_is_repeatable_from_uuid(self):
         dataset_split = dataset_split_from_uuid(UUID('80f551f9-b8f9-5146-8059-65bc116883c4'))
         assert dataset_split == 6
+
+    def test_rerandomize_random_order_field_adds_the_missing_column_and_randomizes_it(self):
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([LegacyMetadata, RandomOrderMetadata]):
+            test_database.create_tables([LegacyMetadata])
+            LegacyMetadata.insert_many([{'path': f'{index}.pkl'} for index in range(100)]).execute()
+            with patch.object(module, 'metadatabase', test_database):
+                rerandomize_random_order_field(RandomOrderMetadata, RandomOrderMetadata.random_order)
+            random_orders = [row.random_order for row in RandomOrderMetadata.select()]
+            index_names = [index.name for index in test_database.get_indexes('LegacyMetadata')]
+        assert len(set(random_orders)) == 100
+        assert any('random_order' in index_name for index_name in index_names)
+
+    @pytest.mark.parametrize('model_class', [TessFfiLightCurveMetadata, TessTwoMinuteCadenceLightCurveMetadata])
+    def test_add_missing_random_order_field_upgrades_a_table_created_without_the_field(self, model_class):
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([model_class]):
+            test_database.create_tables([model_class])
+            row = {field.name: index for index, field in enumerate(model_class._meta.sorted_fields)}
+            model_class.insert(row).execute()
+            # Remove the random order column to reproduce a table created before the field existed.
+            table_name = model_class._meta.table_name
+            migrator = SqliteMigrator(test_database)
+            migrate(migrator.drop_index(table_name, f'{table_name}_random_order'),
+                    migrator.drop_column(table_name, 'random_order'))
+            with patch.object(module, 'metadatabase', test_database):
+                add_missing_random_order_field(model_class, model_class.random_order)
+                add_missing_random_order_field(model_class, model_class.random_order)  # A second call does nothing.
+            model_class.insert({**row, 'path': 'new.pkl', 'tic_id': -1}).execute()
+            random_orders = [row_.random_order for row_ in model_class.select().order_by(model_class.tic_id.desc())]
+            index_names = [index.name for index in test_database.get_indexes(table_name)]
+        assert random_orders[0] == random_order_minimum_value
+        assert random_orders[1] != random_order_minimum_value
+        assert any('random_order' in index_name for index_name in index_names)
+
+    @pytest.fixture
+    def upsert_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the upsert test model.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([UpsertMetadata]):
+            test_database.create_tables([UpsertMetadata])
+            UpsertMetadata.insert_many([{'tic_id': 1, 'sector': 1, 'disposition': 'Candidate'}]).execute()
+            yield test_database
+
+    def test_bulk_upsert_writes_rows_from_an_iterator_in_batches(self, upsert_database):
+        rows = ({'tic_id': np.int64(tic_id), 'disposition': 'Candidate'} for tic_id in range(2, 102))
+        row_count = bulk_upsert(UpsertMetadata, rows, batch_size=30)
+        assert row_count == 100
+        assert UpsertMetadata.select().count() == 101
+        assert UpsertMetadata.select().where(UpsertMetadata.tic_id == 101).get().sector == 0
+
+    def test_bulk_upsert_ignore_keeps_existing_rows(self, upsert_database):
+        rows = [{'tic_id': 1, 'sector': 2, 'disposition': 'Confirmed'},
+                {'tic_id': 2, 'sector': 2, 'disposition': 'Confirmed'}]
+        row_count = bulk_upsert(UpsertMetadata, rows, conflict_action=BulkUpsertConflictAction.IGNORE)
+        assert row_count == 1
+        assert list(UpsertMetadata.select().order_by(UpsertMetadata.tic_id).tuples()) == [
+            (1, 1, 'Candidate'), (2, 2, 'Confirmed')]
+
+    def test_bulk_upsert_update_only_updates_the_passed_fields(self, upsert_database):
+        rows = [{'tic_id': 1, 'disposition': 'Confirmed'}]
+        bulk_upsert(UpsertMetadata, rows, conflict_action=BulkUpsertConflictAction.UPDATE,
+                    conflict_target=[UpsertMetadata.tic_id])
+        assert list(UpsertMetadata.select().tuples()) == [(1, 1, 'Confirmed')]
+
+    @pytest.mark.slow
+    def test_bulk_upsert_is_faster_than_saving_rows_individually_for_100k_rows(self, upsert_database):
+        rows = [{'tic_id': tic_id, 'sector': tic_id % 26, 'disposition': 'Candidate'} for tic_id in range(2, 100002)]
+        start_time = time.perf_counter()
+        with upsert_database.atomic():
+            for row in rows:
+                UpsertMetadata(**row).save()
+        individual_save_time = time.perf_counter() - start_time
+        UpsertMetadata.delete().where(UpsertMetadata.tic_id > 1).execute()
+        start_time = time.perf_counter()
+        bulk_upsert(UpsertMetadata, rows)
+        bulk_upsert_time = time.perf_counter() - start_time
+        print(f'Individual saves: {individual_save_time:.2f}s. Bulk upsert: {bulk_upsert_time:.2f}s.')
+        assert UpsertMetadata.select().count() == 100001
+        assert bulk_upsert_time * 5 < individual_save_time
+
+    @pytest.fixture
+    def file_database(self, tmp_path) -> MetadatabaseSqliteDatabase:
+        """
+        A database in a temporary file containing the upsert test table.
+
+        :return: The database.
+        """
+        file_database = MetadatabaseSqliteDatabase(str(tmp_path.joinpath('metadatabase.sqlite3')),
+                                                   pragmas={'journal_mode': 'wal', 'mmap_size': 2 ** 20})
+        with file_database.bind_ctx([UpsertMetadata]):
+            file_database.create_tables([UpsertMetadata])
+            UpsertMetadata.insert_many([{'tic_id': 1, 'sector': 1, 'disposition': 'Candidate'}]).execute()
+            yield file_database
+            file_database.close()
+
+    @pytest.mark.parametrize('immutable', [False, True])
+    def test_read_only_connections_can_query_but_not_write(self, file_database, immutable):
+        file_database.use_read_only_connections(immutable=immutable)
+        assert UpsertMetadata.select().count() == 1
+        with pytest.raises(OperationalError):
+            UpsertMetadata.insert(tic_id=2, sector=1, disposition='Candidate').execute()
+
+    def test_connection_inherited_through_a_fork_is_replaced_rather_than_closed(self, file_database):
+        inherited_connection = file_database.connection()
+        file_database.discard_connection_inherited_from_parent_process()
+        assert file_database.is_closed()
+        assert UpsertMetadata.select().count() == 1
+        assert file_database.connection() is not inherited_connection
+        assert inherited_connection in file_database.connections_inherited_from_parent_process
+        inherited_connection.execute('SELECT 1')  # The inherited connection was not closed.
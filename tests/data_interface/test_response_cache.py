@@ -0,0 +1,71 @@
+import os
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from ramjet.data_interface.response_cache import ResponseCache, ResponseCacheSource
+
+
+class TestResponseCache:
+    @pytest.fixture
+    def response_cache(self, tmp_path) -> ResponseCache:
+        """
+        A fixture of an empty response cache in a temporary directory.
+
+        :return: The response cache.
+        """
+        return ResponseCache(cache_directory=tmp_path)
+
+    def test_fetched_responses_are_served_from_the_cache(self, response_cache):
+        fetch_function = Mock(return_value={'radius': 1.5})
+        response0 = response_cache.get_or_fetch(ResponseCacheSource.GAIA, 1, fetch_function)
+        response1 = response_cache.get_or_fetch(ResponseCacheSource.GAIA, 1, fetch_function)
+        assert response0 == {'radius': 1.5}
+        assert response1 == {'radius': 1.5}
+        assert fetch_function.call_count == 1
+
+    def test_refreshed_lookups_are_fetched_and_replace_the_entry(self, response_cache):
+        response_cache.save(ResponseCacheSource.GAIA, 1, 'stale')
+        fetch_function = Mock(return_value='fresh')
+        response = response_cache.get_or_fetch(ResponseCacheSource.GAIA, 1, fetch_function, refresh=True)
+        assert response == 'fresh'
+        assert response_cache.load(ResponseCacheSource.GAIA, 1) == 'fresh'
+
+    def test_entries_are_separate_per_source_and_key(self, response_cache):
+        response_cache.save(ResponseCacheSource.GAIA, 1, 'gaia 1')
+        response_cache.save(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 1, 'nearby 1')
+        response_cache.save(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 2, 'nearby 2')
+        assert response_cache.load(ResponseCacheSource.GAIA, 1) == 'gaia 1'
+        assert response_cache.load(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 1) == 'nearby 1'
+        assert response_cache.load(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 2) == 'nearby 2'
+        assert response_cache.load(ResponseCacheSource.MOA_EVENTS, 1) is None
+
+    def test_entries_expire_after_the_time_to_live_of_their_source(self, response_cache):
+        response_cache.save(ResponseCacheSource.EXOFOP_DISPOSITIONS, 'url', b'old')
+        response_cache.save(ResponseCacheSource.GAIA, 1, 'radius')
+        two_days_ago = time.time() - 2 * 24 * 60 * 60
+        for source, key in [(ResponseCacheSource.EXOFOP_DISPOSITIONS, 'url'), (ResponseCacheSource.GAIA, 1)]:
+            os.utime(response_cache.get_entry_path(source, key), (two_days_ago, two_days_ago))
+        assert response_cache.load(ResponseCacheSource.EXOFOP_DISPOSITIONS, 'url') is None
+        assert response_cache.load(ResponseCacheSource.GAIA, 1) == 'radius'
+        response = response_cache.get_or_fetch(ResponseCacheSource.EXOFOP_DISPOSITIONS, 'url', lambda: b'new')
+        assert response == b'new'
+        assert response_cache.load(ResponseCacheSource.EXOFOP_DISPOSITIONS, 'url') == b'new'
+
+    def test_failed_saves_leave_no_partial_entries(self, response_cache):
+        response_cache.save(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 1, 'existing')
+        unpicklable_response = lambda: None
+        with pytest.raises(Exception):
+            response_cache.save(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 1, unpicklable_response)
+        assert response_cache.load(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 1) == 'existing'
+        entry_directory = response_cache.get_entry_path(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 1).parent
+        assert [path.name for path in entry_directory.iterdir()] == [
+            response_cache.get_entry_path(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 1).name]
+
+    def test_can_clear_entries_of_a_source(self, response_cache):
+        response_cache.save(ResponseCacheSource.GAIA, 1, 'gaia 1')
+        response_cache.save(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 1, 'nearby 1')
+        response_cache.clear(ResponseCacheSource.GAIA)
+        assert response_cache.load(ResponseCacheSource.GAIA, 1) is None
+        assert response_cache.load(ResponseCacheSource.EXOFOP_NEARBY_TARGETS, 1) == 'nearby 1'
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+from peewee import SqliteDatabase
+
+from ramjet.data_interface.metadatabase import metadatabase
+from ramjet.data_interface.target_inference_results import TargetInferenceResultsManager, TargetInferenceResult, \
+    TargetInferenceAggregate, target_inference_results_database
+
+
+class TestTargetInferenceResultsManager:
+    @pytest.fixture
+    def test_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the inference result models.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([TargetInferenceResult, TargetInferenceAggregate]):
+            yield test_database
+
+    @staticmethod
+    def create_results_data_frame(rows: [(int, int, float)]) -> pd.DataFrame:
+        """
+        Creates a results data frame from TIC ID, sector, and confidence tuples.
+
+        :param rows: The TIC ID, sector, and confidence tuples.
+        :return: The results data frame.
+        """
+        return pd.DataFrame({'tic_id': [tic_id for tic_id, _, _ in rows],
+                             'sector': [sector for _, sector, _ in rows],
+                             'light_curve_path': [f'tic_id_{tic_id}_sector_{sector}_ffi_light_curve.pkl'
+                                                  for tic_id, sector, _ in rows],
+                             'confidence': [confidence for _, _, confidence in rows]})
+
+    def test_no_pairs_are_inferred_before_the_table_exists(self, test_database):
+        manager = TargetInferenceResultsManager()
+        assert manager.load_inferred_tic_id_and_sector_pairs('a') == set()
+        assert manager.load_ranked_targets('a').shape[0] == 0
+
+    def test_aggregates_are_updated_as_sectors_are_added(self, test_database):
+        manager = TargetInferenceResultsManager()
+        manager.save_results(self.create_results_data_frame([(1, 1, 0.2), (2, 1, 0.5)]), 'a')
+        manager.save_results(self.create_results_data_frame([(1, 2, 0.8)]), 'a')
+        ranked_targets = manager.load_ranked_targets('a')
+        assert ranked_targets['tic_id'].tolist() == [1, 2]
+        assert ranked_targets['maximum_confidence'].tolist() == [0.8, 0.5]
+        assert ranked_targets['mean_confidence'].tolist() == pytest.approx([0.5, 0.5])
+        assert ranked_targets['sector_count'].tolist() == [2, 1]
+        assert manager.load_inferred_tic_id_and_sector_pairs('a') == {(1, 1), (2, 1), (1, 2)}
+
+    def test_reinferred_sectors_replace_their_results(self, test_database):
+        manager = TargetInferenceResultsManager()
+        manager.save_results(self.create_results_data_frame([(1, 1, 0.2), (1, 2, 0.4)]), 'a')
+        manager.save_results(self.create_results_data_frame([(1, 1, 0.6)]), 'a')
+        ranked_targets = manager.load_ranked_targets('a')
+        assert ranked_targets['maximum_confidence'].tolist() == [0.6]
+        assert ranked_targets['mean_confidence'].tolist() == pytest.approx([0.5])
+        assert ranked_targets['sector_count'].tolist() == [2]
+
+    def test_results_are_separate_per_model_checkpoint(self, test_database):
+        manager = TargetInferenceResultsManager()
+        manager.save_results(self.create_results_data_frame([(1, 1, 0.2)]), 'a')
+        manager.save_results(self.create_results_data_frame([(1, 1, 0.9), (2, 1, 0.1)]), 'b')
+        assert manager.load_ranked_targets('a')['maximum_confidence'].tolist() == [0.2]
+        assert manager.load_ranked_targets('b', limit=1)['tic_id'].tolist() == [1]
+
+    def test_results_are_saved_to_their_own_database_while_the_metadatabase_is_read_only(self, tmp_path):
+        metadatabase.close()
+        results_database_path = str(tmp_path.joinpath('target_inference_results.sqlite3'))
+        with patch.object(metadatabase, 'read_only', True), \
+                patch.object(target_inference_results_database, 'database', results_database_path):
+            manager = TargetInferenceResultsManager()
+            manager.save_results(self.create_results_data_frame([(1, 1, 0.2)]), 'a')
+            ranked_targets = manager.load_ranked_targets('a')
+            target_inference_results_database.close()
+        assert ranked_targets['tic_id'].tolist() == [1]
@@ -0,0 +1,79 @@
+import os
+from pathlib import Path
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from lightkurve.targetpixelfile import TargetPixelFileFactory, TessTargetPixelFile
+
+from ramjet.data_interface.tess_cut_cache import TessCutCache
+
+
+class TestTessCutCache:
+    @pytest.fixture
+    def tess_cut_cache(self, tmp_path) -> TessCutCache:
+        """
+        A fixture of an empty cutout cache in a temporary directory.
+
+        :return: The cutout cache.
+        """
+        return TessCutCache(cache_directory=tmp_path.joinpath('cache'))
+
+    @staticmethod
+    def create_download_function(flux_value: float) -> Mock:
+        """
+        Creates a stand-in download function which writes a small target pixel file to the download directory.
+
+        :param flux_value: The flux value of every pixel of the cutout.
+        :return: The download function.
+        """
+        def download(download_directory: Path) -> TessTargetPixelFile:
+            factory = TargetPixelFileFactory(n_cadences=3, n_rows=2, n_cols=2)
+            for frame_index in range(3):
+                factory.add_cadence(frameno=frame_index, flux=np.full((2, 2), flux_value))
+            path = download_directory.joinpath('tesscut', 'cutout.fits')
+            path.parent.mkdir(parents=True)
+            factory.get_tpf(hdu0_keywords={'TELESCOP': 'TESS'}).to_fits(str(path))
+            return TessTargetPixelFile(str(path))
+        return Mock(side_effect=download)
+
+    def test_cutouts_are_downloaded_once_and_then_served_from_the_cache(self, tess_cut_cache):
+        download_function = self.create_download_function(flux_value=3)
+        target_pixel_file0 = tess_cut_cache.load_target_pixel_file(1, 5, 10, download_function)
+        target_pixel_file1 = tess_cut_cache.load_target_pixel_file(1, 5, 10, download_function)
+        assert download_function.call_count == 1
+        assert np.all(target_pixel_file0.flux.value == 3)
+        assert np.all(target_pixel_file1.flux.value == 3)
+        assert [path.name for path in tess_cut_cache.cache_directory.iterdir()] == ['tic_1_sector_5_size_10.fits']
+
+    def test_cutouts_are_keyed_by_tic_id_sector_and_size(self, tess_cut_cache):
+        download_function = self.create_download_function(flux_value=3)
+        tess_cut_cache.load_target_pixel_file(1, 5, 10, download_function)
+        tess_cut_cache.load_target_pixel_file(1, 6, 10, download_function)
+        tess_cut_cache.load_target_pixel_file(1, 5, 20, download_function)
+        tess_cut_cache.load_target_pixel_file(2, 5, 10, download_function)
+        assert download_function.call_count == 4
+
+    def test_modifying_a_loaded_cutout_does_not_modify_the_cached_file(self, tess_cut_cache):
+        download_function = self.create_download_function(flux_value=3)
+        target_pixel_file = tess_cut_cache.load_target_pixel_file(1, 5, 10, download_function)
+        target_pixel_file.hdu[1].data['FLUX'][:] = 0
+        reloaded_target_pixel_file = tess_cut_cache.load_target_pixel_file(1, 5, 10, download_function)
+        assert np.all(reloaded_target_pixel_file.flux.value == 3)
+
+    def test_unavailable_cutouts_are_not_cached(self, tess_cut_cache):
+        assert tess_cut_cache.load_target_pixel_file(1, 5, 10, Mock(return_value=None)) is None
+        assert list(tess_cut_cache.cache_directory.glob('*.fits')) == []
+
+    def test_least_recently_used_cutouts_are_evicted_beyond_the_size_cap(self, tess_cut_cache):
+        download_function = self.create_download_function(flux_value=3)
+        tess_cut_cache.load_target_pixel_file(1, 5, 10, download_function)
+        tess_cut_cache.load_target_pixel_file(2, 5, 10, download_function)
+        cutout_size = tess_cut_cache.get_cutout_path(1, 5, 10).stat().st_size
+        os.utime(tess_cut_cache.get_cutout_path(1, 5, 10), (1, 1))
+        os.utime(tess_cut_cache.get_cutout_path(2, 5, 10), (2, 2))
+        tess_cut_cache.load_target_pixel_file(1, 5, 10, download_function)  # Using the cutout marks it as recent.
+        tess_cut_cache.maximum_cache_size = 2 * cutout_size
+        tess_cut_cache.load_target_pixel_file(3, 5, 10, download_function)
+        cached_names = sorted(path.name for path in tess_cut_cache.cache_directory.glob('*.fits'))
+        assert cached_names == ['tic_1_sector_5_size_10.fits', 'tic_3_sector_5_size_10.fits']
@@ -1,6 +1,8 @@
 """
 Tests for the TessDataInterface class.
 """
+import threading
+import time
 from pathlib import Path
 from typing import Any
 from unittest.mock import Mock, ANY, patch
@@ -30,6 +32,31 @@ class TestTessDataInterface:
         assert isinstance(query_result, pd.DataFrame)
         assert np.array_equal(query_result['a'].values, [1, 2])
 
+    def test_chunked_time_series_observation_queries_run_concurrently_with_bounded_workers(self,
+                                                                                           tess_data_interface):
+        in_flight_count = 0
+        maximum_in_flight_count = 0
+        lock = threading.Lock()
+
+        def stand_in_query_criteria(obs_collection, dataproduct_type, calib_level, target_name):
+            """A local stand-in for the MAST observation query endpoint."""
+            nonlocal in_flight_count, maximum_in_flight_count
+            with lock:
+                in_flight_count += 1
+                maximum_in_flight_count = max(maximum_in_flight_count, in_flight_count)
+            time.sleep(0.05)
+            with lock:
+                in_flight_count -= 1
+            return Table({'target_name': [str(tic_id) for tic_id in target_name]})
+
+        tess_data_interface.mast_input_query_chunk_size = 2
+        tess_data_interface.mast_query_worker_count = 3
+        with patch.object(ramjet.data_interface.tess_data_interface.Observations, 'query_criteria',
+                          side_effect=stand_in_query_criteria):
+            observations = tess_data_interface.get_all_tess_time_series_observations(tic_id=list(range(20)))
+        assert list(observations['target_name'].values) == [str(tic_id) for tic_id in range(20)]
+        assert maximum_in_flight_count == 3
+
     def test_new_tess_data_interface_sets_astroquery_api_limits(self):
         from astroquery.mast import Observations
         Observations.TIMEOUT = 600
@@ -266,6 +293,17 @@ class TestTessDataInterface:
         sectors = tess_data_interface.get_sectors_target_appears_in(tic_id)
         assert sorted(sectors) == [5, 7]
 
+    @patch.object(ramjet.data_interface.tess_data_interface.Observations, 'query_criteria')
+    @patch.object(ramjet.data_interface.tess_data_interface.TessLightCurveProductCatalog, 'get_sectors_for_tic_id')
+    @patch.object(ramjet.data_interface.tess_data_interface.TessLightCurveProductCatalog, 'is_available')
+    def test_sectors_target_appears_in_are_resolved_from_local_catalog_when_available(
+            self, mock_is_available, mock_get_sectors_for_tic_id, mock_query, tess_data_interface):
+        mock_is_available.return_value = True
+        mock_get_sectors_for_tic_id.return_value = [5, 7]
+        sectors = tess_data_interface.get_sectors_target_appears_in(278956474)
+        assert sectors == [5, 7]
+        assert not mock_query.called
+
     def test_can_get_tic_id_and_sector_from_human_readable_file_name(self, tess_data_interface):
         tic_id0, sector0 = tess_data_interface.get_tic_id_and_sector_from_file_path(
             'TIC 289890301 sector 15 second half')
@@ -296,3 +334,12 @@ class TestTessDataInterface:
         tic_row = tess_data_interface.get_tess_input_catalog_row(tic_id=0)
         assert tic_row['ra'] == 62.2
         assert tic_row['dec'] == -71.4
+
+    @patch.object(ramjet.data_interface.tess_data_interface.Catalogs, 'query_criteria')
+    def test_can_get_the_tic_rows_of_multiple_targets_in_a_single_query(self, mock_query_criteria,
+                                                                         tess_data_interface):
+        mock_query_criteria.return_value = Table({'ID': ['1', '2'], 'ra': [62.2, 63.2]})
+        tic_rows = tess_data_interface.get_tess_input_catalog_rows([1, 2])
+        assert mock_query_criteria.call_count == 1
+        assert mock_query_criteria.call_args.kwargs['ID'] == [1, 2]
+        assert list(tic_rows['ra']) == [62.2, 63.2]
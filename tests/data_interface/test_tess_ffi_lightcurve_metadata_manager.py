@@ -1,7 +1,10 @@
 from pathlib import Path
-from unittest.mock import patch, Mock
+from typing import List
+from unittest.mock import patch
 import pytest
+from peewee import SqliteDatabase
 
+import ramjet.data_interface.metadatabase as metadatabase_module
 import ramjet.data_interface.tess_ffi_light_curve_metadata_manager as module
 from ramjet.data_interface.tess_ffi_light_curve_metadata_manager import TessFfiLightCurveMetadataManager
 
@@ -18,11 +21,10 @@ class TestTessFfiLightCurveMetadataManager:
 
     @patch.object(module, 'dataset_split_from_uuid')
     @patch.object(module, 'metadatabase_uuid')
-    @patch.object(module, 'metadatabase')
     @patch.object(module.TessFfiLightCurve, 'get_magnitude_from_file')
-    @patch.object(module.TessFfiLightCurveMetadata, 'insert_many')
-    def test_can_insert_multiple_sql_database_rows_from_paths(self, mock_insert_many, mock_get_magnitude_from_file,
-                                                              mock_metadatabase, mock_metadatabase_uuid,
+    @patch.object(module, 'bulk_upsert')
+    def test_can_insert_multiple_sql_database_rows_from_paths(self, mock_bulk_upsert, mock_get_magnitude_from_file,
+                                                              mock_metadatabase_uuid,
                                                               mock_dataset_split_generator, metadata_manger):
         light_curve_path0 = Path('tesslcs_sector_1_104/tesslcs_tmag_7_8/tesslc_1111.pkl')
         light_curve_path1 = Path('tesslcs_sector_12_104/tesslcs_tmag_14_15/tesslc_1234567.pkl')
@@ -36,22 +38,78 @@ class TestTessFfiLightCurveMetadataManager:
             {'path': str(light_curve_path0), 'tic_id': 1111, 'sector': 1, 'dataset_split': 2, 'magnitude': 7},
             {'path': str(light_curve_path1), 'tic_id': 1234567, 'sector': 12, 'dataset_split': 3, 'magnitude': 14}
         ]
-        assert mock_insert_many.call_args[0][0] == expected_insert
-
-    @patch.object(Path, 'glob')
-    def test_can_populate_sql_dataset(self, mock_glob, metadata_manger):
-        path_list = [metadata_manger.light_curve_root_directory_path.joinpath(f'{index}.fits') for index in range(20)]
-        x = False
-        def mock_glob_side_effect(path):
-            nonlocal x
-            if not x:
-                x = True
-                return (path for path in path_list)
-            else:
-                return (path for path in [])
-
-        mock_glob.side_effect = mock_glob_side_effect
-        mock_insert = Mock()
-        metadata_manger.insert_multiple_rows_from_paths_into_database = mock_insert
+        assert mock_bulk_upsert.call_args[0][1] == expected_insert
+
+    @pytest.fixture
+    def test_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the models used by the manager.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        models = [module.TessFfiLightCurveMetadata, metadatabase_module.MetadataFileManifestEntry,
+                  metadatabase_module.MetadatabaseTableGeneration]
+        with test_database.bind_ctx(models):
+            test_database.create_tables(models)
+            with patch.object(metadatabase_module, 'metadatabase', test_database):
+                yield test_database
+
+    @staticmethod
+    def create_light_curve_files(root_directory_path: Path, relative_paths: List[Path]):
+        """
+        Creates empty light curve files.
+
+        :param root_directory_path: The root light curve directory.
+        :param relative_paths: The paths of the files relative to the root directory.
+        """
+        for relative_path in relative_paths:
+            root_directory_path.joinpath(relative_path).parent.mkdir(parents=True, exist_ok=True)
+            root_directory_path.joinpath(relative_path).touch()
+
+    def test_can_populate_sql_dataset(self, metadata_manger, test_database, tmp_path):
+        metadata_manger.light_curve_root_directory_path = tmp_path
+        metadata_manger.number_of_processes = 2
+        relative_paths = [Path('tesslcs_sector_1_104/tesslcs_tmag_7_8/tesslc_1111.pkl'),
+                          Path('tesslcs_sector_1_104/tesslcs_tmag_7_8/tesslc_2222.pkl'),
+                          Path('tesslcs_sector_12_104/tesslcs_tmag_14_15/tesslc_1234567.pkl')]
+        self.create_light_curve_files(tmp_path, relative_paths)
+        tmp_path.joinpath('tesslcs_sector_1_104/tesslcs_tmag_7_8/not_a_light_curve.txt').touch()
         metadata_manger.populate_sql_database()
-        assert mock_insert.call_args[0][0] == path_list
+        rows = list(module.TessFfiLightCurveMetadata.select().dicts())
+        assert sorted(row['path'] for row in rows) == sorted(map(str, relative_paths))
+        assert sorted(row['tic_id'] for row in rows) == [1111, 2222, 1234567]
+
+    def test_incremental_build_only_inserts_new_files_and_removes_vanished_files(self, metadata_manger,
+                                                                                 test_database, tmp_path):
+        metadata_manger.light_curve_root_directory_path = tmp_path
+        metadata_manger.number_of_processes = 2
+        self.create_light_curve_files(tmp_path, [Path('tesslcs_sector_1_104/tesslcs_tmag_7_8/tesslc_1111.pkl'),
+                                                 Path('tesslcs_sector_1_104/tesslcs_tmag_7_8/tesslc_2222.pkl')])
+        metadata_manger.build_table()
+        # Mark an existing row to check it is not rewritten by the incremental build.
+        module.TessFfiLightCurveMetadata.update(magnitude=-1).where(
+            module.TessFfiLightCurveMetadata.tic_id == 1111).execute()
+        tmp_path.joinpath('tesslcs_sector_1_104/tesslcs_tmag_7_8/tesslc_2222.pkl').unlink()
+        self.create_light_curve_files(tmp_path, [Path('tesslcs_sector_2_104/tesslcs_tmag_9_10/tesslc_3333.pkl')])
+        metadata_manger.build_table(incremental=True)
+        rows = list(module.TessFfiLightCurveMetadata.select().order_by(module.TessFfiLightCurveMetadata.tic_id
+                                                                       ).dicts())
+        assert [row['tic_id'] for row in rows] == [1111, 3333]
+        assert rows[0]['magnitude'] == -1
+        assert rows[1]['magnitude'] == 9
+
+    @pytest.mark.parametrize('rerandomize', [False, True])
+    def test_incremental_build_only_rerandomizes_the_random_order_when_requested(self, metadata_manger, test_database,
+                                                                                  tmp_path, rerandomize):
+        metadata_manger.light_curve_root_directory_path = tmp_path
+        metadata_manger.number_of_processes = 2
+        self.create_light_curve_files(tmp_path, [Path('tesslcs_sector_1_104/tesslcs_tmag_7_8/tesslc_1111.pkl')])
+        metadata_manger.build_table()
+        module.TessFfiLightCurveMetadata.update(random_order=7).execute()
+        self.create_light_curve_files(tmp_path, [Path('tesslcs_sector_2_104/tesslcs_tmag_9_10/tesslc_3333.pkl')])
+        metadata_manger.build_table(incremental=True, rerandomize=rerandomize)
+        random_orders = [row.random_order for row in
+                         module.TessFfiLightCurveMetadata.select().order_by(module.TessFfiLightCurveMetadata.tic_id)]
+        assert (random_orders[0] == 7) != rerandomize
+        assert random_orders[1] != 7
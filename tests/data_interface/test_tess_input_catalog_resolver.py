@@ -0,0 +1,106 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+from peewee import SqliteDatabase
+
+import ramjet.data_interface.tess_input_catalog_resolver as module
+from ramjet.data_interface.response_cache import ResponseCache
+from ramjet.data_interface.tess_input_catalog_resolver import TessInputCatalogResolver, TessInputCatalogEntry
+
+
+class TestTessInputCatalogResolver:
+    @pytest.fixture
+    def test_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the TIC model.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([TessInputCatalogEntry]):
+            yield test_database
+
+    @pytest.fixture
+    def test_response_cache(self, tmp_path) -> ResponseCache:
+        """
+        A fixture of an empty response cache in a temporary directory.
+
+        :return: The response cache.
+        """
+        test_response_cache = ResponseCache(cache_directory=tmp_path)
+        with patch.object(module, 'response_cache', test_response_cache):
+            yield test_response_cache
+
+    @pytest.fixture
+    def resolver(self, test_response_cache) -> TessInputCatalogResolver:
+        """
+        A fixture of the resolver under test, with MAST and Gaia queries replaced by stand-ins.
+
+        :return: The resolver.
+        """
+        mast_tic_rows = pd.DataFrame({'ID': ['1', '2', '3'], 'ra': [10.0, 20.0, 30.0], 'dec': [-1.0, -2.0, -3.0],
+                                      'rad': [1.5, np.nan, np.nan], 'mass': [1.0, 2.0, 3.0],
+                                      'Tmag': [9.0, 10.0, 11.0], 'contratio': [0.1, 0.2, np.nan],
+                                      'GAIA': ['100', '200', None], 'Teff': [5000.0, 6000.0, 7000.0]})
+
+        def get_tess_input_catalog_rows(tic_ids):
+            return mast_tic_rows[mast_tic_rows['ID'].astype(int).isin(tic_ids)]
+
+        resolver = TessInputCatalogResolver()
+        resolver.tic_query_chunk_size = 2
+        with patch.object(resolver.tess_data_interface, 'get_tess_input_catalog_rows',
+                          side_effect=get_tess_input_catalog_rows):
+            with patch.object(resolver, 'query_gaia_radii', return_value={200: 4.5}):
+                yield resolver
+
+    def test_tic_rows_are_retrieved_in_chunked_queries(self, test_database, resolver):
+        tic_rows = resolver.resolve_tic_rows([1, 2, 3])
+        assert resolver.tess_data_interface.get_tess_input_catalog_rows.call_count == 2
+        assert sorted(tic_rows.index) == [1, 2, 3]
+        assert tic_rows.loc[2, 'Tmag'] == 10.0
+        assert tic_rows.loc[1, 'ra'] == 10.0
+
+    def test_gaia_radii_are_retrieved_in_a_single_query_for_targets_without_tic_radii(self, test_database,
+                                                                                       resolver):
+        tic_rows = resolver.resolve_tic_rows([1, 2, 3])
+        resolver.query_gaia_radii.assert_called_once_with([200])
+        assert tic_rows.loc[2, 'gaia_radius'] == 4.5
+        assert np.isnan(tic_rows.loc[1, 'gaia_radius'])
+        assert np.isnan(tic_rows.loc[3, 'gaia_radius'])
+
+    def test_resolved_tic_rows_are_served_from_the_local_table(self, test_database, resolver):
+        retrieved_tic_rows = resolver.resolve_tic_rows([1, 2, 3])
+        resolver.tess_data_interface.get_tess_input_catalog_rows.reset_mock()
+        resolver.query_gaia_radii.reset_mock()
+        local_tic_rows = resolver.resolve_tic_rows([3, 2, 1])
+        assert not resolver.tess_data_interface.get_tess_input_catalog_rows.called
+        assert not resolver.query_gaia_radii.called
+        columns = ['ra', 'dec', 'rad', 'mass', 'Tmag', 'contratio', 'gaia_radius']
+        pd.testing.assert_frame_equal(local_tic_rows.loc[[1, 2, 3], columns], retrieved_tic_rows.loc[[1, 2, 3], columns])
+        assert int(local_tic_rows.loc[2, 'GAIA']) == 200
+        assert TessInputCatalogEntry.select().count() == 3
+
+    def test_only_unresolved_tic_ids_are_retrieved(self, test_database, resolver):
+        resolver.resolve_tic_rows([1])
+        resolver.tess_data_interface.get_tess_input_catalog_rows.reset_mock()
+        resolver.resolve_tic_rows([1, 2])
+        resolver.tess_data_interface.get_tess_input_catalog_rows.assert_called_once_with([2])
+
+    def test_resolved_tic_rows_are_not_stored_from_a_read_only_connection(self, test_database, resolver):
+        test_database.read_only = True
+        resolver.resolve_tic_rows([1, 2])
+        assert not TessInputCatalogEntry.table_exists()
+
+    def test_gaia_radii_are_served_from_the_response_cache(self, test_database, resolver, test_response_cache):
+        assert resolver.retrieve_gaia_radii([200]) == {200: 4.5}
+        assert resolver.retrieve_gaia_radii([200]) == {200: 4.5}
+        resolver.query_gaia_radii.assert_called_once_with([200])
+        assert test_response_cache.load(module.ResponseCacheSource.GAIA, 200) == 4.5
+
+    def test_tic_ids_not_in_the_tic_have_no_row(self, test_database, resolver):
+        tic_rows = resolver.resolve_tic_rows([1, 4])
+        assert list(tic_rows.index) == [1]
+        assert resolver.get_tic_row(4) is None
+        assert resolver.get_tic_row(1)['mass'] == 1.0
@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+from peewee import SqliteDatabase
+
+import ramjet.data_interface.tess_light_curve_product_catalog_manager as manager_module
+from ramjet.data_interface.metadatabase import MetadatabaseTableGeneration
+from ramjet.data_interface.tess_light_curve_product_catalog import TessLightCurveProductCatalog, \
+    TessLightCurveProductCatalogEntry
+from ramjet.data_interface.tess_light_curve_product_catalog_manager import TessLightCurveProductCatalogManager
+
+
+class TestTessLightCurveProductCatalog:
+    @pytest.fixture
+    def test_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the catalog model.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([TessLightCurveProductCatalogEntry, MetadatabaseTableGeneration]):
+            with patch.object(manager_module, 'metadatabase', test_database):
+                yield test_database
+
+    @pytest.fixture
+    def mast_data_products(self) -> pd.DataFrame:
+        """
+        A fixture of a MAST product list with light curve and non-light curve products.
+
+        :return: The product list.
+        """
+        return pd.DataFrame({
+            'obs_id': ['tess2019006130736-s0007-0000000278956474-0131-s',
+                       'tess2018319095959-s0005-0000000278956474-0125-s',
+                       'tess2018319095959-s0005-0000000278956474-0125-s',
+                       'tess2018319095959-s0005-0000000000000011-0125-s'],
+            'dataURI': ['mast:TESS/product/tess2019006130736-s0007-0000000278956474-0131-s_lc.fits',
+                        'mast:TESS/product/tess2018319095959-s0005-0000000278956474-0125-s_lc.fits',
+                        'mast:TESS/product/tess2018319095959-s0005-0000000278956474-0125-s_tp.fits',
+                        'mast:TESS/product/tess2018319095959-s0005-0000000000000011-0125-s_lc.fits'],
+            'productFilename': ['tess2019006130736-s0007-0000000278956474-0131-s_lc.fits',
+                                'tess2018319095959-s0005-0000000278956474-0125-s_lc.fits',
+                                'tess2018319095959-s0005-0000000278956474-0125-s_tp.fits',
+                                'tess2018319095959-s0005-0000000000000011-0125-s_lc.fits'],
+            'size': [100, 200, 300, 400]})
+
+    def test_catalog_is_unavailable_before_the_table_is_built(self, test_database):
+        assert not TessLightCurveProductCatalog.is_available()
+
+    def test_building_the_table_keeps_only_light_curve_products(self, test_database, mast_data_products):
+        manager = TessLightCurveProductCatalogManager()
+        with patch.object(manager.tess_data_interface, 'get_all_two_minute_single_sector_observations'), \
+                patch.object(manager.tess_data_interface, 'get_product_list', return_value=mast_data_products):
+            manager.build_table()
+        assert TessLightCurveProductCatalog.is_available()
+        rows = list(TessLightCurveProductCatalogEntry.select(
+            TessLightCurveProductCatalogEntry.tic_id, TessLightCurveProductCatalogEntry.sector,
+            TessLightCurveProductCatalogEntry.size).order_by(TessLightCurveProductCatalogEntry.size).tuples())
+        assert rows == [(278956474, 7, 100), (278956474, 5, 200), (11, 5, 400)]
+
+    def test_can_resolve_light_curve_products_for_targets(self, test_database, mast_data_products):
+        test_database.create_tables([TessLightCurveProductCatalogEntry])
+        rows = TessLightCurveProductCatalogManager().create_row_data_frame(mast_data_products)
+        TessLightCurveProductCatalogEntry.insert_many(rows.to_dict('records')).execute()
+        data_products = TessLightCurveProductCatalog.get_light_curve_data_products([278956474, 12])
+        assert list(data_products['sector']) == [5, 7]
+        assert list(data_products['size']) == [200, 100]
+        assert data_products['productFilename'].iloc[0] == 'tess2018319095959-s0005-0000000278956474-0125-s_lc.fits'
+        sector_data_products = TessLightCurveProductCatalog.get_light_curve_data_products([278956474, 11],
+                                                                                          sectors=[5])
+        assert list(sector_data_products['tic_id']) == [11, 278956474]
+        assert TessLightCurveProductCatalog.get_sectors_for_tic_id(278956474) == [5, 7]
+        assert TessLightCurveProductCatalog.get_sectors_for_tic_id(12) == []
@@ -5,6 +5,7 @@ import numpy as np
 import pandas as pd
 
 import ramjet.data_interface.tess_toi_data_interface as module
+from ramjet.data_interface.response_cache import ResponseCache
 from ramjet.data_interface.tess_toi_data_interface import TessToiDataInterface
 
 
@@ -18,6 +19,17 @@ class TestTessToiDataInterface:
         """
         return TessToiDataInterface()
 
+    @pytest.fixture
+    def test_response_cache(self, tmp_path) -> ResponseCache:
+        """
+        A fixture of an empty response cache in a temporary directory.
+
+        :return: The response cache.
+        """
+        test_response_cache = ResponseCache(cache_directory=tmp_path)
+        with patch.object(module, 'response_cache', test_response_cache):
+            yield test_response_cache
+
     @pytest.mark.slow
     @pytest.mark.external
     def test_can_retrieve_the_tess_toi_dispositions(self, data_interface):
@@ -42,8 +54,9 @@ class TestTessToiDataInterface:
         dispositions2 = data_interface.retrieve_exofop_toi_and_ctoi_planet_disposition_for_tic_id(tic_id=25132999)
         assert dispositions2.shape[0] == 0
 
-    def test_toi_file_is_not_updated_from_exofop_until_first_toi_table_access(self):
+    def test_toi_file_is_not_updated_from_exofop_until_first_toi_table_access(self, test_response_cache):
         with patch.object(module.requests, 'get') as mock_get:
+            mock_get.return_value.content = b'TIC ID'
             data_interface = TessToiDataInterface()
             data_interface.toi_dispositions_path = MagicMock()
             data_interface.load_toi_dispositions_in_project_format = Mock()
@@ -51,8 +64,9 @@ class TestTessToiDataInterface:
             _ = data_interface.toi_dispositions
             assert mock_get.called
 
-    def test_ctoi_file_is_not_updated_from_exofop_until_first_ctoi_table_access(self):
+    def test_ctoi_file_is_not_updated_from_exofop_until_first_ctoi_table_access(self, test_response_cache):
         with patch.object(module.requests, 'get') as mock_get:
+            mock_get.return_value.content = b'TIC ID'
             data_interface = TessToiDataInterface()
             data_interface.ctoi_dispositions_path = MagicMock()
             data_interface.load_ctoi_dispositions_in_project_format = Mock()
@@ -60,3 +74,69 @@ class TestTessToiDataInterface:
             _ = data_interface.ctoi_dispositions
             assert mock_get.called
 
+    def test_toi_table_access_is_served_from_the_response_cache(self, test_response_cache):
+        with patch.object(module.requests, 'get') as mock_get:
+            mock_get.return_value.content = b'TIC ID'
+            for _ in range(2):
+                data_interface = TessToiDataInterface()
+                data_interface.toi_dispositions_path = MagicMock()
+                data_interface.load_toi_dispositions_in_project_format = Mock()
+                _ = data_interface.toi_dispositions
+            assert mock_get.call_count == 1
+
+    def test_explicit_toi_file_updates_bypass_the_response_cache(self, test_response_cache):
+        with patch.object(module.requests, 'get') as mock_get:
+            data_interface = TessToiDataInterface()
+            data_interface.toi_dispositions_path = MagicMock()
+            mock_get.return_value.content = b'TIC ID'
+            data_interface.update_toi_dispositions_file()
+            mock_get.return_value.content = b'TIC ID,Disposition'
+            data_interface.update_toi_dispositions_file()
+            assert mock_get.call_count == 2
+            assert test_response_cache.load(module.ResponseCacheSource.EXOFOP_DISPOSITIONS,
+                                            mock_get.call_args[0][0]) == b'TIC ID,Disposition'
+
+    def test_unsuccessful_exofop_responses_are_not_cached(self, test_response_cache):
+        with patch.object(module.requests, 'get') as mock_get:
+            data_interface = TessToiDataInterface()
+            data_interface.toi_dispositions_path = MagicMock()
+            mock_get.return_value.status_code = 500
+            mock_get.return_value.content = b'Internal Server Error'
+            mock_get.return_value.raise_for_status.side_effect = module.requests.exceptions.HTTPError('500')
+            with pytest.raises(module.requests.exceptions.HTTPError):
+                data_interface.update_toi_dispositions_file()
+            assert test_response_cache.load(module.ResponseCacheSource.EXOFOP_DISPOSITIONS,
+                                            mock_get.call_args[0][0]) is None
+            assert not data_interface.toi_dispositions_path.open.called
+
+    @pytest.fixture
+    def stub_dispositions_data_interface(self, data_interface) -> TessToiDataInterface:
+        """
+        A fixture of the data interface with stand-in TOI and CTOI dispositions.
+
+        :return: The data interface.
+        """
+        data_interface.toi_dispositions_ = pd.DataFrame({'TIC ID': [3, 1, 3], 'Disposition': ['PC', 'KP', 'FP'],
+                                                         'Sector': [1, 2, 3]})
+        data_interface.ctoi_dispositions_ = pd.DataFrame({'TIC ID': [2, 3], 'Disposition': ['', 'CP']})
+        return data_interface
+
+    def test_can_retrieve_the_dispositions_of_a_tic_id_from_the_combined_index(self, stub_dispositions_data_interface):
+        dispositions = stub_dispositions_data_interface.retrieve_exofop_toi_and_ctoi_planet_disposition_for_tic_id(3)
+        assert list(dispositions['Disposition']) == ['PC', 'FP', 'CP']
+        assert list(dispositions['TIC ID']) == [3, 3, 3]
+        no_dispositions = stub_dispositions_data_interface.retrieve_exofop_toi_and_ctoi_planet_disposition_for_tic_id(4)
+        assert no_dispositions.shape[0] == 0
+        assert 'Disposition' in no_dispositions.columns
+
+    def test_can_check_whether_single_tic_ids_have_dispositions(self, stub_dispositions_data_interface):
+        assert stub_dispositions_data_interface.has_any_exofop_dispositions_for_tic_id(2)
+        assert not stub_dispositions_data_interface.has_any_exofop_dispositions_for_tic_id(4)
+
+    def test_can_check_whether_many_tic_ids_have_dispositions_at_once(self, stub_dispositions_data_interface):
+        has_dispositions = stub_dispositions_data_interface.has_any_exofop_dispositions_for_tic_ids([4, 1, 2, 5, 3])
+        assert list(has_dispositions) == [False, True, True, False, True]
+        data_frame = pd.DataFrame({'tic_id': [1, 4], 'confidence': [0.9, 0.8]})
+        annotated_data_frame = stub_dispositions_data_interface.add_has_exofop_dispositions_column(data_frame)
+        assert list(annotated_data_frame['has_exofop_dispositions']) == [True, False]
+        assert list(annotated_data_frame['confidence']) == [0.9, 0.8]
@@ -1,16 +1,29 @@
 import pandas as pd
-from unittest.mock import patch, Mock, PropertyMock
+import pytest
+from unittest.mock import patch, PropertyMock
+from peewee import SqliteDatabase
 
 import ramjet.data_interface.tess_transit_metadata_manager as module
-from ramjet.data_interface.tess_transit_metadata_manager import TessTransitMetadataManager, Disposition
+from ramjet.data_interface.tess_transit_metadata_manager import TessTransitMetadataManager, Disposition, \
+    TessTransitMetadata
 from ramjet.data_interface.tess_toi_data_interface import ToiColumns
+from ramjet.data_interface.metadatabase import MetadatabaseTableGeneration
 
 
 class TestTessTransitMetadata:
-    @patch.object(module, 'metadatabase')
-    @patch.object(module, 'TessTransitMetadata')
-    def test_table_building_creates_rows_based_on_toi_dispositions(self, mock_tess_target_transit_disposition,
-                                                                   mock_metadatabase):
+    @pytest.fixture
+    def test_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the transit metadata model.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([TessTransitMetadata, MetadatabaseTableGeneration]):
+            with patch.object(module, 'metadatabase', test_database):
+                yield test_database
+
+    def test_table_building_creates_rows_based_on_toi_dispositions(self, test_database):
         tess_transit_disposition_metadata_manager = TessTransitMetadataManager()
         toi_dispositions = pd.DataFrame({ToiColumns.tic_id.value: [1, 2, 3],
                                          ToiColumns.disposition.value: ['KP', '', 'FP']})
@@ -23,8 +36,16 @@ class TestTessTransitMetadata:
                 mock_toi_dispositions.return_value = toi_dispositions
                 mock_ctoi_dispositions.return_value = ctoi_dispositions
                 tess_transit_disposition_metadata_manager.build_table()
-        call_args_list = mock_tess_target_transit_disposition.call_args_list
-        assert len(call_args_list) == 3
-        assert call_args_list[0][1] == {'tic_id': 1, 'disposition': Disposition.CONFIRMED.value}
-        assert call_args_list[1][1] == {'tic_id': 2, 'disposition': Disposition.CANDIDATE.value}
-        assert call_args_list[2][1] == {'tic_id': 3, 'disposition': Disposition.FALSE_POSITIVE.value}
+        rows = list(TessTransitMetadata.select().order_by(TessTransitMetadata.tic_id).dicts())
+        assert len(rows) == 3
+        assert rows[0] == {'tic_id': 1, 'disposition': Disposition.CONFIRMED.value}
+        assert rows[1] == {'tic_id': 2, 'disposition': Disposition.CANDIDATE.value}
+        assert rows[2] == {'tic_id': 3, 'disposition': Disposition.FALSE_POSITIVE.value}
+
+    def test_adding_confirmed_tic_ids_keeps_existing_dispositions(self, test_database):
+        test_database.create_tables([TessTransitMetadata])
+        TessTransitMetadata.insert_many([{'tic_id': 1, 'disposition': Disposition.FALSE_POSITIVE.value}]).execute()
+        TessTransitMetadataManager.add_tic_ids_as_confirmed([1, 2, 3])
+        rows = list(TessTransitMetadata.select().order_by(TessTransitMetadata.tic_id).tuples())
+        assert rows == [(1, Disposition.FALSE_POSITIVE.value), (2, Disposition.CONFIRMED.value),
+                        (3, Disposition.CONFIRMED.value)]
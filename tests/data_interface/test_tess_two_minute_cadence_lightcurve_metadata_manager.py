@@ -1,8 +1,12 @@
+import shutil
+
 import pytest
 from pathlib import Path
-from unittest.mock import patch, Mock
+from unittest.mock import patch
+from peewee import SqliteDatabase
 
 from ramjet.data_interface.tess_two_minute_cadence_light_curve_metadata_manager import TessTwoMinuteCadenceLightCurveMetadataManger
+import ramjet.data_interface.metadatabase as metadatabase_module
 import ramjet.data_interface.tess_two_minute_cadence_light_curve_metadata_manager as module
 
 
@@ -16,10 +20,8 @@ class TestTessTwoMinuteCadenceLightCurveMetadataManger:
         """
         return TessTwoMinuteCadenceLightCurveMetadataManger()
 
-    @patch.object(module, 'metadatabase')
-    @patch.object(module.TessTwoMinuteCadenceLightCurveMetadata, 'insert_many')
-    def test_can_insert_multiple_sql_database_rows_from_paths(self, mock_insert_many, mock_metadatabase,
-                                                              metadata_manger):
+    @patch.object(module, 'bulk_upsert')
+    def test_can_insert_multiple_sql_database_rows_from_paths(self, mock_bulk_upsert, metadata_manger):
         light_curve_path0 = Path('light_curves/tess2019169103026-s0013-0000000382068171-0146-s_lc.fits')
         light_curve_path1 = Path('light_curves/tess2019112060037-s0011-0000000280909647-0143-s_lc.fits')
         uuid0 = 'mock-uuid-output0'
@@ -32,13 +34,46 @@ class TestTessTwoMinuteCadenceLightCurveMetadataManger:
                     light_curve_paths=[light_curve_path0, light_curve_path1])
         expected_insert = [{'path': str(light_curve_path0), 'tic_id': 382068171, 'sector': 13, 'dataset_split': 2},
                            {'path': str(light_curve_path1), 'tic_id': 280909647, 'sector': 11, 'dataset_split': 3}]
-        assert mock_insert_many.call_args[0][0] == expected_insert
-
-    @patch.object(Path, 'glob')
-    def test_can_populate_sql_dataset(self, mock_glob, metadata_manger):
-        path_list = [metadata_manger.light_curve_root_directory_path.joinpath(f'{index}.fits') for index in range(20)]
-        mock_glob.return_value = path_list
-        mock_insert = Mock()
-        metadata_manger.insert_multiple_rows_from_paths_into_database = mock_insert
+        assert mock_bulk_upsert.call_args[0][1] == expected_insert
+
+    @pytest.fixture
+    def test_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the models used by the manager.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        models = [module.TessTwoMinuteCadenceLightCurveMetadata, metadatabase_module.MetadataFileManifestEntry,
+                  metadatabase_module.MetadatabaseTableGeneration]
+        with test_database.bind_ctx(models):
+            test_database.create_tables(models)
+            with patch.object(metadatabase_module, 'metadatabase', test_database):
+                yield test_database
+
+    def test_can_populate_sql_dataset(self, metadata_manger, test_database, tmp_path):
+        metadata_manger.light_curve_root_directory_path = tmp_path
+        metadata_manger.number_of_processes = 2
+        relative_paths = [Path('tess2019169103026-s0013-0000000382068171-0146-s_lc.fits'),
+                          Path('sector_11/tess2019112060037-s0011-0000000280909647-0143-s_lc.fits'),
+                          Path('sector_11/nested/tess2019112060037-s0011-0000000280909648-0143-s_lc.fits')]
+        for relative_path in relative_paths:
+            tmp_path.joinpath(relative_path).parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.joinpath(relative_path).touch()
         metadata_manger.populate_sql_database()
-        assert mock_insert.call_args[0][0] == [Path(f'{index}.fits') for index in range(20)]
+        rows = list(module.TessTwoMinuteCadenceLightCurveMetadata.select().dicts())
+        assert sorted(row['path'] for row in rows) == sorted(map(str, relative_paths))
+
+    def test_incremental_build_removes_rows_of_vanished_directories(self, metadata_manger, test_database, tmp_path):
+        metadata_manger.light_curve_root_directory_path = tmp_path
+        metadata_manger.number_of_processes = 2
+        relative_paths = [Path('tess2019169103026-s0013-0000000382068171-0146-s_lc.fits'),
+                          Path('sector_11/tess2019112060037-s0011-0000000280909647-0143-s_lc.fits')]
+        for relative_path in relative_paths:
+            tmp_path.joinpath(relative_path).parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.joinpath(relative_path).touch()
+        metadata_manger.build_table()
+        shutil.rmtree(tmp_path.joinpath('sector_11'))
+        metadata_manger.build_table(incremental=True)
+        rows = list(module.TessTwoMinuteCadenceLightCurveMetadata.select().dicts())
+        assert [row['path'] for row in rows] == [str(relative_paths[0])]
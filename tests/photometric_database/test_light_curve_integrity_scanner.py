@@ -0,0 +1,43 @@
+import pickle
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import ramjet.photometric_database.light_curve_integrity_scanner as module
+from ramjet.photometric_database.light_curve_collection import LightCurveCollection
+from ramjet.photometric_database.light_curve_integrity_scanner import LightCurveIntegrityScanner, \
+    verify_light_curve_path
+
+
+class StubLightCurveCollection(LightCurveCollection):
+    """A light curve collection whose paths ending in `bad` fail to load and `empty` load no data."""
+    def get_paths(self):
+        return [Path('good0'), Path('bad'), Path('good1'), Path('empty')]
+
+    def load_times_and_fluxes_from_path(self, path: Path) -> (np.ndarray, np.ndarray):
+        if path.name == 'bad':
+            raise pickle.UnpicklingError('invalid load key')
+        if path.name == 'empty':
+            return np.array([]), np.array([])
+        return np.array([1.0, 2.0]), np.array([3.0, 4.0])
+
+
+class TestLightCurveIntegrityScanner:
+    def test_verification_reports_load_errors_and_empty_light_curves(self):
+        collection = StubLightCurveCollection()
+        assert verify_light_curve_path(collection, 'good0') == ('good0', None)
+        assert verify_light_curve_path(collection, 'bad') == ('bad', 'UnpicklingError: invalid load key')
+        assert verify_light_curve_path(collection, 'empty')[1] is not None
+
+    @pytest.mark.slow
+    def test_scanning_quarantines_failed_paths_and_releases_passing_paths(self):
+        scanner = LightCurveIntegrityScanner(number_of_processes=2)
+        with patch.object(module.LightCurveQuarantine, 'load_quarantined_paths', return_value={'good1', 'other'}), \
+                patch.object(module.LightCurveQuarantine, 'quarantine_paths') as mock_quarantine_paths, \
+                patch.object(module.LightCurveQuarantine, 'release_paths') as mock_release_paths:
+            failed_paths = scanner.scan_collection(StubLightCurveCollection())
+        assert failed_paths == ['bad', 'empty']
+        assert set(mock_quarantine_paths.call_args[0][0].keys()) == {'bad', 'empty'}
+        assert mock_release_paths.call_args[0][0] == ['good1']
@@ -1,7 +1,30 @@
+from pathlib import Path
+from unittest.mock import Mock, patch
+
 import pytest
+from peewee import SqliteDatabase, CharField, IntegerField
 
+import ramjet.photometric_database.sql_metadata_light_curve_collection as module
+from ramjet.data_interface.metadatabase import MetadatabaseModel, MetadatabaseTableGeneration, bump_table_generation
 from ramjet.photometric_database.light_curve_collection import LightCurveCollectionMethodNotImplementedError
-from ramjet.photometric_database.sql_metadata_light_curve_collection import SqlMetadataLightCurveCollection
+from ramjet.photometric_database.sql_metadata_light_curve_collection import SqlMetadataLightCurveCollection, \
+    PathSnapshotOrder
+
+
+class RandomOrderMetadata(MetadatabaseModel):
+    """
+    A model to test the random order pagination with.
+    """
+    path = CharField(unique=True)
+    random_order = IntegerField(index=True)
+
+
+class IdListMetadata(MetadatabaseModel):
+    """
+    A model to test the ID list filtering with.
+    """
+    tic_id = IntegerField(index=True)
+    path = CharField(unique=True)
 
 
 class TestSqlMetadataLightCurveCollection:
@@ -17,3 +40,158 @@ class TestSqlMetadataLightCurveCollection:
     def test_get_sql_query_throws_error_when_called_without_implementing(self, collection):
         with pytest.raises(LightCurveCollectionMethodNotImplementedError):
             _ = collection.get_sql_query()
+
+    @pytest.fixture
+    def collection_with_mock_query(self, collection) -> SqlMetadataLightCurveCollection:
+        """
+        Creates an instance of the class under test with a mocked query of three models.
+
+        :return: An instance of the class under test.
+        """
+        models = [Mock(path=f'{index}.pkl', tic_id=index) for index in range(3)]
+        mock_query = Mock()
+        mock_query.objects.return_value.iterator.side_effect = lambda: iter(models)
+        collection.get_sql_query = Mock(return_value=mock_query)
+        collection.get_path_from_model = lambda model: Path('root').joinpath(model.path)
+        collection.use_query_result_cache = False
+        return collection
+
+    def test_get_paths_only_runs_the_sql_query_once_when_using_a_snapshot(self, collection_with_mock_query):
+        paths0 = list(collection_with_mock_query.get_paths())
+        paths1 = list(collection_with_mock_query.get_paths())
+        assert paths0 == [Path('root/0.pkl'), Path('root/1.pkl'), Path('root/2.pkl')]
+        assert paths1 == paths0
+        assert collection_with_mock_query.get_sql_query.call_count == 1
+
+    def test_get_paths_runs_the_sql_query_each_pass_when_not_using_a_snapshot(self, collection_with_mock_query):
+        collection_with_mock_query.use_path_snapshot = False
+        _ = list(collection_with_mock_query.get_paths())
+        _ = list(collection_with_mock_query.get_paths())
+        assert collection_with_mock_query.get_sql_query.call_count == 2
+
+    def test_random_start_snapshot_order_keeps_the_cyclic_query_order(self, collection_with_mock_query):
+        collection_with_mock_query.path_snapshot_order = PathSnapshotOrder.RANDOM_START
+        with patch.object(module.np.random, 'randint') as mock_randint:
+            mock_randint.return_value = 2
+            paths = list(collection_with_mock_query.get_paths())
+        assert paths == [Path('root/2.pkl'), Path('root/0.pkl'), Path('root/1.pkl')]
+
+    def test_shuffle_snapshot_order_includes_all_paths(self, collection_with_mock_query):
+        collection_with_mock_query.path_snapshot_order = PathSnapshotOrder.SHUFFLE
+        paths = list(collection_with_mock_query.get_paths())
+        assert sorted(paths) == [Path('root/0.pkl'), Path('root/1.pkl'), Path('root/2.pkl')]
+
+    def test_can_load_additional_snapshot_fields_for_a_path(self, collection_with_mock_query):
+        collection_with_mock_query.path_snapshot_field_names = ['tic_id']
+        tic_id = collection_with_mock_query.load_path_snapshot_field_for_path('tic_id', Path('root/1.pkl'))
+        assert tic_id == 1
+
+    def test_path_snapshot_is_not_pickled(self, collection_with_mock_query):
+        collection_with_mock_query.create_path_snapshot()
+        state = collection_with_mock_query.__getstate__()
+        assert state['path_snapshot'] is None
+        assert collection_with_mock_query.path_snapshot is not None
+
+    @pytest.fixture
+    def collection_with_random_order_table(self, collection) -> SqlMetadataLightCurveCollection:
+        """
+        Creates an instance of the class under test backed by an in-memory table with tied random order values.
+
+        :return: An instance of the class under test.
+        """
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([RandomOrderMetadata]):
+            test_database.create_tables([RandomOrderMetadata])
+            RandomOrderMetadata.insert_many([{'path': f'{index}.pkl', 'random_order': index // 3}
+                                             for index in range(20)]).execute()
+            collection.get_sql_query = lambda: RandomOrderMetadata.select(RandomOrderMetadata.path)
+            collection.get_random_order_field = lambda: RandomOrderMetadata.random_order
+            collection.get_path_from_model = lambda model: Path(model.path)
+            collection.use_random_order_pagination = True
+            collection.random_order_page_size = 2
+            yield collection
+
+    def test_random_order_pagination_starts_at_a_random_value_and_loops_to_the_minimum(
+            self, collection_with_random_order_table):
+        with patch.object(module, 'create_random_order_value') as mock_create_random_order_value:
+            mock_create_random_order_value.return_value = 4
+            paths = list(collection_with_random_order_table.get_paths())
+        expected_indexes = list(range(12, 20)) + list(range(12))
+        assert paths == [Path(f'{index}.pkl') for index in expected_indexes]
+
+    def test_random_order_pagination_includes_rows_tied_across_page_boundaries(
+            self, collection_with_random_order_table):
+        for page_size in [1, 2, 3, 4, 100]:
+            collection_with_random_order_table.random_order_page_size = page_size
+            paths = list(collection_with_random_order_table.get_paths())
+            assert sorted(paths) == sorted(Path(f'{index}.pkl') for index in range(20))
+
+    def test_random_order_pagination_pages_through_rows_which_all_share_one_value(
+            self, collection_with_random_order_table):
+        RandomOrderMetadata.update(random_order=-2 ** 63).execute()
+        for page_size in [1, 3, 100]:
+            collection_with_random_order_table.random_order_page_size = page_size
+            paths = list(collection_with_random_order_table.get_paths())
+            assert paths == [Path(f'{index}.pkl') for index in range(20)]
+
+    def test_join_id_list_table_filters_to_a_large_id_list_and_only_loads_the_list_once(self):
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([IdListMetadata]):
+            test_database.create_tables([IdListMetadata])
+            IdListMetadata.insert_many([{'tic_id': tic_id, 'path': f'{tic_id}.pkl'} for tic_id in range(0, 1000, 3)]
+                                       ).execute()
+            ids = list(range(0, 200000, 2))
+            for _ in range(2):
+                query = SqlMetadataLightCurveCollection.join_id_list_table(
+                    IdListMetadata.select(IdListMetadata.path), IdListMetadata.tic_id, ids)
+                paths = sorted(path for (path,) in query.tuples())
+                assert paths == sorted(f'{tic_id}.pkl' for tic_id in range(0, 1000, 6))
+            temporary_table_count = test_database.execute_sql(
+                "SELECT COUNT(*) FROM sqlite_temp_master WHERE type = 'table'").fetchone()[0]
+            assert temporary_table_count == 1
+
+    @pytest.fixture
+    def id_list_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the ID list test model and the table generation model, with an empty query
+        result cache.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        models = [IdListMetadata, MetadatabaseTableGeneration]
+        with test_database.bind_ctx(models):
+            test_database.create_tables(models)
+            IdListMetadata.insert_many([{'tic_id': tic_id, 'path': f'{tic_id}.pkl'} for tic_id in range(3)]).execute()
+            module.clear_sql_query_result_cache()
+            yield test_database
+            module.clear_sql_query_result_cache()
+
+    @staticmethod
+    def create_id_list_collection() -> SqlMetadataLightCurveCollection:
+        """
+        Creates a collection of the ID list test table.
+
+        :return: The collection.
+        """
+        collection = SqlMetadataLightCurveCollection()
+        collection.get_sql_query = lambda: IdListMetadata.select()
+        collection.get_path_from_model = lambda model: Path(model.path)
+        return collection
+
+    def test_query_results_are_shared_between_collections_until_the_table_generation_changes(self, id_list_database):
+        assert self.create_id_list_collection().sql_count() == 3
+        assert len(list(self.create_id_list_collection().get_paths())) == 3
+        IdListMetadata.insert(tic_id=3, path='3.pkl').execute()
+        assert self.create_id_list_collection().sql_count() == 3
+        assert len(list(self.create_id_list_collection().get_paths())) == 3
+        bump_table_generation(IdListMetadata)
+        assert self.create_id_list_collection().sql_count() == 4
+        assert len(list(self.create_id_list_collection().get_paths())) == 4
+
+    def test_query_results_are_not_shared_when_the_cache_is_disabled(self, id_list_database):
+        assert self.create_id_list_collection().sql_count() == 3
+        IdListMetadata.insert(tic_id=3, path='3.pkl').execute()
+        collection = self.create_id_list_collection()
+        collection.use_query_result_cache = False
+        assert collection.sql_count() == 4
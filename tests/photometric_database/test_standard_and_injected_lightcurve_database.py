@@ -8,6 +8,7 @@ from pathlib import Path
 import ramjet.photometric_database.light_curve_database
 import ramjet.photometric_database.standard_and_injected_light_curve_database as database_module
 from ramjet.photometric_database.derived.toy_database import ToyDatabaseWithAuxiliary, ToyDatabaseWithFlatValueAsLabel
+from ramjet.photometric_database.derived.toy_light_curve_collection import ToyFlatAtValueLightCurveCollection
 from ramjet.photometric_database.light_curve_collection import LightCurveCollection
 from ramjet.photometric_database.standard_and_injected_light_curve_database import \
     StandardAndInjectedLightCurveDatabase, OutOfBoundsInjectionHandlingMethod
@@ -252,6 +253,16 @@ class TestStandardAndInjectedLightCurveDatabase:
             assert mock_shuffle.called
             assert mock_shuffle.call_args[0][1] == database_with_collections.shuffle_buffer_size
 
+    def test_light_curve_collection_paths_dataset_skips_quarantined_paths(self, database_with_collections):
+        light_curve_collection = LightCurveCollection()
+        light_curve_collection.get_paths = lambda: [Path('path0.ext'), Path('path1.ext'), Path('path2.ext')]
+        with patch.object(database_module.LightCurveQuarantine, 'load_quarantined_paths',
+                          return_value={'path1.ext'}):
+            paths_dataset = database_with_collections.generate_paths_dataset_from_light_curve_collection(
+                light_curve_collection, repeat=False, shuffle=False)
+            paths = [path.numpy() for path in paths_dataset]
+        assert paths == [b'path0.ext', b'path2.ext']
+
     def test_can_create_tensorflow_datasets_for_multiple_light_curve_collections_paths(self, database_with_collections):
         standard_paths_datasets = database_with_collections.generate_paths_datasets_from_light_curve_collection_list(
             database_with_collections.training_standard_light_curve_collections)
@@ -614,3 +625,27 @@ class TestStandardAndInjectedLightCurveDatabase:
         train_batch = next(iter(train_dataset))
         for light_curve_tensor, label_tensor in zip(train_batch[0], train_batch[1]):
             assert label_tensor.numpy() == light_curve_tensor.numpy()[0]
+
+    @pytest.mark.integration
+    def test_inference_dataset_interleaves_collections_and_tracks_their_indexes(self):
+        database = ToyDatabaseWithFlatValueAsLabel()
+        short_collection = ToyFlatAtValueLightCurveCollection()
+        short_collection.get_paths = lambda: [Path('20'), Path('21')]
+        database.inference_light_curve_collections.append(short_collection)
+        paths = []
+        collection_indexes = []
+        for batch_paths, batch_examples, batch_collection_indexes in database.generate_inference_dataset(
+                include_collection_index=True):
+            paths.extend(batch_paths.numpy().astype(str).tolist())
+            collection_indexes.extend(batch_collection_indexes.numpy().tolist())
+            for path, example in zip(batch_paths.numpy().astype(str), batch_examples.numpy()):
+                assert example[0, 0] == float(path)
+        assert paths == ['0', '20', '1', '21', '2', '3', '4', '5', '6', '7', '8', '9']
+        assert collection_indexes == [0, 1, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0]
+
+    @pytest.mark.integration
+    def test_inference_dataset_with_auxiliary_information_produces_paths_and_observations(self):
+        database = ToyDatabaseWithAuxiliary()
+        paths, (light_curves, auxiliary_information) = next(iter(database.generate_inference_dataset()))
+        assert light_curves.shape == (2, 100, 1)
+        assert auxiliary_information.numpy().tolist() == [[0, 0], [1, 1]]
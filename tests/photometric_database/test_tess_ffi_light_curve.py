@@ -146,3 +146,12 @@ class TestTessFfiDataInterface:
         light_curve = TessFfiLightCurve.from_path(Path('tesslcs_sector_1_104/tesslcs_tmag_14_15/tesslc_1234567.pkl'))
         assert light_curve.tic_id == 1234567
         assert light_curve.sector == 1
+
+    @patch.object(module.LightCurveQuarantine, 'is_quarantined', return_value=True)
+    @patch.object(module.pickle, 'load', side_effect=module.pickle.UnpicklingError)
+    @patch.object(Path, 'open')
+    def test_from_path_fails_without_retrying_on_quarantined_paths(self, mock_open, mock_pickle_load,
+                                                                    mock_is_quarantined):
+        with pytest.raises(module.QuarantinedLightCurveError):
+            TessFfiLightCurve.from_path(Path('tesslcs_sector_1_104/tesslcs_tmag_14_15/tesslc_1234567.pkl'))
+        assert mock_pickle_load.call_count == 1
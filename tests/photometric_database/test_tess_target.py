@@ -1,26 +1,88 @@
-from unittest.mock import Mock, patch
+from unittest.mock import patch
 
 import numpy as np
-from collections import defaultdict
+import pandas as pd
 
 import pytest
+from peewee import SqliteDatabase
 
+import ramjet.data_interface.response_cache as response_cache_module
+import ramjet.data_interface.tess_input_catalog_resolver as resolver_module
+import ramjet.photometric_database.tess_target as module
+from ramjet.data_interface.response_cache import ResponseCache
 from ramjet.photometric_database.tess_target import TessTarget
 
 
 class TestTessTarget:
+    @pytest.fixture
+    def test_response_cache(self, tmp_path) -> ResponseCache:
+        """
+        A fixture of an empty response cache in a temporary directory.
+
+        :return: The response cache.
+        """
+        test_response_cache = ResponseCache(cache_directory=tmp_path)
+        with patch.object(module, 'response_cache', test_response_cache):
+            yield test_response_cache
+
     def test_from_tic_id_uses_gaia_radius_if_tic_radius_is_nan(self):
-        stub_tic_row = defaultdict(int)
-        stub_tic_row['rad'] = np.nan
-        stub_tic_row['GAIA'] = 1
-        TessTarget.tess_data_interface.get_tess_input_catalog_row = Mock(return_value=stub_tic_row)
-        mock_gaia_mass = Mock()
-        with patch.object(TessTarget, 'get_radius_from_gaia') as mock_get_radius_from_gaia:
-            mock_get_radius_from_gaia.return_value = mock_gaia_mass
+        stub_tic_rows = pd.DataFrame({'rad': [np.nan], 'gaia_radius': [2.5], 'mass': [1.0], 'Tmag': [9.0],
+                                      'contratio': [0.1]}, index=[1])
+        with patch.object(TessTarget.tess_input_catalog_resolver, 'resolve_tic_rows') as mock_resolve_tic_rows:
+            mock_resolve_tic_rows.return_value = stub_tic_rows
 
             target = TessTarget.from_tic_id(1)
 
-        assert target.radius == mock_gaia_mass
+        assert target.radius == 2.5
+
+    def test_from_tic_ids_resolves_all_tic_rows_in_a_single_batch(self):
+        stub_tic_rows = pd.DataFrame({'rad': [1.5, np.nan], 'gaia_radius': [np.nan, 3.0], 'mass': [1.0, 2.0],
+                                      'Tmag': [9.0, 10.0], 'contratio': [0.1, 0.2]}, index=[2, 1])
+        with patch.object(TessTarget.tess_input_catalog_resolver, 'resolve_tic_rows') as mock_resolve_tic_rows:
+            mock_resolve_tic_rows.return_value = stub_tic_rows
+
+            targets = TessTarget.from_tic_ids([1, 2])
+
+        assert mock_resolve_tic_rows.call_count == 1
+        assert [target.tic_id for target in targets] == [1, 2]
+        assert [target.radius for target in targets] == [3.0, 1.5]
+        assert [target.magnitude for target in targets] == [10.0, 9.0]
+
+    def test_repeated_targets_are_created_from_the_local_tic_table(self, tmp_path):
+        mast_tic_rows = pd.DataFrame({'ID': ['1'], 'ra': [10.0], 'dec': [-1.0], 'rad': [np.nan], 'mass': [1.0],
+                                      'Tmag': [9.0], 'contratio': [0.1], 'GAIA': ['100']})
+        test_database = SqliteDatabase(':memory:')
+        resolver = TessTarget.tess_input_catalog_resolver
+        with test_database.bind_ctx([resolver_module.TessInputCatalogEntry]), \
+                patch.object(resolver_module, 'response_cache', ResponseCache(cache_directory=tmp_path)), \
+                patch.object(resolver.tess_data_interface, 'get_tess_input_catalog_rows',
+                             return_value=mast_tic_rows) as mock_get_tess_input_catalog_rows, \
+                patch.object(resolver, 'query_gaia_radii', return_value={100: 2.5}) as mock_query_gaia_radii:
+            targets = [TessTarget.from_tic_id(1), TessTarget.from_tic_id(1)]
+        assert mock_get_tess_input_catalog_rows.call_count == 1
+        assert mock_query_gaia_radii.call_count == 1
+        assert [target.radius for target in targets] == [2.5, 2.5]
+        assert [target.magnitude for target in targets] == [9.0, 9.0]
+
+    def test_from_tic_ids_errors_on_tic_ids_not_in_the_tic(self):
+        stub_tic_rows = pd.DataFrame({'rad': [1.5], 'gaia_radius': [np.nan], 'mass': [1.0], 'Tmag': [9.0],
+                                      'contratio': [0.1]}, index=[1])
+        with patch.object(TessTarget.tess_input_catalog_resolver, 'resolve_tic_rows') as mock_resolve_tic_rows:
+            mock_resolve_tic_rows.return_value = stub_tic_rows
+            with pytest.raises(ValueError, match=r'\[2\]'):
+                TessTarget.from_tic_ids([1, 2])
+
+    def test_repeated_nearby_target_retrievals_are_served_from_the_response_cache(self, test_response_cache):
+        target = TessTarget()
+        target.tic_id = 1
+        csv_content = b'TIC ID,Distance (pc),Distance Err (pc)\n1,10,1\n2,20,2\n'
+        with patch.object(response_cache_module.requests, 'get') as mock_get:
+            mock_get.return_value.content = csv_content
+            nearby_target_data_frame0 = target.retrieve_nearby_tic_targets()
+            nearby_target_data_frame1 = target.retrieve_nearby_tic_targets()
+        assert mock_get.call_count == 1
+        assert list(nearby_target_data_frame0['TIC ID']) == [2]
+        assert list(nearby_target_data_frame1['TIC ID']) == [2]
 
     @pytest.mark.external
     def test_retrieving_radius_from_gaia(self):
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import tensorflow as tf
+from peewee import SqliteDatabase
+
+from ramjet.data_interface.target_inference_results import TargetInferenceResult, TargetInferenceAggregate
+from ramjet.incremental_inference import IncrementalTargetInferenceRunner
+from ramjet.photometric_database.derived.toy_database import ToyDatabaseWithFlatValueAsLabel
+
+
+def get_toy_tic_id_and_sector_from_path(path: Path) -> (int, int):
+    """
+    Gets a TIC ID and sector for the flat value toy paths, treating the paths as two sectors of five targets.
+
+    :param path: The toy light curve path.
+    :return: The TIC ID and sector.
+    """
+    value = int(path.name)
+    return value % 5, value // 5
+
+
+class TestIncrementalTargetInferenceRunner:
+    @pytest.fixture
+    def test_database(self) -> SqliteDatabase:
+        """
+        An in-memory database bound to the inference result models.
+
+        :return: The database.
+        """
+        test_database = SqliteDatabase(':memory:')
+        with test_database.bind_ctx([TargetInferenceResult, TargetInferenceAggregate]):
+            yield test_database
+
+    @pytest.fixture
+    def runner(self, test_database) -> IncrementalTargetInferenceRunner:
+        """
+        A fixture of an incremental inference runner over the flat value toy database with a mean flux model.
+
+        :return: The runner.
+        """
+        model = tf.keras.Sequential([tf.keras.layers.GlobalAveragePooling1D()])
+        return IncrementalTargetInferenceRunner(model, ToyDatabaseWithFlatValueAsLabel(), model_checkpoint='toy',
+                                                get_tic_id_and_sector_from_path=get_toy_tic_id_and_sector_from_path,
+                                                rows_per_save=3)
+
+    def test_only_new_target_sectors_are_inferred_on(self, runner):
+        runner.results_manager.save_results(pd.DataFrame({'tic_id': [0, 1], 'sector': [0, 0],
+                                                          'light_curve_path': ['0', '1'], 'confidence': [0.0, 0.0]}),
+                                            'toy')
+        examples_count = runner.run()
+        assert examples_count == 8
+        ranked_targets = runner.results_manager.load_ranked_targets('toy')
+        assert ranked_targets['tic_id'].tolist() == [4, 3, 2, 1, 0]
+        assert ranked_targets['sector_count'].tolist() == [2, 2, 2, 2, 2]
+        assert ranked_targets['mean_confidence'].tolist() == pytest.approx([6.5, 5.5, 4.5, 3.0, 2.5])
+        assert runner.run() == 0
@@ -0,0 +1,152 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ramjet.inference_result_writer as module
+from ramjet.inference_result_writer import InferenceResultWriter, TopPredictionAccumulator, \
+    build_ensemble_confidences_data_frame
+
+
+def create_batches(number_of_batches: int, batch_size: int, seed: int = 0) -> [pd.DataFrame]:
+    """
+    Creates batches of random single label inference results.
+
+    :param number_of_batches: The number of batches to create.
+    :param batch_size: The number of rows per batch.
+    :param seed: The random seed.
+    :return: The list of batch data frames.
+    """
+    random_generator = np.random.default_rng(seed)
+    batches = []
+    for batch_index in range(number_of_batches):
+        paths = [f'path_{batch_index}_{row_index}.fits' for row_index in range(batch_size)]
+        batches.append(pd.DataFrame({'light_curve_path': paths,
+                                     'confidence': random_generator.random(batch_size)}))
+    return batches
+
+
+class TestInferenceResultWriter:
+    def test_merged_results_match_a_full_in_memory_sort(self, tmp_path):
+        batches = create_batches(number_of_batches=10, batch_size=7)
+        results_path = tmp_path.joinpath('results.csv')
+        writer = InferenceResultWriter(results_path, rows_per_run=15, rows_per_merge_chunk=4)
+        for batch in batches:
+            writer.write_batch(batch)
+        writer.finalize()
+        expected_data_frame = pd.concat(batches).sort_values('confidence', ascending=False).reset_index(drop=True)
+        results_data_frame = pd.read_csv(results_path, index_col='index')
+        assert len(writer.run_paths) == 4
+        assert results_data_frame['light_curve_path'].tolist() == expected_data_frame['light_curve_path'].tolist()
+        assert np.allclose(results_data_frame['confidence'], expected_data_frame['confidence'])
+        assert results_data_frame.index.tolist() == list(range(70))
+
+    def test_buffered_rows_are_bounded_by_the_run_size(self, tmp_path):
+        writer = InferenceResultWriter(tmp_path.joinpath('results.csv'), rows_per_run=10)
+        for batch in create_batches(number_of_batches=6, batch_size=4):
+            writer.write_batch(batch)
+            assert writer.buffered_row_count < 10
+        writer.finalize()
+
+    def test_multi_label_results_are_sorted_by_the_first_label(self, tmp_path):
+        results_path = tmp_path.joinpath('results.csv')
+        writer = InferenceResultWriter(results_path, rows_per_run=2)
+        writer.write_batch(pd.DataFrame({'light_curve_path': ['a', 'b'], 'label_0_confidence': [0.2, 0.9],
+                                         'label_1_confidence': [0.5, 0.1]}))
+        writer.write_batch(pd.DataFrame({'light_curve_path': ['c'], 'label_0_confidence': [0.5],
+                                         'label_1_confidence': [0.7]}))
+        writer.finalize()
+        results_data_frame = pd.read_csv(results_path, index_col='index')
+        assert results_data_frame['light_curve_path'].tolist() == ['b', 'c', 'a']
+        assert results_data_frame['label_1_confidence'].tolist() == [0.1, 0.7, 0.5]
+
+    def test_runs_are_removed_after_finalizing(self, tmp_path):
+        results_path = tmp_path.joinpath('results.csv')
+        writer = InferenceResultWriter(results_path, rows_per_run=5)
+        for batch in create_batches(number_of_batches=3, batch_size=4):
+            writer.write_batch(batch)
+        writer.finalize()
+        assert [path.name for path in tmp_path.iterdir()] == ['results.csv']
+
+
+    @pytest.mark.parametrize('batches', [[], create_batches(number_of_batches=1, batch_size=0)])
+    def test_results_file_of_no_rows_only_has_the_header(self, tmp_path, batches):
+        results_path = tmp_path.joinpath('results.csv')
+        writer = InferenceResultWriter(results_path)
+        for batch in batches:
+            writer.write_batch(batch)
+        writer.finalize()
+        results_data_frame = pd.read_csv(results_path, index_col='index')
+        assert results_data_frame.shape[0] == 0
+        assert results_data_frame.columns.tolist() == ['light_curve_path', 'confidence']
+        assert [path.name for path in tmp_path.iterdir()] == ['results.csv']
+
+class TestTopPredictionAccumulator:
+    def test_top_predictions_are_kept(self, tmp_path):
+        batches = create_batches(number_of_batches=10, batch_size=700)
+        results_path = tmp_path.joinpath('results.csv')
+        accumulator = TopPredictionAccumulator(results_path, number_of_top_predictions_to_keep=9)
+        for batch in batches:
+            accumulator.write_batch(batch)
+        accumulator.finalize()
+        expected_data_frame = pd.concat(batches).sort_values('confidence', ascending=False).head(9)
+        results_data_frame = pd.read_csv(results_path, index_col='index')
+        assert results_data_frame['light_curve_path'].tolist() == expected_data_frame['light_curve_path'].tolist()
+        assert results_data_frame.index.tolist() == list(range(9))
+
+    def test_candidates_are_bounded(self, tmp_path):
+        accumulator = TopPredictionAccumulator(tmp_path.joinpath('results.csv'), number_of_top_predictions_to_keep=5)
+        for batch in create_batches(number_of_batches=10, batch_size=700):
+            accumulator.write_batch(batch)
+            assert accumulator.candidate_row_count < 2_000 + 700
+
+    def test_the_top_predictions_of_each_label_are_kept(self, tmp_path):
+        results_path = tmp_path.joinpath('results.csv')
+        accumulator = TopPredictionAccumulator(results_path, number_of_top_predictions_to_keep=2)
+        accumulator.write_batch(pd.DataFrame({'light_curve_path': ['a', 'b', 'c', 'd'],
+                                              'label_0_confidence': [0.9, 0.8, 0.1, 0.2],
+                                              'label_1_confidence': [0.1, 0.2, 0.9, 0.3]}))
+        accumulator.finalize()
+        results_data_frame = pd.read_csv(results_path, index_col='index')
+        assert results_data_frame['light_curve_path'].tolist() == ['a', 'b', 'd', 'c']
+
+    def test_top_predictions_are_checkpointed_on_the_interval(self, tmp_path):
+        results_path = tmp_path.joinpath('results.csv')
+        batches = create_batches(number_of_batches=2, batch_size=3)
+        with patch.object(module.time, 'monotonic') as mock_monotonic:
+            mock_monotonic.return_value = 0
+            accumulator = TopPredictionAccumulator(results_path, number_of_top_predictions_to_keep=2,
+                                                   checkpoint_interval=10)
+            mock_monotonic.return_value = 5
+            accumulator.write_batch(batches[0])
+            assert not results_path.exists()
+            mock_monotonic.return_value = 11
+            accumulator.write_batch(batches[1])
+            assert results_path.exists()
+
+
+class TestBuildEnsembleConfidencesDataFrame:
+    def test_single_label_ensembles_have_a_mean_confidence_column(self):
+        data_frame = build_ensemble_confidences_data_frame(np.array([b'a', b'b']),
+                                                           {'m0': np.array([[0.2], [0.6]]),
+                                                            'm1': np.array([[0.4], [1.0]])})
+        assert data_frame['light_curve_path'].tolist() == ['a', 'b']
+        assert data_frame['confidence'].tolist() == pytest.approx([0.3, 0.8])
+        assert data_frame['confidence_variance'].tolist() == pytest.approx([0.01, 0.04])
+        assert data_frame['m1_confidence'].tolist() == [0.4, 1.0]
+
+    def test_multi_label_ensembles_have_mean_confidence_columns_per_label(self):
+        data_frame = build_ensemble_confidences_data_frame(np.array(['a']), {'m0': np.array([[0.2, 0.5]]),
+                                                                             'm1': np.array([[0.4, 0.7]])})
+        assert data_frame['label_0_confidence'].tolist() == pytest.approx([0.3])
+        assert data_frame['label_1_confidence'].tolist() == pytest.approx([0.6])
+        assert data_frame['m0_label_1_confidence'].tolist() == [0.5]
+
+    def test_top_predictions_of_an_ensemble_are_kept_by_mean_confidence(self, tmp_path):
+        results_path = tmp_path.joinpath('results.csv')
+        accumulator = TopPredictionAccumulator(results_path, number_of_top_predictions_to_keep=1)
+        accumulator.write_batch(build_ensemble_confidences_data_frame(
+            np.array(['a', 'b']), {'m0': np.array([[0.9], [0.6]]), 'm1': np.array([[0.1], [0.6]])}))
+        accumulator.finalize()
+        assert pd.read_csv(results_path)['light_curve_path'].tolist() == ['b']
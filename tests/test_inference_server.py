@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import requests
+import tensorflow as tf
+
+from ramjet.inference_server import DynamicBatcher, InferenceServer, score_paths_with_server, \
+    score_fluxes_with_server
+from ramjet.photometric_database.derived.toy_database import ToyDatabaseWithFlatValueAsLabel
+
+
+class RecordingModel:
+    """A model which returns the mean of each example and records the size of each batch it infers on."""
+    def __init__(self):
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def __call__(self, examples, training=False):
+        with self.lock:
+            self.batch_sizes.append(examples.shape[0])
+        return np.mean(examples, axis=(1, 2))[:, np.newaxis]
+
+
+class TestDynamicBatcher:
+    def test_concurrent_requests_are_merged_into_one_batch(self):
+        model = RecordingModel()
+        batcher = DynamicBatcher(model, max_batch_size=10, max_wait=0.5)
+        batcher.start()
+        examples_list = [np.full([2, 5, 1], value, dtype=np.float32) for value in range(3)]
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            confidences_list = list(executor.map(batcher.infer, examples_list))
+        batcher.stop()
+        assert model.batch_sizes == [6]
+        for value, confidences in enumerate(confidences_list):
+            assert confidences.tolist() == [[value], [value]]
+
+    def test_batches_do_not_exceed_the_maximum_batch_size(self):
+        model = RecordingModel()
+        batcher = DynamicBatcher(model, max_batch_size=4, max_wait=0.2)
+        batcher.start()
+        examples_list = [np.full([2, 5, 1], value, dtype=np.float32) for value in range(3)]
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(batcher.infer, examples_list))
+        batcher.stop()
+        assert sorted(model.batch_sizes) == [2, 4]
+
+    def test_model_errors_are_raised_in_the_requesting_thread(self):
+        def failing_model(examples, training=False):
+            raise RuntimeError('Inference failed.')
+        batcher = DynamicBatcher(failing_model, max_wait=0)
+        batcher.start()
+        with pytest.raises(RuntimeError):
+            batcher.infer(np.zeros([1, 5, 1], dtype=np.float32))
+        batcher.stop()
+
+
+class TestInferenceServer:
+    @pytest.fixture
+    def server(self) -> InferenceServer:
+        """
+        A fixture of a running inference server, on a free port, of a mean flux model over the flat value toy
+        database.
+
+        :return: The server.
+        """
+        model = tf.keras.Sequential([tf.keras.layers.GlobalAveragePooling1D()])
+        with InferenceServer(model, ToyDatabaseWithFlatValueAsLabel(), port=0) as server:
+            yield server
+
+    def test_can_score_paths(self, server):
+        confidences = score_paths_with_server(['3', '7'], url=server.url)
+        assert confidences.tolist() == [[3.0], [7.0]]
+
+    def test_can_score_flux_arrays(self, server):
+        confidences = score_fluxes_with_server([np.full(100, 2.0), np.full(150, 5.0)], url=server.url)
+        assert confidences.tolist() == [[2.0], [5.0]]
+
+    def test_invalid_requests_are_rejected(self, server):
+        response = requests.post(f'{server.url}/score', json={'light_curves': []})
+        assert response.status_code == 400
+        assert requests.get(f'{server.url}/health').json() == {'status': 'ok'}
+
+    def test_inference_errors_are_returned_as_server_errors(self):
+        def failing_model(examples, training=False):
+            raise RuntimeError('Inference failed.')
+        with InferenceServer(failing_model, ToyDatabaseWithFlatValueAsLabel(), port=0, max_wait=0) as server:
+            response = requests.post(f'{server.url}/score', json={'paths': ['3']})
+            assert response.status_code == 500
+            assert response.json() == {'error': 'RuntimeError: Inference failed.'}
+            assert requests.get(f'{server.url}/health').json() == {'status': 'ok'}
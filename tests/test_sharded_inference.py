@@ -0,0 +1,78 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+import tensorflow as tf
+
+from ramjet.photometric_database.derived.toy_database import ToyDatabaseWithFlatValueAsLabel
+from ramjet.sharded_inference import ShardedInferenceRunner, get_path_shard_index
+
+
+def create_mean_flux_model() -> tf.keras.Model:
+    """
+    Creates a model whose confidence is the mean flux of the light curve.
+
+    :return: The model.
+    """
+    return tf.keras.Sequential([tf.keras.layers.GlobalAveragePooling1D()])
+
+
+class TestShardedInference:
+    @pytest.fixture
+    def runner(self, tmp_path) -> ShardedInferenceRunner:
+        """
+        A fixture of a single process sharded inference runner over the flat value toy database.
+
+        :return: The runner.
+        """
+        return ShardedInferenceRunner(database_factory=ToyDatabaseWithFlatValueAsLabel,
+                                      model_factory=create_mean_flux_model,
+                                      results_directory=tmp_path.joinpath('shards'), number_of_shards=3,
+                                      number_of_processes=1, rows_per_checkpoint=2)
+
+    def test_shard_assignment_is_deterministic_and_independent_of_path_type(self):
+        shard_indexes = [get_path_shard_index(Path(f'{index}.fits'), 7) for index in range(100)]
+        assert shard_indexes == [get_path_shard_index(f'{index}.fits', 7) for index in range(100)]
+        assert set(shard_indexes) == set(range(7))
+
+    def test_shards_cover_every_path_exactly_once(self, runner, tmp_path):
+        runner.run()
+        results_path = tmp_path.joinpath('results.csv')
+        runner.merge(results_path)
+        results_data_frame = pd.read_csv(results_path, index_col='index', dtype={'light_curve_path': str})
+        assert sorted(results_data_frame['light_curve_path'].tolist()) == [str(index) for index in range(10)]
+        assert results_data_frame['confidence'].tolist() == [float(index) for index in reversed(range(10))]
+        for shard_index in range(3):
+            assert runner.is_shard_complete(shard_index)
+            for path in runner.load_completed_paths(shard_index):
+                assert get_path_shard_index(path, 3) == shard_index
+
+    def test_restarted_shards_skip_completed_paths(self, runner):
+        shard_paths = [str(index) for index in range(10) if get_path_shard_index(str(index), 3) == 0]
+        runner.assign_shard_paths()
+        pd.DataFrame({'light_curve_path': shard_paths[:1], 'confidence': [-1.0]}).to_csv(
+            runner.get_shard_directory(0).joinpath('part_000000.csv'), index=False)
+        runner.infer_shard(0)
+        shard_results_data_frame = pd.concat([pd.read_csv(path, dtype={'light_curve_path': str})
+                                              for path in runner.get_shard_part_paths(0)])
+        assert sorted(shard_results_data_frame['light_curve_path'].tolist()) == sorted(shard_paths)
+        assert shard_results_data_frame['confidence'].tolist()[0] == -1.0
+
+    def test_paths_are_assigned_to_shards_once(self, runner):
+        runner.assign_shard_paths()
+        shard_paths = [pd.read_csv(runner.get_shard_paths_path(shard_index), dtype={'light_curve_path': str}
+                                   )['light_curve_path'].tolist() for shard_index in range(3)]
+        assert sorted(path for paths in shard_paths for path in paths) == sorted(str(index) for index in range(10))
+        for shard_index, paths in enumerate(shard_paths):
+            assert all(get_path_shard_index(path, 3) == shard_index for path in paths)
+        with patch.object(ToyDatabaseWithFlatValueAsLabel,
+                          'create_paths_factory_for_light_curve_collection') as mock_create_paths_factory:
+            runner.run()
+            assert not mock_create_paths_factory.called
+
+    def test_merging_requires_complete_shards(self, runner, tmp_path):
+        runner.assign_shard_paths()
+        runner.infer_shard(0)
+        with pytest.raises(ValueError):
+            runner.merge(tmp_path.joinpath('results.csv'))
@@ -2,6 +2,7 @@
 import tensorflow as tf
 from tensorflow.keras.losses import BinaryCrossentropy
 from pathlib import Path
+from ramjet.data_interface.metadatabase import metadatabase
 from ramjet.models.cura import Cura
 from ramjet.photometric_database.derived.moa_survey_none_single_and_binary_database import \
     MoaSurveyNoneSingleAndBinaryDatabase
@@ -13,6 +14,7 @@ from ramjet.trial import create_logging_metrics, create_logging_callbacks
 def train():
     """Runs the training."""
     print('Starting training process...', flush=True)
+    metadatabase.use_read_only_connections()  # Training only queries the metadatabase.
     # Basic training settings.
     database = TessTwoMinuteCadenceStandardAndInjectedTransitDatabase()
     model = Cura(database.number_of_label_values, database.number_of_input_channels)